@@ -27,6 +27,10 @@
 .PARAMETER CleanBuild
     If specified, passes a '-Clean' argument to the build script (if supported by the build script).
 
+.PARAMETER LegacyPackaging
+    If specified, stages each artifact in 'release/<TargetDir>' and zips it with Compress-Archive,
+    even when the config sets a PackageScriptPath.
+
 .EXAMPLE
     .\New-Release.ps1
     Runs the release process using configuration from './release.config.ps1' and current directory as project root.
@@ -65,6 +69,9 @@ param (
     [Parameter(Mandatory=$false)]
     [switch]$CleanBuild,
 
+    [Parameter(Mandatory=$false)]
+    [switch]$LegacyPackaging,
+
     [Parameter(Mandatory=$false)]
     [object]$BuildArgs # Can be string or hashtable
 )
@@ -75,6 +82,28 @@ Write-Host "===== Modular Release Script =====" -ForegroundColor Cyan
 Write-Host "Timestamp: $(Get-Date)"
 Write-Host ""
 
+# Writes a detached GPG signature (<file>.sig) next to each executable
+function Invoke-GpgSigning {
+    param (
+        [System.IO.FileInfo[]]$Executables,
+        [string]$KeyId
+    )
+    foreach ($exe in $Executables) {
+        Write-Host "[INFO]    - Signing '$($exe.Name)' with key '$KeyId'..."
+        try {
+            # Use --quiet to reduce output, check $LASTEXITCODE
+            gpg --batch --yes --quiet --default-key $KeyId --detach-sign $exe.FullName
+            if ($LASTEXITCODE -ne 0) {
+                Write-Warning "GPG signing failed for '$($exe.Name)' with exit code $LASTEXITCODE."
+            } else {
+                Write-Host "[INFO]    - Successfully signed '$($exe.Name)'."
+            }
+        } catch {
+            Write-Warning "Error executing gpg for '$($exe.Name)': $($_.Exception.Message)"
+        }
+    }
+}
+
 # --- Determine and Resolve Project Root ---
 $EffectiveProjectRoot = $null
 if ($PSBoundParameters.ContainsKey('ProjectRoot') -and -not [string]::IsNullOrEmpty($ProjectRoot)) {
@@ -288,66 +317,29 @@ try {
     # --- Package Artifacts ---
     Write-Host "[INFO] Packaging artifacts..."
     $packagedArtifacts = @{} # To store paths of created packages
-
-    foreach ($artifactKey in $Config.Artifacts.Keys) {
-        $artifactConf = $Config.Artifacts[$artifactKey]
-        $artifactTargetDirName = $artifactConf.TargetDir
-        $artifactPackageSuffix = $artifactConf.PackageNameSuffix
-        $artifactSourcePattern = $artifactConf.SourcePattern
-        
-        $artifactReleaseDir = Join-Path $releaseBaseDir $artifactTargetDirName
-        Write-Host "[INFO] Processing artifact type: '$artifactKey'"
-        Write-Host "[INFO] -> Target directory: $artifactReleaseDir"
-        New-Item -Path $artifactReleaseDir -ItemType Directory -Force | Out-Null
-
-        # Find and copy build artifact(s)
-        $sourceArtifactPath = Join-Path $buildOutputDirPath $artifactSourcePattern
-        $foundArtifacts = Get-ChildItem -Path $sourceArtifactPath -ErrorAction SilentlyContinue
-        
-        if ($foundArtifacts) {
-            Write-Host "[INFO] -> Found artifact(s) matching '$artifactSourcePattern' in '$buildOutputDirPath':"
-            $foundArtifacts | ForEach-Object { Write-Host "   - $($_.Name)" }
-            Copy-Item -Path $foundArtifacts.FullName -Destination $artifactReleaseDir -Force -Recurse
-        } else {
-            Write-Warning "No artifact found matching pattern '$artifactSourcePattern' in '$buildOutputDirPath' for type '$artifactKey'."
-            continue # Skip packaging this type if primary artifact is missing
-        }
-
-        # Copy documentation files
-        Write-Host "[INFO] -> Copying documentation files..."
-        foreach ($docFileRelPath in $Config.DocFiles) {
-            # Path is now relative to the effective project root
-            $docFileFullPath = Join-Path $EffectiveProjectRoot.Path $docFileRelPath
-            if (Test-Path $docFileFullPath -PathType Leaf) {
-                Copy-Item $docFileFullPath $artifactReleaseDir -Force
-                Write-Host "[INFO]    - Copied '$docFileRelPath'"
-            } else {
-                Write-Warning "Documentation file not found or is not a file: '$docFileRelPath'"
-            }
+    $shouldSign = (-not $NoSign) -and ($Config.ContainsKey("GpgKeyId")) -and ($Config.GpgKeyId -ne $null -and $Config.GpgKeyId -ne "")
+
+    $packageScriptPath = $null
+    if ($Config.ContainsKey("PackageScriptPath") -and $Config.PackageScriptPath -and -not $LegacyPackaging) {
+        # Path is relative to the effective project root
+        $packageScriptPath = Join-Path $EffectiveProjectRoot.Path $Config.PackageScriptPath
+        if (-not (Test-Path $packageScriptPath)) {
+            Write-Error "Package script not found at '$packageScriptPath' (relative to project root '$($EffectiveProjectRoot.Path)')"
+            exit 1
         }
+    }
 
-        # Sign executables (if applicable and not skipped)
-        $shouldSign = (-not $NoSign) -and ($Config.ContainsKey("GpgKeyId")) -and ($Config.GpgKeyId -ne $null -and $Config.GpgKeyId -ne "")
+    if ($packageScriptPath) {
+        # The package script streams the artifacts and DocFiles straight into
+        # reproducible zips, all archives in parallel, without staging copies
         if ($shouldSign) {
-            Write-Host "[INFO] -> Signing executables in '$artifactReleaseDir'..."
-            $executablesToSign = Get-ChildItem -Path $artifactReleaseDir -Filter "*.exe"
-            if ($executablesToSign) {
-                foreach ($exe in $executablesToSign) {
-                    Write-Host "[INFO]    - Signing '$($exe.Name)' with key '$($Config.GpgKeyId)'..."
-                    try {
-                        # Use --quiet to reduce output, check $LASTEXITCODE
-                        gpg --batch --yes --quiet --default-key $Config.GpgKeyId --detach-sign $exe.FullName
-                        if ($LASTEXITCODE -ne 0) {
-                            Write-Warning "GPG signing failed for '$($exe.Name)' with exit code $LASTEXITCODE."
-                        } else {
-                            Write-Host "[INFO]    - Successfully signed '$($exe.Name)'."
-                        }
-                    } catch {
-                        Write-Warning "Error executing gpg for '$($exe.Name)': $($_.Exception.Message)"
-                    }
+            Write-Host "[INFO] -> Signing executables in '$buildOutputDirPath'..."
+            foreach ($artifactKey in $Config.Artifacts.Keys) {
+                $sourceArtifactPath = Join-Path $buildOutputDirPath $Config.Artifacts[$artifactKey].SourcePattern
+                $executablesToSign = Get-ChildItem -Path $sourceArtifactPath -File -ErrorAction SilentlyContinue | Where-Object { $_.Extension -eq ".exe" }
+                if ($executablesToSign) {
+                    Invoke-GpgSigning -Executables $executablesToSign -KeyId $Config.GpgKeyId
                 }
-            } else {
-                Write-Host "[INFO] -> No executables found in '$artifactReleaseDir' to sign."
             }
         } elseif (-not $NoSign) {
             Write-Host "[INFO] -> Signing skipped (GpgKeyId not configured)."
@@ -355,18 +347,93 @@ try {
             Write-Host "[INFO] -> Signing skipped as requested via -NoSign." -ForegroundColor Yellow
         }
 
-        # Create ZIP archive
-        $zipFileNameBase = "$($Config.ProjectName)$($artifactPackageSuffix)-$($ReleaseVersion)"
-        $zipFilePath = Join-Path $releaseBaseDir "$zipFileNameBase.zip"
-        Write-Host "[INFO] -> Creating archive: $zipFilePath"
+        $configJsonPath = Join-Path ([System.IO.Path]::GetTempPath()) "release.config.$PID.json"
+        $Config | ConvertTo-Json -Depth 5 | Set-Content -Path $configJsonPath -Encoding UTF8
         try {
-            Compress-Archive -Path "$artifactReleaseDir\*" -DestinationPath $zipFilePath -Force
-            Write-Host "[SUCCESS] -> Archive '$zipFilePath' created." -ForegroundColor Green
-            $packagedArtifacts[$artifactKey] = $zipFilePath
-        } catch {
-            Write-Error "Failed to create archive '$zipFilePath': $($_.Exception.Message)"
+            Write-Host "[INFO] Executing package script: $packageScriptPath"
+            python $packageScriptPath --config $configJsonPath --project-root $EffectiveProjectRoot.Path --version $ReleaseVersion --output $releaseBaseDir
+            if ($LASTEXITCODE -ne 0) {
+                Write-Error "Package script failed with exit code $LASTEXITCODE."
+                exit 1
+            }
+        } finally {
+            Remove-Item $configJsonPath -Force -ErrorAction SilentlyContinue
+        }
+
+        foreach ($artifactKey in $Config.Artifacts.Keys) {
+            $zipFileNameBase = "$($Config.ProjectName)$($Config.Artifacts[$artifactKey].PackageNameSuffix)-$($ReleaseVersion)"
+            $zipFilePath = Join-Path $releaseBaseDir "$zipFileNameBase.zip"
+            if (Test-Path $zipFilePath) {
+                $packagedArtifacts[$artifactKey] = $zipFilePath
+            }
+        }
+        Write-Host ""
+    } else {
+        foreach ($artifactKey in $Config.Artifacts.Keys) {
+            $artifactConf = $Config.Artifacts[$artifactKey]
+            $artifactTargetDirName = $artifactConf.TargetDir
+            $artifactPackageSuffix = $artifactConf.PackageNameSuffix
+            $artifactSourcePattern = $artifactConf.SourcePattern
+            
+            $artifactReleaseDir = Join-Path $releaseBaseDir $artifactTargetDirName
+            Write-Host "[INFO] Processing artifact type: '$artifactKey'"
+            Write-Host "[INFO] -> Target directory: $artifactReleaseDir"
+            New-Item -Path $artifactReleaseDir -ItemType Directory -Force | Out-Null
+
+            # Find and copy build artifact(s)
+            $sourceArtifactPath = Join-Path $buildOutputDirPath $artifactSourcePattern
+            $foundArtifacts = Get-ChildItem -Path $sourceArtifactPath -ErrorAction SilentlyContinue
+            
+            if ($foundArtifacts) {
+                Write-Host "[INFO] -> Found artifact(s) matching '$artifactSourcePattern' in '$buildOutputDirPath':"
+                $foundArtifacts | ForEach-Object { Write-Host "   - $($_.Name)" }
+                Copy-Item -Path $foundArtifacts.FullName -Destination $artifactReleaseDir -Force -Recurse
+            } else {
+                Write-Warning "No artifact found matching pattern '$artifactSourcePattern' in '$buildOutputDirPath' for type '$artifactKey'."
+                continue # Skip packaging this type if primary artifact is missing
+            }
+
+            # Copy documentation files
+            Write-Host "[INFO] -> Copying documentation files..."
+            foreach ($docFileRelPath in $Config.DocFiles) {
+                # Path is now relative to the effective project root
+                $docFileFullPath = Join-Path $EffectiveProjectRoot.Path $docFileRelPath
+                if (Test-Path $docFileFullPath -PathType Leaf) {
+                    Copy-Item $docFileFullPath $artifactReleaseDir -Force
+                    Write-Host "[INFO]    - Copied '$docFileRelPath'"
+                } else {
+                    Write-Warning "Documentation file not found or is not a file: '$docFileRelPath'"
+                }
+            }
+
+            # Sign executables (if applicable and not skipped)
+            if ($shouldSign) {
+                Write-Host "[INFO] -> Signing executables in '$artifactReleaseDir'..."
+                $executablesToSign = Get-ChildItem -Path $artifactReleaseDir -Filter "*.exe"
+                if ($executablesToSign) {
+                    Invoke-GpgSigning -Executables $executablesToSign -KeyId $Config.GpgKeyId
+                } else {
+                    Write-Host "[INFO] -> No executables found in '$artifactReleaseDir' to sign."
+                }
+            } elseif (-not $NoSign) {
+                Write-Host "[INFO] -> Signing skipped (GpgKeyId not configured)."
+            } else {
+                Write-Host "[INFO] -> Signing skipped as requested via -NoSign." -ForegroundColor Yellow
+            }
+
+            # Create ZIP archive
+            $zipFileNameBase = "$($Config.ProjectName)$($artifactPackageSuffix)-$($ReleaseVersion)"
+            $zipFilePath = Join-Path $releaseBaseDir "$zipFileNameBase.zip"
+            Write-Host "[INFO] -> Creating archive: $zipFilePath"
+            try {
+                Compress-Archive -Path "$artifactReleaseDir\*" -DestinationPath $zipFilePath -Force
+                Write-Host "[SUCCESS] -> Archive '$zipFilePath' created." -ForegroundColor Green
+                $packagedArtifacts[$artifactKey] = $zipFilePath
+            } catch {
+                Write-Error "Failed to create archive '$zipFilePath': $($_.Exception.Message)"
+            }
+            Write-Host "" # Newline between artifact types
         }
-        Write-Host "" # Newline between artifact types
     }
 
     # --- Final Summary ---
@@ -387,7 +454,11 @@ try {
 
     Write-Host ""
     # Path is now relative to the effective project root
-    Write-Host "Release files (unpacked) are located in: $(Resolve-Path $releaseBaseDir)"
+    if ($packageScriptPath) {
+        Write-Host "Release packages are located in: $(Resolve-Path $releaseBaseDir)"
+    } else {
+        Write-Host "Release files (unpacked) are located in: $(Resolve-Path $releaseBaseDir)"
+    }
     Write-Host ""
     Write-Host "===== Release process completed. =====" -ForegroundColor Cyan 
 } finally {
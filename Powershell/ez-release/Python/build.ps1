@@ -16,6 +16,47 @@ param (
     [Parameter(Mandatory=$false)]
     [switch]$Fallback,
     
+    [Parameter(Mandatory=$false)]
+    [switch]$Matrix,
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$OneDir,
+    
+    [Parameter(Mandatory=$false)]
+    [string]$RuntimeTmpDir,
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$AnalyzeImports,
+    
+    [Parameter(Mandatory=$false)]
+    [ValidateSet("zlib", "lzma", "lzma-max")]
+    [string]$NsisCompression,
+    
+    [Parameter(Mandatory=$false)]
+    [int]$NsisDictSize,
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$NsisCompare,
+    
+    [Parameter(Mandatory=$false)]
+    [string[]]$QtPlugin = @(),
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$NoChecksums,
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$Reproducible,
+    
+    [Parameter(Mandatory=$false)]
+    [switch]$Watch,
+    
+    [Parameter(Mandatory=$false)]
+    [string]$SharedCache,
+    
+    [Parameter(Mandatory=$false)]
+    [ValidateSet("standard", "dev", "release", "size")]
+    [string]$BuildProfile,
+    
     [Parameter(Mandatory=$false)]
     [switch]$BuildRust,
     
@@ -43,12 +84,6 @@ if ($Clean) {
     if (Test-Path "dist") { Remove-Item -Recurse -Force "dist" }
 }
 
-# Build Rust backend if requested
-if ($BuildRust) {
-    Write-Host "Building Rust cryptography backend..."
-    python "$PSScriptRoot\build_rust.py"
-}
-
 # Construct build command
 $buildCmd = "python $PSScriptRoot\build_package.py"
 
@@ -56,6 +91,22 @@ if ($Portable) { $buildCmd += " --portable" }
 if ($Installer) { $buildCmd += " --installer" }
 if ($NoConsole) { $buildCmd += " --no-console" }
 if ($Fallback) { $buildCmd += " --fallback" }
+if ($Matrix) { $buildCmd += " --matrix" }
+if ($OneDir) { $buildCmd += " --onedir" }
+if ($AnalyzeImports) { $buildCmd += " --analyze-imports --no-cache" }
+if ($NsisCompression) { $buildCmd += " --nsis-compression $NsisCompression" }
+if ($NsisDictSize) { $buildCmd += " --nsis-dict-size $NsisDictSize" }
+if ($NsisCompare) { $buildCmd += " --nsis-compare" }
+if ($NoChecksums) { $buildCmd += " --no-checksums" }
+if ($Reproducible) { $buildCmd += " --reproducible" }
+if ($Watch) { $buildCmd += " --watch" }
+# The Rust backend is built by build_package.py, concurrently with the stages that do not need the DLL
+if ($BuildRust) { $buildCmd += " --build-rust" }
+if ($SharedCache) { $buildCmd += " --shared-cache `"$SharedCache`"" }
+foreach ($plugin in $QtPlugin) { $buildCmd += " --qt-plugin $plugin" }
+if ($RuntimeTmpDir) { $buildCmd += " --runtime-tmpdir `"$RuntimeTmpDir`"" }
+# Without -BuildProfile, build_package.py's default profile applies
+if ($BuildProfile) { $buildCmd += " --profile $BuildProfile" }
 
 # Add logging configuration
 $loggingConfig = "logging=enabled,debug=disabled"
@@ -12,16 +12,18 @@ It also ensures proper icon integration and DLL validation.
 import os
 import sys
 import shutil
-import subprocess
-from pathlib import Path
-import ctypes
-import platform
 import importlib.util
+import functools
 import time
-import stat
 import argparse
 import re # Import re for regex
 
+# Only lightweight modules are imported up front so that --help and fully
+# cached builds start quickly; the cache, runner, DLL and deployment helpers
+# are imported by the stages that use them.
+from ezbuild import trace
+from ezbuild.report import BuildReport, RAN, REUSED, SKIPPED, FAILED, CANCELLED
+
 # Function to get version from src/__init__.py
 def get_version_from_init():
     version_file = os.path.join('src', '__init__.py')
@@ -36,9 +38,13 @@ def get_version_from_init():
     print(f"Could not find __version__ in {version_file}")
     sys.exit(1)
 
+@functools.lru_cache(maxsize=None)
+def get_app_version():
+    """Return the application version, read from src/__init__.py on first use."""
+    return get_version_from_init()
+
 # Configuration
 APP_NAME = "TrueFA-Py"
-APP_VERSION = get_version_from_init() # Read version dynamically
 AUTHOR = "Cheyenne Z"
 COPYRIGHT = "Copyright (c) 2025 Cheyenne Zaini"
 DESCRIPTION = "Secure Two-Factor Authentication Tool"
@@ -47,6 +53,78 @@ WEBSITE = "https://github.com/zainibeats/truefa-py"
 # Icon path - this should point to the icon file in assets directory
 ICON_PATH = os.path.join("assets", "truefa2.ico")
 
+# Build profiles selectable with --profile
+#   upx:       compress binaries with UPX (slows down builds and executable startup)
+#   upx_args:  UPX options (binaries are compressed through the cache in ezbuild/upx.py)
+#   strip:     strip symbol tables from the bundled binaries
+#   optimize:  Python bytecode optimization level (2 also removes docstrings and asserts)
+#   installer: build the NSIS installer when neither --portable nor --installer is given
+#   nsis:      installer compression, an entry of NSIS_COMPRESSION
+# "standard" is what builds produced before profiles existed: UPX with its default
+# options, no stripping and unoptimized bytecode (so asserts and docstrings stay)
+BUILD_PROFILES = {
+    "standard": {"upx": True, "upx_args": "", "strip": False, "optimize": 0, "installer": True,
+                 "nsis": "zlib"},
+    "dev": {"upx": False, "upx_args": "", "strip": False, "optimize": 0, "installer": False,
+            "nsis": "zlib"},
+    "release": {"upx": True, "upx_args": "--best", "strip": True, "optimize": 2, "installer": True,
+                "nsis": "lzma"},
+    "size": {"upx": True, "upx_args": "--best --lzma", "strip": True, "optimize": 2, "installer": True,
+             "nsis": "lzma-max"},
+}
+DEFAULT_PROFILE = "standard"
+
+# NSIS compression profiles selectable with --nsis-compression
+#   compressor: zlib, bzip2 or lzma
+#   solid:      compress all files as one block (better ratio, slower to build)
+#   dict_mb:    LZMA dictionary size in MB (NSIS's default is 8)
+NSIS_COMPRESSION = {
+    "zlib": {"compressor": "zlib", "solid": False, "dict_mb": None},
+    "lzma": {"compressor": "lzma", "solid": True, "dict_mb": 8},
+    "lzma-max": {"compressor": "lzma", "solid": True, "dict_mb": 64},
+}
+
+# Qt plugins kept in GUI builds on top of the platform's own (see ezbuild/qtplugins.py),
+# as "category/name" patterns, e.g. "platforms/qminimal" or "styles/*"
+QT_PLUGIN_ALLOWLIST = []
+
+# PyInstaller excludes per output name, written by --analyze-imports. Commit
+# it with the app; modules imported lazily at runtime go into "keep".
+EXCLUDES_FILE = "build_excludes.json"
+
+# Build timestamp --reproducible uses when SOURCE_DATE_EPOCH is not set and the
+# project is not a git checkout (1980-01-01, the earliest date a zip can hold)
+DEFAULT_SOURCE_DATE_EPOCH = 315532800
+
+# The DLL cargo builds; --build-rust deploys it before PyInstaller runs
+RUST_DLL = os.path.join("rust_crypto", "target", "release", "truefa_crypto.dll")
+
+# How long --watch waits for a burst of saves to end before rebuilding
+WATCH_DEBOUNCE_MS = 300
+
+def get_output_name(use_console=True):
+    """Return the PyInstaller output name (without extension) for the variant."""
+    return f"{APP_NAME}-CLI" if use_console else APP_NAME
+
+def get_bundle_paths(use_console=True, onedir=False, distpath="dist"):
+    """
+    Return where PyInstaller puts the variant's output.
+
+    Returns:
+        tuple: (executable path, output to cache: the executable for one-file
+            builds, the bundle directory for one-dir builds)
+    """
+    output_name = get_output_name(use_console)
+    if onedir:
+        bundle_dir = os.path.join(distpath, output_name)
+        return os.path.join(bundle_dir, f"{output_name}.exe"), bundle_dir
+    exe_path = os.path.join(distpath, f"{output_name}.exe")
+    return exe_path, exe_path
+
+def get_installer_name(use_console=True):
+    """Return the NSIS installer file name for the variant."""
+    return f"{get_output_name(use_console)}_Setup_{get_app_version()}.exe"
+
 def setup_parser():
     """Set up command line argument parser."""
     parser = argparse.ArgumentParser(description="Build TrueFA application")
@@ -55,12 +133,74 @@ def setup_parser():
     parser.add_argument("--installer", action="store_true", 
                         help="Build installer version only")
     parser.add_argument("--clean", action="store_true", 
-                        help="Remove build and dist directories before building")
+                        help="Remove build and dist directories and run PyInstaller with --clean, "
+                             "without restoring it from the build cache (the result is still cached; "
+                             "default is an incremental build with a persistent per-variant workpath)")
     parser.add_argument("--is_installer_build", action="store_true", help=argparse.SUPPRESS)
     parser.add_argument("--no-console", action="store_true", 
                         help="Build GUI version (truefa_gui.py) instead of console version (main.py)")
     parser.add_argument("--fallback", action="store_true", 
                         help="Force use of Python fallback implementation")
+    parser.add_argument("--profile", choices=sorted(BUILD_PROFILES), default=DEFAULT_PROFILE,
+                        help="Build profile: standard (UPX, not stripped, unoptimized bytecode), dev (no UPX, "
+                             "no installer, fast rebuilds), release (UPX --best, stripped, bytecode optimize "
+                             "level 2, which removes asserts and docstrings) or size (UPX --lzma); "
+                             f"default: {DEFAULT_PROFILE}")
+    parser.add_argument("--onedir", action="store_true",
+                        help="Build a one-dir bundle (dist/<name>/<name>.exe plus its libraries) instead of a "
+                             "one-file executable; starts faster because nothing is unpacked at launch")
+    parser.add_argument("--runtime-tmpdir", type=str, default=None,
+                        help="Directory the one-file executable unpacks itself into at launch "
+                             "(default: the system temp directory)")
+    parser.add_argument("--nsis-compression", choices=sorted(NSIS_COMPRESSION), default=None,
+                        help="Installer compression (default: the profile's; zlib for standard and dev, lzma for release, "
+                             "lzma-max for size)")
+    parser.add_argument("--nsis-dict-size", type=int, default=None, metavar="MB",
+                        help="LZMA dictionary size in MB, overriding the compression profile's")
+    parser.add_argument("--nsis-compare", action="store_true",
+                        help="Also compile the installer with every compression profile and report "
+                             "their sizes and compile times")
+    parser.add_argument("--qt-plugin", action="append", default=[], metavar="CATEGORY/NAME",
+                        help="Keep an extra Qt platform or style plugin in GUI builds (repeatable, "
+                             "glob patterns allowed, e.g. platforms/qminimal)")
+    parser.add_argument("--analyze-imports", action="store_true",
+                        help=f"After building, trace the imports of the entry script, compare them with "
+                             f"PyInstaller's xref/warn output and write the resulting excludes to {EXCLUDES_FILE}")
+    parser.add_argument("--trace-seconds", type=float, default=5.0,
+                        help="How long --analyze-imports lets the application run (GUI event loops never exit)")
+    parser.add_argument("--no-checksums", action="store_true",
+                        help="Do not write SHA256SUMS, SHA512SUMS, B2SUMS and checksums.json for the artifacts in dist/")
+    parser.add_argument("--reproducible", action="store_true",
+                        help="Pin SOURCE_DATE_EPOCH (default: the last commit's time) and PYTHONHASHSEED so the "
+                             "same sources give byte-identical executables and installers")
+    parser.add_argument("--verify-reproducible", action="store_true",
+                        help="Build twice with --reproducible in isolated copies of the project (build/reproducible/) "
+                             "and report the first differing byte range of every artifact that differs")
+    parser.add_argument("--build-rust", action="store_true",
+                        help="Build the Rust crate (build_rust.py) as part of this build; the other stages "
+                             "run while cargo compiles and only PyInstaller waits for the DLL")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and rebuild when sources change: Rust sources rebuild and redeploy "
+                             "the DLL, Python sources and assets re-run PyInstaller incrementally")
+    parser.add_argument("--debounce-ms", type=int, default=WATCH_DEBOUNCE_MS,
+                        help=f"With --watch, wait until changes stop for this long before rebuilding "
+                             f"(default: {WATCH_DEBOUNCE_MS})")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll for changes instead of using inotify (e.g. on network drives)")
+    parser.add_argument("--matrix", action="store_true",
+                        help="Build the console/GUI x native/fallback portable executables concurrently "
+                             "into dist/<variant>/")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Maximum concurrent builds for --matrix (capped at the CPU count)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always run PyInstaller and NSIS instead of restoring outputs from the build cache")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Build cache directory (default: per-user cache, or EZBUILD_CACHE_DIR)")
+    parser.add_argument("--cache-size-mb", type=int, default=2048,
+                        help="Maximum build cache size in MB before least recently used entries are evicted")
+    parser.add_argument("--shared-cache", type=str, default=None, metavar="DIR",
+                        help="Build cache shared between agents, e.g. on an NFS or SSHFS mount, used behind "
+                             "the local one (default: EZBUILD_SHARED_CACHE)")
     parser.add_argument("--config-logging", type=str, default="logging=enabled,debug=disabled",
                         help="Configure logging settings (format: logging=[enabled|disabled],debug=[enabled|disabled])")
     return parser
@@ -71,36 +211,18 @@ def check_requirements(check_nsis=False):
     
     requirements = []
     
-    # 1. Check for PyInstaller
-    try:
-        # Try to import PyInstaller directly
-        import PyInstaller
-        print(f"(+) PyInstaller found (version {PyInstaller.__version__})")
-    except ImportError:
-        # Fall back to spec check
-        try:
-            spec = importlib.util.find_spec("PyInstaller")
-            if spec is None:
-                requirements.append("PyInstaller (pip install pyinstaller)")
-            else:
-                print("(+) PyInstaller found")
-        except Exception:
-            requirements.append("PyInstaller (pip install pyinstaller)")
+    # 1. Check for PyInstaller (located and versioned without importing it)
+    if get_toolchain().find("pyinstaller") is None:
+        requirements.append("PyInstaller (pip install pyinstaller)")
+    else:
+        print(f"(+) PyInstaller found (version {get_pyinstaller_version()})")
     
     # 2. Check for NSIS only if requested
     if check_nsis:
-        nsis_found = False
-        nsis_paths = [
-            r"C:\Program Files (x86)\NSIS\makensis.exe",
-            r"C:\Program Files\NSIS\makensis.exe"
-        ]
-        for path in nsis_paths:
-            if os.path.exists(path):
-                nsis_found = True
-                print(f"(+) NSIS found at {path}")
-                break
-        
-        if not nsis_found:
+        nsis_exe = find_makensis()
+        if nsis_exe:
+            print(f"(+) NSIS found at {nsis_exe}")
+        else:
             requirements.append("NSIS (https://nsis.sourceforge.io/Download) - Required for installer build")
     
     # Report any missing requirements
@@ -113,6 +235,30 @@ def check_requirements(check_nsis=False):
     
     return True
 
+@functools.lru_cache(maxsize=None)
+def get_toolchain():
+    """
+    Return the toolchain registry.
+
+    Tool paths and versions are resolved once and cached in the ezbuild cache
+    directory; later runs only stat the recorded executables.
+    """
+    from ezbuild.toolchain import Toolchain
+    return Toolchain()
+
+def find_makensis():
+    """Return the path to makensis.exe, or None if NSIS is not installed."""
+    return get_toolchain().path("makensis")
+
+def get_pyinstaller_version():
+    """Return the installed PyInstaller version without importing it."""
+    return get_toolchain().version("pyinstaller")
+
+def pyinstaller_supports_optimize():
+    """Return True if the installed PyInstaller accepts Analysis(optimize=...) (6.6 and later)."""
+    match = re.match(r"(\d+)\.(\d+)", get_pyinstaller_version())
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= (6, 6)
+
 def check_icon():
     """Check if the icon file exists and is valid."""
     if not os.path.exists(ICON_PATH):
@@ -122,8 +268,31 @@ def check_icon():
     print(f"(+) Using icon: {ICON_PATH}")
     return ICON_PATH
 
+# Functions the Python bindings call in the Rust DLL
+REQUIRED_DLL_FUNCTIONS = [
+    'c_secure_random_bytes',
+    'c_is_vault_unlocked',
+    'c_vault_exists',
+    'c_create_vault',
+    'c_unlock_vault',
+    'c_lock_vault',
+    'c_generate_salt',
+    'c_derive_master_key',
+    'c_encrypt_master_key',
+    'c_decrypt_master_key',
+    'c_verify_signature',
+    'c_create_secure_string'
+]
+
 def check_dll():
-    """Check if the Rust DLL exists and has the required functions."""
+    """
+    Check if the Rust DLL exists and has the required functions.
+
+    The exports are read from the file's PE export table rather than by
+    loading the DLL, so the check also works on non-Windows hosts.
+    """
+    from ezbuild.binexports import BinaryFormatError, find_missing_exports
+
     print("Checking Rust cryptography DLL...")
     
     possible_dll_locations = [
@@ -137,71 +306,119 @@ def check_dll():
         os.path.join("rust_crypto", "target", "release", "truefa_crypto.dll"),
     ]
     
+    # Validate every candidate; identical copies share one cached verdict
+    valid_dlls = []
+    invalid_dll = None
     for dll_path in possible_dll_locations:
         if os.path.exists(dll_path):
             print(f"(+) Found DLL at {dll_path}")
             try:
-                # Load the DLL
-                lib = ctypes.CDLL(dll_path)
-                
-                # Define the list of required functions
-                required_functions = [
-                    'c_secure_random_bytes',
-                    'c_is_vault_unlocked',
-                    'c_vault_exists',
-                    'c_create_vault',
-                    'c_unlock_vault',
-                    'c_lock_vault',
-                    'c_generate_salt',
-                    'c_derive_master_key',
-                    'c_encrypt_master_key',
-                    'c_decrypt_master_key',
-                    'c_verify_signature',
-                    'c_create_secure_string'
-                ]
-                
-                # Check all required functions
-                missing_functions = []
-                for func_name in required_functions:
-                    if not hasattr(lib, func_name):
-                        missing_functions.append(func_name)
+                # Check all required functions against the export table
+                missing_functions = find_missing_exports(dll_path, REQUIRED_DLL_FUNCTIONS)
                 
                 if missing_functions:
-                    print(f"Warning: Missing functions in the DLL: {', '.join(missing_functions)}")
-                    return False, dll_path
+                    print(f"Warning: Missing functions in {dll_path}: {', '.join(missing_functions)}")
+                    invalid_dll = dll_path
                 else:
-                    print("(+) All required functions found in the DLL")
-                    
-                    # Ensure DLL is in both root truefa_crypto and src/truefa_crypto
-                    src_dll_path = os.path.join("src", "truefa_crypto", "truefa_crypto.dll")
-                    root_dll_path = os.path.join("truefa_crypto", "truefa_crypto.dll")
-                    
-                    # Create directories if they don't exist
-                    os.makedirs(os.path.dirname(src_dll_path), exist_ok=True)
-                    os.makedirs(os.path.dirname(root_dll_path), exist_ok=True)
-                    
-                    if os.path.abspath(dll_path) != os.path.abspath(src_dll_path):
-                        print(f"(+) Copying DLL to {src_dll_path}")
-                        shutil.copy2(dll_path, src_dll_path)
-                    
-                    if os.path.abspath(dll_path) != os.path.abspath(root_dll_path):
-                        print(f"(+) Copying DLL to {root_dll_path}")
-                        shutil.copy2(dll_path, root_dll_path)
-                    
-                    return True, dll_path
-                    
-            except Exception as e:
-                print(f"Error loading DLL: {e}")
+                    valid_dlls.append(dll_path)
+            except (BinaryFormatError, OSError) as e:
+                print(f"Error reading DLL exports: {e}")
     
-    print("No valid DLL found")
-    return False, None
+    if not valid_dlls:
+        print("No valid DLL found")
+        return False, invalid_dll
+
+    # Prefer the most recently built DLL (e.g. a fresh rust_crypto/target/release build)
+    dll_path = max(valid_dlls, key=os.path.getmtime)
+    print(f"(+) All required functions found in the DLL: {dll_path}")
+    deploy_dll(dll_path)
+    return True, dll_path
+
+def deploy_dll(dll_path):
+    """
+    Ensure the DLL is in both root truefa_crypto and src/truefa_crypto.
+
+    Destinations that already hold the same content are left untouched, so
+    their mtimes stay stable for PyInstaller and the build cache.
+    """
+    from ezbuild.deploy import UNCHANGED, deploy_file
+
+    for dest in (os.path.join("src", "truefa_crypto", "truefa_crypto.dll"),
+                 os.path.join("truefa_crypto", "truefa_crypto.dll")):
+        if os.path.abspath(dll_path) == os.path.abspath(dest):
+            continue
+        # Never hardlink: cargo rewrites its output, and a DLL loaded from the
+        # source tree must not lock it
+        method = deploy_file(dll_path, dest, allow_hardlink=False)
+        if method == UNCHANGED:
+            print(f"(+) {dest} is up to date")
+        else:
+            print(f"(+) Deployed DLL to {dest} ({method})")
+
+def load_excludes(output_name):
+    """
+    Return the excludes recorded in EXCLUDES_FILE for an output.
+
+    Returns:
+        dict: {"excludes": {module: savings}, "keep": [module, ...]}
+    """
+    import json
+    try:
+        with open(EXCLUDES_FILE, 'r') as f:
+            config = json.load(f).get(output_name, {})
+    except (OSError, ValueError):
+        config = {}
+    return {"excludes": config.get("excludes", {}), "keep": config.get("keep", [])}
+
+def spec_relpath(path, spec_dir):
+    """Return `path` relative to the spec directory, with forward slashes.
+
+    PyInstaller resolves relative paths in a spec file against the spec's own
+    directory, so spec files written outside the project root need this.
+    """
+    return os.path.relpath(path, spec_dir).replace(os.sep, '/')
+
+def strip_binaries(profile):
+    """
+    Return whether the profile's strip setting applies on this platform.
+
+    PyInstaller's strip runs GNU strip over every bundled binary, which it
+    advises against on Windows: it warns per DLL or damages signed and Control
+    Flow Guard DLLs (python3x.dll, the MSVC runtime, truefa_crypto.dll). So
+    stripping is always off there, as it is for ezbuild/upx.py.
+    """
+    return profile["strip"] and sys.platform != "win32"
+
+def create_spec_file(entry_script, icon_path, use_console=True, spec_dir=".",
+                     version_file='file_version_info.txt', pathex=(), profile=None, upx_report=None,
+                     onedir=False, runtime_tmpdir=None, qt_plugins=(), qt_report=None):
+    """
+    Create a PyInstaller spec file for a one-file executable or one-dir bundle.
 
-def create_spec_file(entry_script, icon_path, use_console=True):
-    """Create a PyInstaller spec file for a one-file executable."""
+    Args:
+        entry_script (str): Application entry point
+        icon_path (str): Icon file, or None
+        use_console (bool): Build the console (CLI) variant
+        spec_dir (str): Directory to write the spec file to
+        version_file (str): Version information file referenced by the spec
+        pathex (list): Extra module search paths (e.g. the directory holding _build_env.py)
+        profile (dict): Entry of BUILD_PROFILES (UPX, strip, optimize level)
+        upx_report (str): Where the UPX step writes its per-binary verdicts
+            (default: build/upx/<output name>.json)
+        onedir (bool): Build a one-dir bundle (EXE plus COLLECT) instead of a one-file executable
+        runtime_tmpdir (str): Extraction directory of the one-file executable (None: system temp)
+        qt_plugins (list): Qt plugin patterns to keep in addition to the platform's own
+        qt_report (str): Where the Qt plugin step writes what it kept and pruned
+            (default: build/qt/<output name>.json)
+
+    Returns:
+        str: Path of the spec file
+    """
     print(f"Creating PyInstaller spec file for {'Console' if use_console else 'GUI'} application...")
+    profile = profile or BUILD_PROFILES[DEFAULT_PROFILE]
     
     # Determine output name based on console usage
-    output_name = f"{APP_NAME}-CLI" if use_console else APP_NAME
+    output_name = get_output_name(use_console)
     
     # Determine hidden imports based on GUI or CLI
     hidden_imports = []
@@ -218,25 +435,40 @@ def create_spec_file(entry_script, icon_path, use_console=True):
             # 'PyQt6.plugins.platforms.qwindows', 
         ]
         
+    # Modules the import analysis found unused at runtime (see analyze_imports)
+    excludes = sorted(load_excludes(output_name)["excludes"])
+    if excludes:
+        hidden_imports = [m for m in hidden_imports
+                          if not any(m == e or m.startswith(e + ".") for e in excludes)]
+
     print(f"Using entry script: {entry_script}")
     print(f"Hidden imports: {hidden_imports}")
+    print(f"Excludes: {excludes}")
 
     # Determine datas, add Qt platform plugins for GUI builds
     datas = [
-        ('assets/*', 'assets'),
+        (spec_relpath('assets', spec_dir) + '/*', 'assets'),
     ]
+    qt_patterns = []
     if not use_console:
+        from ezbuild.qtplugins import find_plugins, selected_plugins
+        qt_patterns = selected_plugins(allow=list(QT_PLUGIN_ALLOWLIST) + list(qt_plugins))
         # Attempt to find PyQt6 plugins relative to the package location
+        # (find_spec locates the package without importing Qt)
         try:
-            import PyQt6
-            pyqt6_path = os.path.dirname(PyQt6.__file__)
+            pyqt6_spec = importlib.util.find_spec("PyQt6")
+            if pyqt6_spec is None or not pyqt6_spec.submodule_search_locations:
+                raise ImportError("PyQt6")
+            pyqt6_path = pyqt6_spec.submodule_search_locations[0]
             qt_plugins_path = os.path.join(pyqt6_path, 'Qt6', 'plugins')
-            if os.path.exists(os.path.join(qt_plugins_path, 'platforms')):
-                datas.append((os.path.join(qt_plugins_path, 'platforms'), 'PyQt6/Qt6/plugins/platforms'))
-                print(f"(+) Added Qt platform plugins from: {qt_plugins_path}")
-            if os.path.exists(os.path.join(qt_plugins_path, 'styles')):
-                 datas.append((os.path.join(qt_plugins_path, 'styles'), 'PyQt6/Qt6/plugins/styles'))
-                 print(f"(+) Added Qt style plugins from: {qt_plugins_path}")
+            # Only the plugins selected for this platform (and the allowlist)
+            for plugin_path, category in find_plugins(qt_plugins_path, qt_patterns):
+                try:
+                    plugin_path = spec_relpath(plugin_path, spec_dir)
+                except ValueError:
+                    pass  # On another drive than the spec (Windows); keep the absolute path
+                datas.append((plugin_path, f'PyQt6/Qt6/plugins/{category}'))
+                print(f"(+) Added Qt plugin: {category}/{os.path.basename(plugin_path)}")
         except ImportError:
             print("Warning: PyQt6 not found, cannot automatically add plugins.")
         except Exception as e:
@@ -244,45 +476,114 @@ def create_spec_file(entry_script, icon_path, use_console=True):
             
     print(f"Datas: {datas}")
 
+    entry_path = spec_relpath(entry_script, spec_dir)
+    dll_rel = spec_relpath(os.path.join('truefa_crypto', 'truefa_crypto.dll'), spec_dir)
+    version_path = spec_relpath(version_file, spec_dir)
+    pathex = [spec_relpath(p, spec_dir) for p in pathex]
+    if icon_path:
+        icon_path = spec_relpath(icon_path, spec_dir)
+
     # Use double backslashes for icon path in the spec file string
     safe_icon_path = icon_path.replace("\\\\", "\\\\\\\\").replace("\\", "\\\\") if icon_path else ''
     icon_arg = f"icon=['{safe_icon_path}']" if safe_icon_path else "icon=None" # Handle case where icon is None
+    # Older PyInstaller releases take the optimize level from the interpreter instead (see build_executable)
+    optimize_arg = f"\n    optimize={profile['optimize']}," if pyinstaller_supports_optimize() else ""
+
+    # Strip and compress binaries through the ezbuild UPX cache instead of
+    # PyInstaller's own pass, which recompresses everything on a cold cache
+    # and cannot skip binaries that are not worth compressing
+    upx_tool = get_toolchain().find("upx") if profile['upx'] else None
+    post_analysis = []
+    if qt_patterns:
+        # PyInstaller's Qt hooks collect every platform and style plugin;
+        # drop those this platform never loads
+        qt_report = qt_report or os.path.join("build", "qt", f"{output_name}.json")
+        if os.path.exists(qt_report):
+            os.remove(qt_report)
+        post_analysis.append(f"""
+# Keep only the Qt platform/style plugins this platform loads (see ezbuild/qtplugins.py)
+from ezbuild.qtplugins import prune_plugins
+a.binaries, a.datas = prune_plugins(a.binaries, a.datas, {qt_patterns!r},
+                                    report_path=os.path.join(SPECPATH, {spec_relpath(qt_report, spec_dir)!r}))
+""")
+    if upx_tool:
+        upx_report = upx_report or os.path.join("build", "upx", f"{output_name}.json")
+        if os.path.exists(upx_report):
+            os.remove(upx_report)
+        post_analysis.append(f"""
+# Strip and UPX-compress binaries through the ezbuild cache (see ezbuild/upx.py)
+from ezbuild.upx import compress_binaries
+a.binaries = compress_binaries(a.binaries, {upx_tool['path']!r}, {upx_tool['version']!r},
+                               {profile['upx_args'].split()!r}, strip={profile['strip']},
+                               report_path=os.path.join(SPECPATH, {spec_relpath(upx_report, spec_dir)!r}))
+""")
+    post_analysis_block = ""
+    if post_analysis:
+        # The ezbuild helpers are imported from the project root
+        post_analysis_block = f"""
+import os, sys
+sys.path.insert(0, os.path.join(SPECPATH, {spec_relpath('.', spec_dir)!r}))
+""" + "".join(post_analysis)
+    exe_strip = strip_binaries(profile) and not upx_tool
+    exe_upx = profile['upx'] and not upx_tool
+
+    if onedir:
+        # Binaries and data files are collected next to the executable, so
+        # nothing has to be unpacked at launch
+        exe_inputs = """[],
+    exclude_binaries=True, # Binaries and datas go into the COLLECT directory"""
+        collect_block = f"""
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip={exe_strip},
+    upx={exe_upx},
+    upx_exclude=[],
+    name='{output_name}',
+)
+"""
+    else:
+        exe_inputs = """a.binaries + a.zipfiles + a.datas, # Include binaries and datas for one-file
+    exclude_binaries=False, # Ensure binaries are included"""
+        collect_block = """
+# No COLLECT block needed for one-file builds
+"""
 
     spec_content = f"""# -*- mode: python ; coding: utf-8 -*-
 
 block_cipher = None
 
 a = Analysis(
-    ['{entry_script}'],
-    pathex=[],
-    binaries=[('truefa_crypto\\\\truefa_crypto.dll', '.')],
+    ['{entry_path}'],
+    pathex={pathex},
+    binaries=[('{dll_rel}', '.')],
     datas={datas},
     hiddenimports={hidden_imports},
     hookspath=[],
     hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
+    excludes={excludes},
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
-    noarchive=False,
+    noarchive=False,{optimize_arg}
 )
-
+{post_analysis_block}
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-# Always build a one-file executable
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries + a.zipfiles + a.datas, # Include binaries and datas for one-file
-    exclude_binaries=False, # Ensure binaries are included
+    {exe_inputs}
     name='{output_name}',
     debug=False,
     bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
+    strip={exe_strip},
+    upx={exe_upx},
     upx_exclude=[],
-    runtime_tmpdir=None,
+    runtime_tmpdir={None if onedir else runtime_tmpdir!r},
     console={use_console},
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -290,29 +591,28 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
     {icon_arg},
-    version='file_version_info.txt',
+    version='{version_path}',
 )
-
-# No COLLECT block needed for one-file builds
-"""
+{collect_block}"""
     
     # Write the spec file
-    spec_file = f"{output_name}.spec"
-    with open(spec_file, 'w') as f:
+    spec_file = os.path.join(spec_dir, f"{output_name}.spec")
+    with open(spec_file, 'w', newline='\n') as f:
         f.write(spec_content)
     
     print(f"(+) Created spec file: {spec_file}")
     return spec_file
 
-def create_version_file():
+def create_version_file(version_file='file_version_info.txt'):
     """Create a version file for the Windows executable."""
     print("Creating version information file...")
     
+    app_version = get_app_version()
     version_content = f"""
 VSVersionInfo(
   ffi=FixedFileInfo(
-    filevers=({APP_VERSION.replace('.', ', ')}, 0),
-    prodvers=({APP_VERSION.replace('.', ', ')}, 0),
+    filevers=({app_version.replace('.', ', ')}, 0),
+    prodvers=({app_version.replace('.', ', ')}, 0),
     mask=0x3f,
     flags=0x0,
     OS=0x40004,
@@ -327,29 +627,31 @@ VSVersionInfo(
           u'040904B0',
           [StringStruct(u'CompanyName', u'{AUTHOR}'),
            StringStruct(u'FileDescription', u'{DESCRIPTION}'),
-           StringStruct(u'FileVersion', u'{APP_VERSION}'),
+           StringStruct(u'FileVersion', u'{app_version}'),
            StringStruct(u'InternalName', u'{APP_NAME}'),
            StringStruct(u'LegalCopyright', u'{COPYRIGHT}'),
            StringStruct(u'OriginalFilename', u'{APP_NAME}.exe'),
            StringStruct(u'ProductName', u'{APP_NAME}'),
-           StringStruct(u'ProductVersion', u'{APP_VERSION}')])
+           StringStruct(u'ProductVersion', u'{app_version}')])
       ]),
     VarFileInfo([VarStruct(u'Translation', [1033, 1200])])
   ]
 )
 """
     
-    with open('file_version_info.txt', 'w') as f:
+    with open(version_file, 'w', newline='\n') as f:
         f.write(version_content)
     
     print("(+) Created version information file")
+    return version_file
 
-def configure_logging_settings(config_str):
+def configure_logging_settings(config_str, env_file='_build_env.py'):
     """
     Configure logging settings in the source code based on config string.
     
     Args:
         config_str (str): Configuration string in format "logging=enabled|disabled,debug=enabled|disabled"
+        env_file (str): Path of the generated build environment module
         
     Returns:
         tuple: (logging_enabled, debug_enabled) boolean values
@@ -377,8 +679,7 @@ def configure_logging_settings(config_str):
           f"debug={'enabled' if debug_enabled else 'disabled'}")
     
     # Create a temporary environment file that will be included in the build
-    env_file = '_build_env.py'
-    with open(env_file, 'w') as f:
+    with open(env_file, 'w', newline='\n') as f:
         f.write(f"""# Build-time environment settings
 # This file is generated during the build process and should not be edited manually
 LOGGING_ENABLED = {logging_enabled}
@@ -413,49 +714,646 @@ def setup_environment(use_fallback, logging_enabled=True, debug_enabled=False):
         os.environ.pop("TRUEFA_DEBUG", None)
         print("Debug mode disabled")
 
-def build_executable(spec_file):
-    """Build the executable using PyInstaller."""
+def get_source_date_epoch():
+    """Return SOURCE_DATE_EPOCH, defaulting to the time of the last git commit."""
+    if os.environ.get("SOURCE_DATE_EPOCH"):
+        return os.environ["SOURCE_DATE_EPOCH"]
+    import subprocess
+    try:
+        result = subprocess.run(["git", "log", "-1", "--format=%ct"], capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.strip().isdigit():
+            return result.stdout.strip()
+    except OSError:
+        pass
+    return str(DEFAULT_SOURCE_DATE_EPOCH)
+
+def setup_reproducible():
+    """
+    Pin the inputs that otherwise differ from build to build.
+
+    PyInstaller writes SOURCE_DATE_EPOCH into the executable's PE header
+    instead of the current time, and PYTHONHASHSEED fixes the order of sets
+    while it collects and compiles modules. Both are inherited by the
+    PyInstaller (and matrix worker) processes.
+
+    Returns:
+        dict: The pinned values
+    """
+    pinned = {"SOURCE_DATE_EPOCH": get_source_date_epoch(), "PYTHONHASHSEED": "0"}
+    os.environ.update(pinned)
+    print(f"(+) Reproducible build: SOURCE_DATE_EPOCH={pinned['SOURCE_DATE_EPOCH']}, PYTHONHASHSEED=0")
+    return pinned
+
+def verify_reproducible(build_args):
+    """
+    Build twice in isolated copies of the project and compare the artifacts.
+
+    Args:
+        build_args (list): build_package.py arguments for both builds
+
+    Returns:
+        bool: True if both builds produced byte-identical artifacts
+    """
+    from ezbuild.reproducible import verify, write_report
+
+    # Both builds must see the same timestamp; the copies are not git checkouts
+    env = dict(os.environ, SOURCE_DATE_EPOCH=get_source_date_epoch())
+    result = verify(os.path.basename(__file__), list(build_args) + ["--no-cache"], env=env)
+    report_path = write_report(result)
+
+    print("\n----- Reproducibility -----")
+    if "error" in result:
+        print(f"Error: {result['error']}")
+        return False
+    for name, entry in result["files"].items():
+        if entry["status"] == "identical":
+            print(f"(+) {name}: identical ({entry['size']} bytes)")
+        elif entry["status"] == "differs":
+            hint = f" [{entry['hint']}]" if entry["hint"] else ""
+            print(f"{name}: differs at bytes 0x{entry['start']:x}-0x{entry['end']:x} "
+                  f"({entry['end'] - entry['start']} bytes){hint}; sizes {entry['size'][0]} and {entry['size'][1]}")
+        else:
+            print(f"{name}: {entry['status']}")
+    if not result["files"]:
+        print("Error: The builds produced no artifacts")
+    print(f"{'Builds are reproducible' if result['identical'] else 'Builds differ'} (details: {report_path})")
+    return result["identical"]
+
+def get_variant_name(use_console=True, use_fallback=False):
+    """Return a short name for the build variant, e.g. "cli-native"."""
+    return f"{'cli' if use_console else 'gui'}-{'fallback' if use_fallback else 'native'}"
+
+def get_dependency_digest():
+    """
+    Hash the name and version of every installed distribution.
+
+    Returns:
+        str: Digest that changes whenever a dependency is added, removed or upgraded
+    """
+    from importlib.metadata import distributions
+    from ezbuild.cache import Fingerprint
+
+    fp = Fingerprint("dependencies")
+    fp.add_text("python", sys.version)
+    names = sorted(f"{d.metadata['Name']}=={d.version}" for d in distributions())
+    fp.add_text("distributions", "\n".join(names))
+    return fp.hexdigest()
+
+def get_workpath_name(variant, profile_name, onedir=False):
+    """Return the workpath directory name, e.g. "cli-native-release" or "cli-native-release-onedir"."""
+    return f"{variant}-{profile_name}{'-onedir' if onedir else ''}"
+
+def prepare_workpath(variant, spec_file):
+    """
+    Return the persistent PyInstaller workpath for a variant.
+
+    PyInstaller keeps its analysis and PYZ caches in the workpath, so reusing
+    it skips most of the analysis phase on rebuilds. The workpath is wiped
+    only when the installed dependencies or the spec file change.
+    """
+    from ezbuild.cache import Fingerprint
+
+    workpath = os.path.join("build", "pyinstaller", variant)
+    stamp_file = os.path.join(workpath, ".ezbuild-stamp")
+
+    fp = Fingerprint("workpath")
+    fp.add_text("dependencies", get_dependency_digest())
+    fp.add_file(spec_file)
+    stamp = fp.hexdigest()
+
+    previous = None
+    if os.path.exists(stamp_file):
+        with open(stamp_file, 'r') as f:
+            previous = f.read().strip()
+
+    if previous != stamp:
+        if os.path.isdir(workpath):
+            print(f"Dependencies or spec changed, resetting workpath {workpath}")
+            shutil.rmtree(workpath)
+        os.makedirs(workpath, exist_ok=True)
+        with open(stamp_file, 'w') as f:
+            f.write(stamp)
+    else:
+        print(f"(+) Reusing PyInstaller workpath {workpath}")
+    return workpath
+
+def pyinstaller_cache_key(spec_file, entry_script, version_file, env_file='_build_env.py', profile=None):
+    """
+    Fingerprint every input of the PyInstaller stage.
+
+    The profile is part of the key because on older PyInstaller releases its
+    optimize level is not written to the spec file.
+
+    Returns:
+        str: Cache key for the build cache
+    """
+    import platform
+    from ezbuild.cache import Fingerprint
+
+    fp = Fingerprint("pyinstaller")
+    fp.add_text("python", sys.version)
+    get_toolchain().add_to_fingerprint(fp, "pyinstaller", "upx")
+    fp.add_text("platform", f"{sys.platform}-{platform.machine()}")
+    fp.add_text("profile", sorted((profile or BUILD_PROFILES[DEFAULT_PROFILE]).items()))
+    for var in ("TRUEFA_USE_FALLBACK", "TRUEFA_LOG", "TRUEFA_DEBUG", "SOURCE_DATE_EPOCH", "PYTHONHASHSEED"):
+        fp.add_text(var, os.environ.get(var, ""))
+    fp.add_file(entry_script)
+    fp.add_tree("src")
+    fp.add_tree("assets")
+    fp.add_file(spec_file)
+    fp.add_file(version_file)
+    fp.add_file(env_file)
+    fp.add_file(os.path.join("truefa_crypto", "truefa_crypto.dll"))
+    return fp.hexdigest()
+
+def installer_cache_key(nsis_script, exe_path, icon_path):
+    """
+    Fingerprint every input of the NSIS stage.
+
+    `exe_path` is the one-file executable or the one-dir bundle directory.
+
+    Returns:
+        str: Cache key for the build cache
+    """
+    from ezbuild.cache import Fingerprint
+
+    fp = Fingerprint("nsis")
+    get_toolchain().add_to_fingerprint(fp, "makensis")
+    fp.add_file(nsis_script)
+    if os.path.isdir(exe_path):
+        fp.add_tree(exe_path)
+    else:
+        fp.add_file(exe_path)
+    fp.add_file(icon_path)
+    fp.add_file("LICENSE")
+    return fp.hexdigest()
+
+class PyInstallerPhases:
+    """
+    Turn PyInstaller's "checking <target>" log lines into trace spans.
+
+    PyInstaller processes Analysis, PYZ, PKG and EXE in order and logs a
+    "checking" line when it starts each one. UPX compression happens while
+    the PKG archive is assembled, so it shows up under the pkg phase.
+    """
+
+    MARKER = re.compile(r"INFO: checking (Analysis|PYZ|PKG|EXE|COLLECT)")
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.current = None
+        self.start = None
+
+    def __call__(self, line):
+        match = self.MARKER.search(line)
+        if match:
+            self.close()
+            self.current = match.group(1).lower()
+            self.start = time.time()
+
+    def close(self):
+        if self.current:
+            trace.record(f"{self.prefix}:{self.current}", self.start, time.time() - self.start)
+            self.current = None
+
+def record_upx_report(path, report):
+    """Add a summary of the UPX step's per-binary verdicts to the build report."""
+    import json
+    with open(path, 'r') as f:
+        upx = json.load(f)
+    binaries = upx.get("binaries", [])
+    report.set("upx", {
+        "version": upx.get("upx_version"),
+        "args": upx.get("upx_args"),
+        "saved_bytes": upx.get("saved_bytes", 0),
+        "compressed": sorted(b["name"] for b in binaries if b["action"] == "compress"),
+        "not_compressed": {b["name"]: b.get("reason", b["action"])
+                           for b in binaries if b["action"] != "compress"},
+        "from_cache": sum(1 for b in binaries if b.get("cached")),
+    })
+
+def analyze_imports(entry_script, use_console, workpath, report, seconds=5.0):
+    """
+    Derive a minimal excludes list from a runtime import trace and PyInstaller's graph.
+
+    Runs the entry script under an import tracer, compares the modules it
+    imports with PyInstaller's xref/warn files from the last build in
+    `workpath`, and records the excludes (with the size and one-file
+    extraction time each one saves) in EXCLUDES_FILE for the next build.
+
+    Returns:
+        bool: True if the analysis ran
+    """
+    import json
+    from ezbuild.imports import TraceError, analyze
+
+    output_name = get_output_name(use_console)
+    # PyInstaller writes its graph files to <workpath>/<spec name>/
+    xref_path = os.path.join(workpath, output_name, f"xref-{output_name}.html")
+    warn_path = os.path.join(workpath, output_name, f"warn-{output_name}.txt")
+    if not os.path.exists(xref_path):
+        print(f"Warning: {xref_path} not found; run with --no-cache so PyInstaller analyzes the app")
+        return False
+
+    config = load_excludes(output_name)
+    print(f"Tracing imports of {entry_script} ({seconds:g}s)...")
+    try:
+        result = analyze(entry_script, xref_path, warn_path, keep=config["keep"],
+                         previous=config["excludes"], seconds=seconds)
+    except TraceError as e:
+        print(f"Error analyzing imports: {e}")
+        return False
+
+    try:
+        with open(EXCLUDES_FILE, 'r') as f:
+            all_configs = json.load(f)
+    except (OSError, ValueError):
+        all_configs = {}
+    all_configs[output_name] = {"excludes": result["excludes"], "keep": config["keep"]}
+    with open(EXCLUDES_FILE, 'w') as f:
+        json.dump(all_configs, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    details_path = os.path.join("build", "imports", f"{output_name}.json")
+    os.makedirs(os.path.dirname(details_path), exist_ok=True)
+    with open(details_path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    excludes = result["excludes"]
+    print(f"(+) {result['traced_modules']} modules imported at runtime, "
+          f"{result['graph_modules']} in PyInstaller's graph")
+    for name, savings in sorted(excludes.items(), key=lambda kv: kv[1]["size_bytes"], reverse=True):
+        print(f"    exclude {name:<40} {savings['size_bytes'] / 1024:9.1f} KB "
+              f"{savings['extract_ms']:7.2f} ms  ({savings['modules']} modules)")
+    for name in result["dropped"]:
+        print(f"    no longer excluded: {name} (imported at runtime)")
+    for name, importers in result["missing"].items():
+        print(f"Warning: {name} is imported at runtime but not bundled"
+              + (f" (imported by {', '.join(importers)})" if importers else ""))
+    print(f"(+) Wrote {len(excludes)} excludes to {EXCLUDES_FILE}; they apply from the next build")
+
+    report.set("imports", {
+        "excludes": sorted(excludes),
+        "saved_bytes": sum(e["size_bytes"] for e in excludes.values()),
+        "saved_extract_ms": round(sum(e["extract_ms"] for e in excludes.values()), 2),
+        "dropped": result["dropped"],
+        "missing": sorted(result["missing"]),
+        "details": details_path,
+    })
+    return True
+
+def record_qt_report(path, report, onedir=False):
+    """
+    Add what the Qt plugin step kept and pruned to the build report.
+
+    For one-file builds the pruned bytes are also converted into the
+    extraction time they save at every launch, using this machine's
+    decompress-and-write throughput.
+    """
+    import json
+    from ezbuild.imports import extraction_throughput
+
+    with open(path, 'r') as f:
+        qt = json.load(f)
+    saved = qt.get("saved_bytes", 0)
+    summary = {
+        "patterns": qt.get("patterns", []),
+        "kept": sorted(qt.get("kept", {})),
+        "pruned": sorted(qt.get("pruned", {})),
+        "saved_bytes": saved,
+    }
+    if not onedir:
+        summary["saved_extract_ms"] = round(saved / extraction_throughput() * 1000, 2)
+    print(f"(+) Qt plugins: pruned {len(summary['pruned'])} ({saved / 1024 / 1024:.1f} MB"
+          + (f", ~{summary['saved_extract_ms']:.0f} ms less unpacking per launch)" if not onedir else ")"))
+    report.set("qt_plugins", summary)
+
+def build_executable(spec_file, cache=None, cache_key=None, outputs=(), workpath=None, clean=False,
+                     distpath=None, log_name="pyinstaller", progress="auto", profile=None):
+    """
+    Build the executable using PyInstaller.
+
+    When a build cache and key are given, the outputs are restored from the
+    cache on a hit and stored in it after a successful build. `workpath`
+    keeps PyInstaller's intermediate files between runs; `clean` discards
+    them first and skips the cache lookup, so PyInstaller always runs (its
+    outputs are still stored). `distpath` overrides PyInstaller's default `dist` directory.
+    For PyInstaller releases without Analysis(optimize=...), `profile`
+    supplies the interpreter's optimize flag. An output may be a directory
+    (a one-dir bundle); it is cached with all of its files.
+
+    PyInstaller's output is streamed to build/logs/<log_name>.log.gz; only
+    the last lines are kept in memory and printed on failure.
+
+    Returns:
+        str: RAN or REUSED on success, False on failure
+    """
+    # A one-dir bundle is replaced as a whole, by the cache or by PyInstaller's
+    # COLLECT step; files left over from another build must not survive
+    for path in outputs:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+    if cache and cache_key and not clean and cache.restore(cache_key):
+        print(f"(+) Restored {', '.join(outputs)} from build cache")
+        return REUSED
+
     print(f"Building executable from {spec_file}...")
+    from ezbuild.runner import run_streaming
     
     try:
         # Run PyInstaller
-        result = subprocess.run(
-            [sys.executable, "-m", "PyInstaller", spec_file, "--clean"],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        
-        print("(+) PyInstaller build completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
+        profile = profile or BUILD_PROFILES[DEFAULT_PROFILE]
+        cmd = [sys.executable]
+        if profile["optimize"] and not pyinstaller_supports_optimize():
+            cmd.append("-" + "O" * profile["optimize"])
+        cmd += ["-m", "PyInstaller", spec_file, "--noconfirm"]
+        if workpath:
+            cmd += ["--workpath", workpath]
+        if distpath:
+            cmd += ["--distpath", distpath]
+        if clean:
+            cmd.append("--clean")
+        phases = PyInstallerPhases(log_name)
+        result = run_streaming(cmd, log_name, progress=progress, on_line=phases)
+        phases.close()
+    except OSError as e:
         print(f"Error building executable: {e}")
-        print(f"Output: {e.stdout}")
-        print(f"Error: {e.stderr}")
+        if cache and cache_key:
+            cache.release(cache_key)
         return False
 
-def create_nsis_script(icon_path, has_console=False):
-    """Create an NSIS script for the installer."""
+    if not result.ok:
+        print(f"Error building executable: PyInstaller exited with code {result.returncode}")
+        print(f"Output (last {len(result.tail)} lines):\n{result.format_tail()}")
+        print(f"Full log: {result.log_path}")
+        if cache and cache_key:
+            # Other agents waiting on a shared cache build it themselves
+            cache.release(cache_key)
+        return False
+
+    print("(+) PyInstaller build completed successfully")
+    if cache and cache_key:
+        cache.store(cache_key, outputs)
+    return RAN
+
+def generate_spec(args, entry_script, icon_path):
+    """Write the PyInstaller spec for the variant selected by the arguments."""
+    return create_spec_file(entry_script, icon_path, use_console=not args.no_console,
+                            profile=BUILD_PROFILES[args.profile], onedir=args.onedir,
+                            runtime_tmpdir=args.runtime_tmpdir, qt_plugins=args.qt_plugin)
+
+def run_pyinstaller(args, entry_script, spec_file, version_file, cache, report, clean=None):
+    """
+    Run PyInstaller on a generated spec and record the result.
+
+    The cache key is computed here, when the stage starts, so it covers the
+    DLL deployed just before.
+
+    Args:
+        clean (bool): Discard the workpath first (default: args.clean)
+
+    Returns:
+        tuple: (RAN, REUSED or False, executable path, output path, workpath)
+    """
+    use_console = not args.no_console
+    profile = BUILD_PROFILES[args.profile]
+    exe_path, output = get_bundle_paths(use_console, args.onedir)
+    with trace.span("fingerprint inputs"):
+        cache_key = pyinstaller_cache_key(spec_file, entry_script, version_file, profile=profile) if cache else None
+        variant = get_variant_name(use_console, args.fallback)
+        workpath = prepare_workpath(get_workpath_name(variant, args.profile, args.onedir), spec_file)
+    with trace.span(f"pyinstaller-{variant}"):
+        status = build_executable(spec_file, cache, cache_key, outputs=[output], workpath=workpath,
+                                  clean=args.clean if clean is None else clean,
+                                  log_name=f"pyinstaller-{variant}", profile=profile)
+    if status:
+        report.stage("pyinstaller", status, exe_path if status == RAN else f"{exe_path} (build cache)")
+        upx_report = os.path.join("build", "upx", f"{get_output_name(use_console)}.json")
+        if status == RAN and os.path.exists(upx_report):
+            record_upx_report(upx_report, report)
+
+        qt_report = os.path.join("build", "qt", f"{get_output_name(use_console)}.json")
+        if status == RAN and not use_console and os.path.exists(qt_report):
+            record_qt_report(qt_report, report, onedir=args.onedir)
+
+        # Clean up intermediate files (kept after a failure, for debugging)
+        if spec_file and os.path.exists(spec_file):
+            os.remove(spec_file)
+        if version_file and os.path.exists(version_file):
+            os.remove(version_file)
+    else:
+        report.stage("pyinstaller", FAILED)
+    return status, exe_path, output, workpath
+
+def build_bundle(args, entry_script, icon_path, cache, report, clean=None):
+    """
+    Generate the spec and version files and run PyInstaller for one variant.
+
+    Used by --watch, which calls it again on every Python change: the
+    variant's workpath is kept, so PyInstaller only re-analyzes what changed.
+
+    Returns:
+        tuple: As run_pyinstaller()
+    """
+    with trace.span("generate spec and version file"):
+        spec_file = generate_spec(args, entry_script, icon_path)
+        version_file = create_version_file()
+    return run_pyinstaller(args, entry_script, spec_file, version_file, cache, report, clean=clean)
+
+def build_variant(job):
+    """
+    Build one variant of the matrix in isolation.
+
+    Runs in a worker process: every generated file (spec, version file,
+    _build_env.py) lives in the variant's own directory under build/matrix,
+    and PyInstaller gets its own workpath and distpath, so concurrent
+    variants never write to the same file.
+
+    Args:
+        job (dict): use_console, use_fallback, icon_path, config_logging,
+            cache_dir, cache_size_mb, shared_cache, no_cache, clean, profile, onedir, runtime_tmpdir and qt_plugins
+
+    Returns:
+        tuple: (variant name, status, executable path, trace spans)
+    """
+    variant = get_variant_name(job["use_console"], job["use_fallback"])
+    profile = BUILD_PROFILES[job["profile"]]
+    variant_dir = os.path.join("build", "matrix", variant)
+    distpath = os.path.join("dist", variant)
+    os.makedirs(variant_dir, exist_ok=True)
+    print(f"[{variant}] Starting build")
+    # Forked workers inherit the parent's spans; only report our own
+    trace.reset()
+
+    with trace.span(f"generate files:{variant}"):
+        env_file = os.path.join(variant_dir, '_build_env.py')
+        logging_enabled, debug_enabled = configure_logging_settings(job["config_logging"], env_file=env_file)
+        setup_environment(job["use_fallback"], logging_enabled, debug_enabled)
+
+        entry_script = 'main.py' if job["use_console"] else 'truefa_gui.py'
+        version_file = create_version_file(os.path.join(variant_dir, 'file_version_info.txt'))
+        spec_file = create_spec_file(entry_script, job["icon_path"], use_console=job["use_console"],
+                                     spec_dir=variant_dir, version_file=version_file,
+                                     pathex=[variant_dir], profile=profile,
+                                     upx_report=os.path.join(variant_dir, 'upx.json'),
+                                     onedir=job["onedir"], runtime_tmpdir=job["runtime_tmpdir"],
+                                     qt_plugins=job["qt_plugins"],
+                                     qt_report=os.path.join(variant_dir, 'qt.json'))
+    exe_path, output = get_bundle_paths(job["use_console"], job["onedir"], distpath)
+
+    cache = None
+    cache_key = None
+    if not job["no_cache"]:
+        from ezbuild.cache import open_cache
+        cache = open_cache(job["cache_dir"], job["cache_size_mb"] * 1024 * 1024, job["shared_cache"])
+        cache_key = pyinstaller_cache_key(spec_file, entry_script, version_file, env_file, profile)
+
+    workpath = prepare_workpath(get_workpath_name(variant, job["profile"], job["onedir"]), spec_file)
+    # Several workers share the terminal, so report progress as heartbeats
+    with trace.span(f"pyinstaller-{variant}"):
+        status = build_executable(spec_file, cache, cache_key, outputs=[output],
+                                  workpath=workpath, clean=job["clean"], distpath=distpath,
+                                  log_name=f"pyinstaller-{variant}", progress="heartbeat",
+                                  profile=profile)
+    print(f"[{variant}] {'Finished' if status else 'Failed'}")
+    return variant, status, exe_path, trace.events()
+
+def build_matrix(args, icon_path, dll_ok, report):
+    """
+    Build the console/GUI x native/fallback variants concurrently.
+
+    Returns:
+        tuple: (True if every variant built successfully, outputs of the variants that did)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = []
+    for use_console in (True, False):
+        for use_fallback in (False, True):
+            variant = get_variant_name(use_console, use_fallback)
+            if not use_fallback and not dll_ok:
+                print(f"Skipping {variant}: no valid Rust DLL")
+                report.stage(f"pyinstaller:{variant}", SKIPPED)
+                continue
+            jobs.append({
+                "use_console": use_console,
+                "use_fallback": use_fallback,
+                "icon_path": icon_path,
+                "config_logging": args.config_logging,
+                "cache_dir": args.cache_dir,
+                "cache_size_mb": args.cache_size_mb,
+                "shared_cache": args.shared_cache,
+                "no_cache": args.no_cache,
+                "clean": args.clean,
+                "profile": args.profile,
+                "onedir": args.onedir,
+                "runtime_tmpdir": args.runtime_tmpdir,
+                "qt_plugins": args.qt_plugin,
+            })
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(len(jobs), args.jobs or cpu_count, cpu_count))
+    print(f"\n----- Building {len(jobs)} variants with {workers} worker(s) -----")
+
+    ok = True
+    outputs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job, (variant, status, exe_path, worker_events) in zip(jobs, pool.map(build_variant, jobs)):
+            trace.extend(worker_events)
+            report.stage(f"pyinstaller:{variant}", status or FAILED,
+                         exe_path if status != REUSED else f"{exe_path} (build cache)")
+            ok = ok and bool(status)
+            if status:
+                outputs.append(get_bundle_paths(job["use_console"], job["onedir"],
+                                                os.path.join("dist", variant))[1])
+    return ok, outputs
+
+def nsis_bundle_commands(bundle_dir):
+    """
+    Return the NSIS install and uninstall commands for a one-dir bundle.
+
+    The uninstaller deletes exactly the files and directories of the bundle
+    instead of `RMDir /r "$INSTDIR"`, which would also wipe unrelated files
+    if the user picked an existing directory.
+
+    Returns:
+        tuple: (install commands, uninstall commands), each a string of NSIS lines
+    """
+    source = bundle_dir.replace('/', '\\')
+    files, dirs = [], []
+    for dirpath, dirnames, filenames in os.walk(bundle_dir):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, bundle_dir)
+        if rel_dir != ".":
+            dirs.append(rel_dir.replace(os.sep, '\\'))
+        for name in sorted(filenames):
+            files.append(os.path.normpath(os.path.join(rel_dir, name)).replace(os.sep, '\\'))
+
+    install = f'File /r "{source}\\*.*"'
+    uninstall = [f'Delete "$INSTDIR\\{f}"' for f in files]
+    # Deepest directories first, so each is empty when it is removed
+    uninstall += [f'RMDir "$INSTDIR\\{d}"' for d in sorted(dirs, key=lambda d: d.count('\\'), reverse=True)]
+    return install, "\n  ".join(uninstall)
+
+def nsis_compression_commands(compression):
+    """
+    Return the NSIS commands selecting the installer compression.
+
+    Args:
+        compression (dict): Entry of NSIS_COMPRESSION
+
+    Returns:
+        str: SetCompressor (and SetCompressorDictSize) lines
+    """
+    commands = f"SetCompressor {'/SOLID ' if compression['solid'] else ''}{compression['compressor']}"
+    if compression["compressor"] == "lzma" and compression.get("dict_mb"):
+        commands += f"\nSetCompressorDictSize {compression['dict_mb']}"
+    return commands
+
+def create_nsis_script(icon_path, has_console=False, bundle_dir=None, compression=None,
+                       script_path='installer.nsi', outfile=None, reproducible=False):
+    """
+    Create an NSIS script for the installer.
+
+    Args:
+        icon_path (str): Installer icon, or None
+        has_console (bool): Package the console (CLI) variant
+        bundle_dir (str): One-dir bundle to install (None: the one-file executable in dist/)
+        compression (dict): Entry of NSIS_COMPRESSION (default: the default profile's)
+        script_path (str): Where to write the script (makensis resolves paths relative to it)
+        outfile (str): Installer to write (default: dist/<installer name>)
+        reproducible (bool): Do not store the files' modification times in the installer
+    """
     print("Creating NSIS installer script...")
+    compression = compression or NSIS_COMPRESSION[BUILD_PROFILES[DEFAULT_PROFILE]["nsis"]]
     
     # Determine base name for exe and installer file based on console flag
-    exe_name = f"{APP_NAME}-CLI.exe" if has_console else f"{APP_NAME}.exe"
-    installer_file_base = f"{APP_NAME}-CLI" if has_console else APP_NAME
-    installer_outfile = f"dist\\{installer_file_base}_Setup_{APP_VERSION}.exe"
+    exe_name = f"{get_output_name(has_console)}.exe"
+    installer_outfile = (outfile or f"dist\\{get_installer_name(has_console)}").replace('/', '\\')
+    if bundle_dir:
+        install_files, uninstall_files = nsis_bundle_commands(bundle_dir)
+    else:
+        install_files = f'File "dist\\{exe_name}"'
+        uninstall_files = f'Delete "$INSTDIR\\{exe_name}"'
     
     # Ensure icon path uses backslashes for NSIS
     nsis_icon_path = icon_path.replace('/', '\\') if icon_path else ''
+    # Escape outside the f-string: backslashes in f-string expressions need Python 3.12+
+    nsis_outfile = installer_outfile.replace('\\', '\\\\')
+    # File times would make every installer build differ
+    date_save = "\nSetDateSave off" if reproducible else ""
 
     nsis_script = f"""
 ; TrueFA Installer Script
 Unicode True
+{nsis_compression_commands(compression)}{date_save}
 
 !include "MUI2.nsh"
 !include "FileFunc.nsh"
 
 ; Application information
 !define PRODUCT_NAME "{APP_NAME}"
-!define PRODUCT_VERSION "{APP_VERSION}"
+!define PRODUCT_VERSION "{get_app_version()}"
 !define PRODUCT_PUBLISHER "{AUTHOR}"
 !define PRODUCT_WEB_SITE "{WEBSITE}"
 !define PRODUCT_DIR_REGKEY "Software\\Microsoft\\Windows\\CurrentVersion\\App Paths\\{exe_name}"
@@ -482,7 +1380,7 @@ Unicode True
 
 ; Installer Information
 Name "${{PRODUCT_NAME}}{' CLI' if has_console else ''} ${{PRODUCT_VERSION}}\"
-OutFile "{installer_outfile.replace('\\', '\\\\')}\"
+OutFile "{nsis_outfile}\"
 InstallDir "$PROGRAMFILES\\${{PRODUCT_NAME}}{' CLI' if has_console else ''}\"
 InstallDirRegKey HKLM "${{PRODUCT_DIR_REGKEY}}" ""
 ShowInstDetails show
@@ -491,8 +1389,8 @@ ShowUnInstDetails show
 Section "MainSection" SEC01
   SetOutPath "$INSTDIR"
   
-  ; Add files (if one-file mode)
-  File "dist\\{exe_name}"
+  ; Add files (the one-file executable, or the whole one-dir bundle)
+  {install_files}
   
   ; Create shortcuts
   CreateDirectory "$SMPROGRAMS\\${{PRODUCT_NAME}}"
@@ -524,7 +1422,7 @@ Section "Uninstall"
   RMDir "$SMPROGRAMS\\${{PRODUCT_NAME}}"
   
   ; Remove files
-  Delete "$INSTDIR\\{exe_name}"
+  {uninstall_files}
   Delete "$INSTDIR\\uninstall.exe"
   
   ; Remove directories
@@ -536,152 +1434,602 @@ Section "Uninstall"
 SectionEnd
 """
     
-    with open('installer.nsi', 'w') as f:
+    with open(script_path, 'w', newline='\n') as f:
         f.write(nsis_script)
     
     print("(+) Created NSIS installer script")
-    return 'installer.nsi'
+    return script_path
+
+def get_nsis_compression(name, dict_mb=None):
+    """Return the NSIS_COMPRESSION entry `name`, with the LZMA dictionary size overridden if given."""
+    compression = dict(NSIS_COMPRESSION[name])
+    if dict_mb and compression["compressor"] == "lzma":
+        compression["dict_mb"] = dict_mb
+    return compression
+
+def compare_nsis_compression(icon_path, has_console, bundle_dir=None, dict_mb=None):
+    """
+    Compile the installer once per NSIS_COMPRESSION profile.
+
+    The installers go to build/nsis/<profile>/ and are not cached, so the
+    compile times are real. `dict_mb` overrides the LZMA dictionary size as
+    it does for the real installer (see get_nsis_compression()).
+
+    Returns:
+        dict: profile name -> {"size_bytes", "compile_seconds"} (None values if makensis failed)
+    """
+    results = {}
+    for name in NSIS_COMPRESSION:
+        outfile = os.path.join("build", "nsis", name, get_installer_name(has_console))
+        os.makedirs(os.path.dirname(outfile), exist_ok=True)
+        script = create_nsis_script(icon_path, has_console=has_console, bundle_dir=bundle_dir,
+                                    compression=get_nsis_compression(name, dict_mb),
+                                    script_path=f"installer-{name}.nsi", outfile=outfile)
+        start = time.perf_counter()
+        with trace.span(f"makensis:{name}"):
+            status = build_installer(script, log_name=f"makensis-{name}")
+        seconds = time.perf_counter() - start
+        os.remove(script)
+        results[name] = {
+            "size_bytes": os.path.getsize(outfile) if status and os.path.exists(outfile) else None,
+            "compile_seconds": round(seconds, 3) if status else None,
+        }
+
+    print("\nInstaller compression comparison:")
+    for name, result in results.items():
+        if result["size_bytes"] is None:
+            print(f"  {name:<10} failed")
+        else:
+            print(f"  {name:<10} {result['size_bytes'] / 1024 / 1024:8.2f} MB  {result['compile_seconds']:7.2f}s")
+    return results
+
+def build_installer(nsis_script, cache=None, cache_key=None, outputs=(), log_name="makensis"):
+    """
+    Build the installer using NSIS.
+
+    makensis is found on PATH (Linux distributions and Homebrew package it)
+    or in the NSIS install directory on Windows, so installers can be built
+    on any host.
+
+    Returns:
+        str: RAN or REUSED on success, False on failure
+    """
+    if cache and cache_key and cache.restore(cache_key):
+        print(f"(+) Restored {', '.join(outputs)} from build cache")
+        return REUSED
 
-def build_installer(nsis_script):
-    """Build the installer using NSIS."""
     print("Building installer with NSIS...")
+    from ezbuild.runner import run_streaming
     
+    status = False
     try:
         # Find NSIS
-        if os.name == 'nt':  # Windows
-            nsis_paths = [
-                r"C:\Program Files (x86)\NSIS\makensis.exe",
-                r"C:\Program Files\NSIS\makensis.exe"
-            ]
-            
-            nsis_exe = None
-            for path in nsis_paths:
-                if os.path.exists(path):
-                    nsis_exe = path
-                    break
-                    
-            if not nsis_exe:
-                print("NSIS not found. Please install it and try again.")
-                return False
-                
-            # Run NSIS
-            subprocess.run([nsis_exe, nsis_script], check=True)
+        nsis_exe = find_makensis()
+        if not nsis_exe:
+            print("NSIS not found. Please install it and try again.")
+            return False
             
-            print("(+) NSIS installer build completed successfully")
-            return True
-        else:
-            print("NSIS building is only supported on Windows.")
+        # Run NSIS
+        result = run_streaming([nsis_exe, nsis_script], log_name)
+        if not result.ok:
+            print(f"Error building installer: makensis exited with code {result.returncode}")
+            print(f"Output (last {len(result.tail)} lines):\n{result.format_tail()}")
+            print(f"Full log: {result.log_path}")
             return False
-    except subprocess.CalledProcessError as e:
+        
+        print("(+) NSIS installer build completed successfully")
+        if cache and cache_key:
+            cache.store(cache_key, outputs)
+        status = RAN
+    except OSError as e:
         print(f"Error building installer: {e}")
-        return False
+    finally:
+        if cache and cache_key and not status:
+            cache.release(cache_key)
+    return status
 
-def main():
-    """Main build process."""
-    parser = setup_parser()
-    args = parser.parse_args()
+def write_checksums(report, artifacts, dist_dir="dist"):
+    """
+    Checksum the artifacts this build produced or restored and write the checksum files to dist/.
+
+    Only `artifacts` (files, or one-dir bundles with every file below them)
+    are listed, so files left in dist/ by earlier builds (old versions,
+    other variants or bundle modes) are not vouched for. Digests of artifacts
+    that did not change since the last build (same size, mtime and inode)
+    are reused from the ezbuild cache.
+    """
+    from ezbuild.checksums import ALGORITHMS, checksum_files, write_manifest
 
+    paths = []
+    for artifact in artifacts:
+        if not os.path.isdir(artifact):
+            if os.path.isfile(artifact):
+                paths.append(artifact)
+            continue
+        for dirpath, dirnames, filenames in os.walk(artifact):
+            dirnames.sort()
+            paths.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+    if not paths:
+        report.stage("checksums", SKIPPED, "no artifacts")
+        return
+
+    start = time.perf_counter()
+    results = checksum_files(paths)
+    written = write_manifest(results, dist_dir)
+    hashed = [r for r in results.values() if not r["cached"]]
+    seconds = time.perf_counter() - start
+    hashed_mb = sum(r["size"] for r in hashed) / 1024 / 1024
+    print(f"(+) Checksums for {len(paths)} artifact(s) written to {dist_dir} "
+          f"({len(paths) - len(hashed)} unchanged, {hashed_mb:.1f} MB hashed in {seconds:.2f}s)")
+    report.stage("checksums", RAN if hashed else REUSED,
+                 f"{len(paths)} files" + ("" if hashed else " (digest cache)"))
+    report.set("checksums", {
+        "algorithms": list(ALGORITHMS),
+        "files": len(paths),
+        "cached": len(paths) - len(hashed),
+        "hashed_bytes": sum(r["size"] for r in hashed),
+        "seconds": round(seconds, 3),
+        "manifests": written,
+    })
+
+def run_build(args, report):
+    """Run the build stages selected by the command line arguments."""
     # --- Clean directories if requested ---
     if args.clean:
         print("Cleaning build and dist directories...")
-        build_dir = Path('build')
-        dist_dir = Path('dist')
-        if build_dir.exists():
+        build_dir = 'build'
+        dist_dir = 'dist'
+        if os.path.exists(build_dir):
             print(f"Removing {build_dir} ...")
             shutil.rmtree(build_dir)
-        if dist_dir.exists():
+        if os.path.exists(dist_dir):
             print(f"Removing {dist_dir} ...")
             shutil.rmtree(dist_dir)
         print("Cleaning complete.")
 
-    # Determine build types based on flags or default to both if none specified
+    profile = BUILD_PROFILES[args.profile]
+    profile_info = dict(profile, name=args.profile)
+    if profile["strip"] and not strip_binaries(profile):
+        profile_info.update(strip=False, strip_forced_off="stripping is not supported for Windows binaries")
+    report.set("profile", profile_info)
+    report.set("bundle", {"mode": "onedir" if args.onedir else "onefile",
+                          "runtime_tmpdir": None if args.onedir else args.runtime_tmpdir})
+    if args.reproducible:
+        report.set("reproducible", setup_reproducible())
+
+    # Determine build types based on flags, or default to the profile's outputs if none specified
     build_portable = args.portable or not (args.portable or args.installer)
-    should_build_installer = args.installer or not (args.portable or args.installer)
+    should_build_installer = args.installer or (not (args.portable or args.installer) and profile["installer"])
     # Set the internal flag if installer is being built
     args.is_installer_build = should_build_installer 
 
+    if args.matrix:
+        # The matrix produces every portable variant; installers are built per variant
+        build_portable, should_build_installer = True, False
+        args.is_installer_build = False
+
     print(f"Build configuration:")
+    print(f"  Profile: {args.profile} (UPX: {profile['upx']}, strip: {profile_info['strip']}, "
+          f"optimize: {profile['optimize']})")
+    print(f"  Bundle: {'one-dir' if args.onedir else 'one-file'}"
+          + (f" (runtime tmpdir: {args.runtime_tmpdir})" if args.runtime_tmpdir and not args.onedir else ""))
+    print(f"  Matrix: {args.matrix}")
     print(f"  Portable: {build_portable}")
     print(f"  Installer: {should_build_installer}")
     print(f"  GUI (No Console): {args.no_console}")
     print(f"  Force Fallback: {args.fallback}")
     print(f"  Logging Config: {args.config_logging}")
 
-    if not check_requirements(check_nsis=args.is_installer_build):
+    if args.matrix:
+        if args.build_rust:
+            with trace.span("build rust"):
+                if not run_rust_build(args, report):
+                    sys.exit(1)
+        with trace.span("check requirements"):
+            if not check_requirements():
+                sys.exit(1)
+        with trace.span("check icon"):
+            icon_path = check_icon()
+        if not icon_path:
+            print("Proceeding without an application icon.")
+        with trace.span("check dll"):
+            dll_ok, _ = check_dll()
+        with trace.span("matrix"):
+            ok, outputs = build_matrix(args, icon_path, dll_ok, report)
+        if not ok:
+            print("Error building one or more matrix variants.")
+            sys.exit(1)
+        if not args.no_checksums:
+            with trace.span("checksums"):
+                write_checksums(report, outputs)
+        return
+
+    from ezbuild.scheduler import Scheduler
+
+    cache = None
+    if not args.no_cache:
+        from ezbuild.cache import open_cache
+        cache = open_cache(args.cache_dir, args.cache_size_mb * 1024 * 1024, args.shared_cache)
+    # Read once up front; the stages running in threads then share the cached value
+    get_app_version()
+    scheduler = Scheduler(build_stages(args, report, cache, build_portable, should_build_installer))
+    print("\nBuild stages (dependencies):")
+    for line in scheduler.describe():
+        print(f"  {line}")
+    results = scheduler.run()
+    if not should_build_installer:
+        report.stage("nsis", SKIPPED)
+    report.set("schedule", {name: {"status": result.status, "seconds": result.seconds,
+                                   "after": sorted(scheduler.deps[name]), "error": result.error}
+                            for name, result in results.items()})
+    failed = [name for name, result in results.items() if result.status == FAILED]
+    if failed:
+        for name in failed:
+            print(f"Error: stage '{name}' failed: {results[name].error}")
+        cancelled = [name for name, result in results.items() if result.status == CANCELLED]
+        if cancelled:
+            print(f"Cancelled: {', '.join(cancelled)}")
         sys.exit(1)
 
+    # Optional: Clean up build directory unless needed for debugging
+    # if os.path.exists('build'):
+    #     shutil.rmtree('build')
+
+def build_stages(args, report, cache, build_portable, should_build_installer):
+    """
+    Describe a single-variant build as a graph of stages (see ezbuild/scheduler.py).
+
+    Only PyInstaller needs the DLL, so the checks, the environment, the
+    version file, the spec and the NSIS script are prepared while cargo runs
+    (with --build-rust). The DLL is checked and deployed by its own stage,
+    which PyInstaller waits for: it is injected when the stage that bundles
+    it starts. Values passed between stages (icon path, spec path, ...) go
+    through `state`; their stages declare them as named outputs.
+
+    Returns:
+        list: Stage objects
+    """
+    from ezbuild.scheduler import Stage, StageFailed
+
+    profile = BUILD_PROFILES[args.profile]
+    use_console = not args.no_console
+    entry_script = 'main.py' if use_console else 'truefa_gui.py'
+    exe_path, output = get_bundle_paths(use_console, args.onedir)
+    installer_path = os.path.join("dist", get_installer_name(use_console))
+    state = {}
+
+    def requirements():
+        if not check_requirements(check_nsis=args.is_installer_build):
+            raise StageFailed("build requirements are missing")
+
+    def icon():
+        state["icon"] = check_icon()
+        if not state["icon"]:
+            # Decide whether to proceed without an icon or exit
+            print("Proceeding without an application icon.")
+
+    def dll():
+        dll_ok, dll_path = check_dll()
+        if args.fallback:
+            print("Forcing Python fallback implementation as requested.")
+        elif not dll_ok:
+            raise StageFailed("Rust DLL check failed. Use --fallback to build without Rust backend "
+                              "or fix the DLL issue.")
+        else:
+            print(f"(+) Using Rust DLL: {dll_path}")
+
+    def environment():
+        logging_enabled, debug_enabled = configure_logging_settings(args.config_logging)
+        setup_environment(args.fallback, logging_enabled, debug_enabled)
+
+    def version_file():
+        state["version_file"] = create_version_file()
+
+    def spec():
+        print(f"Building {'Console' if use_console else 'GUI'} application from {entry_script}")
+        state["spec"] = generate_spec(args, entry_script, state["icon"])
+
+    def pyinstaller():
+        print("\n----- Building Executable -----")
+        status, _, _, state["workpath"] = run_pyinstaller(args, entry_script, state["spec"],
+                                                          state["version_file"], cache, report)
+        if not status:
+            raise StageFailed("Error building executable.")
+        if build_portable:
+            report.stage("portable", REUSED, output)
+            print("Portable executable build successful.")
+        else:
+            report.stage("portable", SKIPPED)
+
+    def imports():
+        analyze_imports(entry_script, use_console, state["workpath"], report, seconds=args.trace_seconds)
+
+    compression_name = args.nsis_compression or profile["nsis"]
+
+    def nsis_script():
+        compression = get_nsis_compression(compression_name, args.nsis_dict_size)
+        state["compression"] = compression
+        dictionary = f", {compression['dict_mb']} MB dictionary" if compression["dict_mb"] else ""
+        print(f"Installer compression: {compression_name} ({compression['compressor']}"
+              f"{', solid' if compression['solid'] else ''}{dictionary})")
+        state["nsis_script"] = create_nsis_script(state["icon"], has_console=use_console,
+                                                  bundle_dir=output if args.onedir else None,
+                                                  compression=compression, reproducible=args.reproducible)
+        if not state["nsis_script"]:
+            raise StageFailed("Error creating the NSIS script.")
+
+    def makensis():
+        print("\n----- Building Installer -----")
+        nsis_script_path = state["nsis_script"]
+        installer_key = None
+        if cache and find_makensis():
+            installer_key = installer_cache_key(nsis_script_path, output, state["icon"])
+        start = time.perf_counter()
+        status = build_installer(nsis_script_path, cache, installer_key, outputs=[installer_path])
+        compile_seconds = time.perf_counter() - start
+        if not status:
+            raise StageFailed("Error building installer.")
+        report.stage("nsis", status, f"bundles {output}" if status == RAN else f"{installer_path} (build cache)")
+        nsis_info = dict(state["compression"], profile=compression_name,
+                         size_bytes=os.path.getsize(installer_path),
+                         # A restored installer says nothing about compile time
+                         compile_seconds=round(compile_seconds, 3) if status == RAN else None)
+        if args.nsis_compare:
+            nsis_info["compare"] = compare_nsis_compression(state["icon"], use_console,
+                                                            bundle_dir=output if args.onedir else None,
+                                                            dict_mb=args.nsis_dict_size)
+        report.set("nsis", nsis_info)
+
+        # Clean up intermediate files for installer build
+        if os.path.exists(nsis_script_path):
+            os.remove(nsis_script_path)
+        print("Installer build successful.")
+
+    def checksums():
+        write_checksums(report, artifacts)
+
+    dll_inputs = []
+    stages = []
+    if args.build_rust:
+        stages.append(Stage("build rust", cmd=rust_build_command(args), outputs=[RUST_DLL]))
+        dll_inputs.append(RUST_DLL)
+    stages += [
+        Stage("check requirements", requirements, outputs=["requirements"]),
+        Stage("check icon", icon, outputs=["icon"]),
+        Stage("check dll", dll, inputs=dll_inputs, outputs=["dll"]),
+        Stage("configure environment", environment, outputs=["_build_env.py"]),
+        Stage("version file", version_file, outputs=["file_version_info.txt"]),
+        Stage("spec", spec, inputs=["icon"], outputs=["spec"]),
+        Stage("pyinstaller", pyinstaller, outputs=[output],
+              inputs=["requirements", "dll", "_build_env.py", "file_version_info.txt", "spec"]),
+    ]
+    artifacts = [output]
+    if args.analyze_imports:
+        stages.append(Stage("analyze imports", imports, inputs=[output], outputs=["imports"]))
+    if should_build_installer:
+        # A one-dir installer lists the bundle's files, so it waits for PyInstaller
+        stages.append(Stage("nsis script", nsis_script, outputs=["installer.nsi"],
+                            inputs=["icon"] + ([output] if args.onedir else [])))
+        stages.append(Stage("makensis", makensis, outputs=[installer_path],
+                            inputs=["requirements", "installer.nsi", output]))
+        artifacts.append(installer_path)
+    if not args.no_checksums:
+        stages.append(Stage("checksums", checksums, inputs=artifacts))
+    return stages
+
+def watched_paths(entry_script):
+    """
+    Return the sources --watch observes, split by the stage they feed.
+
+    Returns:
+        tuple: (Rust paths, Python paths) that exist
+    """
+    rust = [os.path.join("rust_crypto", name) for name in ("src", "Cargo.toml", "Cargo.lock", "build.rs")]
+    python = ["src", "assets", entry_script]
+    return [p for p in rust if os.path.exists(p)], [p for p in python if os.path.exists(p)]
+
+def classify_changes(changed, rust_paths):
+    """
+    Split changed files into the Rust and Python stages.
+
+    The deployed DLL is left out: the Rust stage writes it, and a change to
+    it is reported by that stage rather than picked up as a Python edit.
+
+    Returns:
+        tuple: (changed Rust files, changed Python files), relative paths
+    """
+    deployed = {os.path.abspath(os.path.join("src", "truefa_crypto", "truefa_crypto.dll"))}
+    rust_roots = [os.path.abspath(p) for p in rust_paths]
+    rust, python = [], []
+    for path in sorted(changed):
+        if path in deployed:
+            continue
+        if any(path == root or path.startswith(root + os.sep) for root in rust_roots):
+            rust.append(os.path.relpath(path))
+        else:
+            python.append(os.path.relpath(path))
+    return rust, python
+
+def rust_build_command(args):
+    """Return the command running build_rust.py (next to this script) with our cache options."""
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_rust.py")]
+    if args.no_cache:
+        cmd.append("--no-cache")
+    if args.cache_dir:
+        cmd += ["--cache-dir", args.cache_dir]
+    if args.shared_cache:
+        cmd += ["--shared-cache", args.shared_cache]
+    return cmd
+
+def run_rust_build(args, report):
+    """
+    Build the Rust crate with build_rust.py.
+
+    Returns:
+        bool: True if the build succeeded
+    """
+    from ezbuild.runner import run_streaming
+
+    try:
+        result = run_streaming(rust_build_command(args), "build rust")
+    except OSError as e:
+        print(f"Error building Rust module: {e}")
+        report.stage("rust", FAILED, str(e))
+        return False
+    if not result.ok:
+        print(f"Rust build failed (last {len(result.tail)} lines):\n{result.format_tail()}")
+        print(f"Full log: {result.log_path}")
+        report.stage("rust", FAILED, result.log_path)
+        return False
+    report.stage("rust", RAN)
+    return True
+
+def rebuild_rust(args, report):
+    """
+    Rebuild the Rust crate and redeploy the DLL.
+
+    Returns:
+        tuple: (build succeeded, deployed DLL changed)
+    """
+    deployed = os.path.join("src", "truefa_crypto", "truefa_crypto.dll")
+
+    def state():
+        try:
+            st = os.stat(deployed)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    before = state()
+    with trace.span("build rust"):
+        if not run_rust_build(args, report):
+            return False, False
+    with trace.span("check dll"):
+        dll_ok, _ = check_dll()
+    if not dll_ok:
+        report.stage("deploy dll", FAILED)
+        return False, False
+    # deploy_dll() leaves identical copies untouched, so an unchanged DLL keeps its mtime
+    changed = state() != before
+    report.stage("deploy dll", RAN if changed else SKIPPED, None if changed else "DLL unchanged")
+    return True, changed
+
+def watch(args):
+    """
+    Build once, then rebuild the affected stage whenever sources change.
+
+    Changes are debounced (--debounce-ms) so a burst of saves gives one
+    rebuild. A Rust change runs build_rust.py and redeploys the DLL, and
+    re-runs PyInstaller only if the DLL actually changed; a Python or asset
+    change re-runs PyInstaller in the kept workpath. Each cycle writes its
+    own build report. A failed rebuild is reported and watching continues.
+
+    Returns:
+        int: Exit code (0 after Ctrl+C)
+    """
+    from ezbuild.watch import Watcher, wait_for_changes
+
+    if args.clean:
+        for directory in ("build", "dist"):
+            if os.path.exists(directory):
+                print(f"Removing {directory} ...")
+                shutil.rmtree(directory)
+
+    if not check_requirements():
+        return 1
     icon_path = check_icon()
     if not icon_path:
-        # Decide whether to proceed without an icon or exit
         print("Proceeding without an application icon.")
-        # sys.exit(1) # Optional: uncomment to make icon mandatory
-
     dll_ok, dll_path = check_dll()
     if not dll_ok and not args.fallback:
         print("Rust DLL check failed. Use --fallback to build without Rust backend or fix the DLL issue.")
-        sys.exit(1)
-    elif args.fallback:
-        print("Forcing Python fallback implementation as requested.")
-        # Ensure DLL is not included in the build if fallback is forced
-        dll_path = None 
-    elif dll_ok:
-        print(f"(+) Using Rust DLL: {dll_path}")
-
-    # Set up environment variables based on args
+        return 1
     logging_enabled, debug_enabled = configure_logging_settings(args.config_logging)
     setup_environment(args.fallback, logging_enabled, debug_enabled)
+    if args.reproducible:
+        setup_reproducible()
 
-    # Determine entry script and console usage
-    use_console = not args.no_console
-    entry_script = 'main.py' if use_console else 'truefa_gui.py'
-    
-    print(f"Building {'Console' if use_console else 'GUI'} application from {entry_script}")
+    cache = None
+    if not args.no_cache:
+        from ezbuild.cache import open_cache
+        cache = open_cache(args.cache_dir, args.cache_size_mb * 1024 * 1024, args.shared_cache)
+    entry_script = 'main.py' if not args.no_console else 'truefa_gui.py'
+    rust_paths, python_paths = watched_paths(entry_script)
+    if args.fallback:
+        # The fallback build does not bundle the DLL; Rust edits cannot change it
+        rust_paths = []
 
-    # --- Build Portable Executable ---
-    if build_portable:
-        print("\n----- Building Portable Executable -----")
-        spec_file_portable = create_spec_file(entry_script, icon_path, use_console=use_console)
-        version_file = create_version_file() # Create version info file
-        
-        if not build_executable(spec_file_portable):
-            print("Error building portable executable.")
-            sys.exit(1)
-            
-        # Clean up intermediate files for portable build
-        if spec_file_portable and os.path.exists(spec_file_portable): 
-            os.remove(spec_file_portable)
-        if version_file and os.path.exists(version_file): 
-            os.remove(version_file) # Remove version file after use
-        print("Portable executable build successful.")
-
-    # --- Build Installer ---
-    if should_build_installer:
-        print("\n----- Building Installer -----")
-        # Installer now also uses a one-file build
-        spec_file_installer = create_spec_file(entry_script, icon_path, use_console=use_console) 
-        version_file = create_version_file() # Recreate version info file if needed
+    def cycle(rust_changed, python_changed, clean=False):
+        report = BuildReport("package")
+        trace.reset()
+        start = time.perf_counter()
+        ok = True
+        if rust_changed:
+            ok, dll_changed = rebuild_rust(args, report)
+            python_changed = python_changed or dll_changed
+        if ok and python_changed:
+            status, exe_path, _, _ = build_bundle(args, entry_script, icon_path, cache, report, clean=clean)
+            ok = bool(status)
+            if ok and not args.no_checksums:
+                write_checksums(report, [get_bundle_paths(not args.no_console, args.onedir)[1]])
+        report.set("watch", {"rust": rust_changed or [], "python": python_changed or []})
+        report.write()
+        trace.write("package")
+        stages = ", ".join(f"{s['name']} {s['status']}" for s in report.stages) or "nothing to rebuild"
+        print(f"[watch] {'Rebuilt' if ok else 'FAILED'} in {time.perf_counter() - start:.1f}s ({stages})")
+        return ok
 
-        if not build_executable(spec_file_installer):
-            print("Error building application for installer.")
-            sys.exit(1)
+    print("\n----- Building Executable -----")
+    cycle([], True, clean=args.clean)
 
-        nsis_script_path = create_nsis_script(icon_path, has_console=use_console) # Pass console flag
-        if not nsis_script_path or not build_installer(nsis_script_path):
-            print("Error building installer.")
-            sys.exit(1)
+    watcher = Watcher(rust_paths + python_paths, polling=args.poll)
+    print(f"\n[watch] Watching {', '.join(rust_paths + python_paths)} ({watcher.backend}); Ctrl+C to stop")
+    try:
+        while True:
+            changed = wait_for_changes(watcher, debounce=args.debounce_ms / 1000)
+            rust_changed, python_changed = classify_changes(changed, rust_paths)
+            if not (rust_changed or python_changed):
+                continue
+            shown = rust_changed + python_changed
+            print(f"\n[watch] {len(shown)} change(s): {', '.join(shown[:5])}"
+                  + (f" and {len(shown) - 5} more" if len(shown) > 5 else ""))
+            cycle(rust_changed, python_changed)
+    except KeyboardInterrupt:
+        print("\n[watch] Stopped watching")
+        return 0
+    finally:
+        watcher.close()
 
-        # Clean up intermediate files for installer build
-        if spec_file_installer and os.path.exists(spec_file_installer): 
-            os.remove(spec_file_installer)
-        if version_file and os.path.exists(version_file): 
-            os.remove(version_file) # Remove version file
-        if nsis_script_path and os.path.exists(nsis_script_path): 
-            os.remove(nsis_script_path)
-        print("Installer build successful.")
+def main():
+    """Main build process."""
+    parser = setup_parser()
+    args = parser.parse_args()
+    if args.analyze_imports and args.matrix:
+        parser.error("--analyze-imports analyzes a single variant; run it without --matrix")
+    if args.onedir and args.runtime_tmpdir:
+        parser.error("--runtime-tmpdir only applies to one-file builds; a --onedir bundle is never unpacked")
 
-    # Optional: Clean up build directory unless needed for debugging
-    # if os.path.exists('build'):
-    #     shutil.rmtree('build')
+    if args.watch:
+        if args.matrix or args.installer or args.verify_reproducible:
+            parser.error("--watch rebuilds the portable executable; "
+                         "it cannot be combined with --matrix, --installer or --verify-reproducible")
+        sys.exit(watch(args))
+
+    if args.verify_reproducible:
+        build_args = [a for a in sys.argv[1:] if a not in ("--verify-reproducible", "--reproducible")]
+        sys.exit(0 if verify_reproducible(build_args) else 1)
+
+    report = BuildReport("package")
+    try:
+        run_build(args, report)
+    finally:
+        # Write the report and timing trace even when a stage fails
+        report.print_summary()
+        trace.print_summary()
+        report.set("phases", [{"name": name, "seconds": round(total, 3), "count": count}
+                              for name, total, count in trace.summarize()])
+        report.write()
+        print(f"Timing trace: {trace.write('package')} (open in chrome://tracing or ui.perfetto.dev)")
 
     print("\nBuild process completed.")
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Release packaging for New-Release.ps1
+
+Builds one zip per artifact type from the `Artifacts` and `DocFiles` of the
+release configuration: the files matching the artifact's `SourcePattern` in
+`BuildOutputDir` (one-dir bundles included recursively, plus their `.sig`
+signatures), and the documentation files, all at the root of the archive.
+
+All archives are written concurrently. Files are streamed straight from
+`dist/` and the project root into the zips, without copying them into a
+staging directory first, and the archives are reproducible: the same inputs
+give byte-identical zips (see ezbuild/archive.py).
+
+New-Release.ps1 passes its configuration as JSON. To run it by hand:
+    pwsh -c '(. ./release.config.ps1) | ConvertTo-Json -Depth 5' > release.json
+    python package_release.py --config release.json --compression lzma --level 9
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from ezbuild import trace
+from ezbuild.archive import COMPRESSION, ArchiveError, compression_level, write_zip
+from ezbuild.report import BuildReport, RAN, SKIPPED, FAILED
+
+
+def load_config(path):
+    """Load the release configuration (release.config.ps1 converted to JSON)."""
+    with open(path, 'r', encoding="utf-8-sig") as f:
+        config = json.load(f)
+    missing = [key for key in ("ProjectName", "BuildOutputDir", "Artifacts", "DocFiles") if key not in config]
+    if missing:
+        raise ValueError(f"Release configuration {path} is missing required keys: {', '.join(missing)}")
+    return config
+
+
+def native_path(path):
+    """Convert a path from the configuration (written with backslashes) for this platform."""
+    return path.replace("\\", os.sep).replace("/", os.sep)
+
+
+def get_release_version(config, project_root):
+    """
+    Read the version the way New-Release.ps1 does, from the configured VersionSource file.
+
+    Returns:
+        str: The version, or None if it cannot be determined
+    """
+    source = config.get("VersionSource") or {}
+    if source.get("Type") != "File":
+        return None
+    try:
+        with open(os.path.join(project_root, native_path(source["FilePath"])), 'r', encoding="utf-8") as f:
+            match = re.search(source["Pattern"], f.read())
+    except (OSError, KeyError):
+        return None
+    return match.group(1) if match else None
+
+
+def collect_entries(key, artifact, config, project_root):
+    """
+    Map archive names to source files for one artifact type.
+
+    Returns:
+        dict: Archive name -> source path, or None if no artifact matched
+
+    Raises:
+        ArchiveError: If two files would end up under the same archive name
+    """
+    output_dir = os.path.join(project_root, native_path(config["BuildOutputDir"]))
+    matches = sorted(glob.glob(os.path.join(output_dir, native_path(artifact["SourcePattern"]))))
+    if not matches:
+        print(f"Warning: No artifact found matching pattern '{artifact['SourcePattern']}' in "
+              f"'{output_dir}' for type '{key}'.")
+        return None
+
+    files = []
+    for match in matches:
+        if os.path.isdir(match):
+            parent = os.path.dirname(match)
+            for dirpath, dirnames, filenames in os.walk(match):
+                dirnames.sort()
+                files.extend((os.path.relpath(os.path.join(dirpath, name), parent), os.path.join(dirpath, name))
+                             for name in sorted(filenames))
+        else:
+            files.append((os.path.basename(match), match))
+            # Detached signature written by New-Release.ps1
+            if os.path.isfile(f"{match}.sig"):
+                files.append((os.path.basename(match) + ".sig", f"{match}.sig"))
+
+    for doc in config["DocFiles"]:
+        doc_path = os.path.join(project_root, native_path(doc))
+        if os.path.isfile(doc_path):
+            files.append((os.path.basename(doc_path), doc_path))
+        else:
+            print(f"Warning: Documentation file not found or is not a file: '{doc}'")
+
+    entries = {}
+    for name, path in files:
+        name = name.replace(os.sep, "/")
+        if name in entries and os.path.realpath(entries[name]) != os.path.realpath(path):
+            raise ArchiveError(f"'{key}' archive would contain {name} twice ({entries[name]} and {path})")
+        entries[name] = path
+    return entries
+
+
+def package_artifact(job):
+    """Write one release archive. Runs in a worker thread."""
+    with trace.span(f"archive {job['key']}"):
+        return write_zip(job["path"], job["entries"], job["compression"], job["level"])
+
+
+def setup_parser():
+    """Set up command line argument parser."""
+    parser = argparse.ArgumentParser(description="Package release archives from the build output")
+    parser.add_argument("--config", required=True,
+                        help="Release configuration as JSON (New-Release.ps1 passes release.config.ps1 converted)")
+    parser.add_argument("--project-root", default=".",
+                        help="Directory the configuration's paths are relative to")
+    parser.add_argument("--version", default=None,
+                        help="Release version (default: read from the configuration's VersionSource)")
+    parser.add_argument("--output", default="release", help="Directory for the archives")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION), default=None,
+                        help="Archive compression (default: the configuration's Packaging.Compression, or deflate); "
+                             "lzma archives need 7-Zip or a recent unzip to extract")
+    parser.add_argument("--level", type=int, default=None,
+                        help="Compression level, 0-9 (default: 9 for deflate, 6 for lzma)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Maximum archives written concurrently (default: CPU count)")
+    return parser
+
+
+def run_packaging(args, report):
+    """Build the release archives selected by the configuration."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    config = load_config(args.config)
+    packaging = config.get("Packaging") or {}
+    compression = args.compression or packaging.get("Compression") or "deflate"
+    try:
+        level = compression_level(compression, args.level if args.level is not None else packaging.get("Level"))
+    except ArchiveError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    version = args.version or get_release_version(config, args.project_root)
+    if not version:
+        print("Could not determine the release version; pass --version.")
+        sys.exit(1)
+
+    jobs = []
+    with trace.span("collect entries"):
+        for key in sorted(config["Artifacts"]):
+            artifact = config["Artifacts"][key]
+            entries = collect_entries(key, artifact, config, args.project_root)
+            if entries is None:
+                report.stage(f"archive:{key}", SKIPPED, "no artifact")
+                continue
+            name = f"{config['ProjectName']}{artifact.get('PackageNameSuffix', '')}-{version}.zip"
+            jobs.append({"key": key, "path": os.path.join(args.output, name), "entries": entries,
+                         "compression": compression, "level": level})
+    if not jobs:
+        print("No release packages were created.")
+        sys.exit(1)
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(len(jobs), args.jobs or cpu_count))
+    print(f"Packaging {len(jobs)} archive(s) with {compression} compression using {workers} worker(s)")
+    report.set("packaging", {"compression": compression, "level": level, "version": version, "workers": workers})
+
+    archives = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(job, pool.submit(package_artifact, job)) for job in jobs]
+        failed = False
+        for job, future in futures:
+            try:
+                result = future.result()
+            except (ArchiveError, OSError) as e:
+                print(f"Error: Failed to create archive '{job['path']}': {e}")
+                report.stage(f"archive:{job['key']}", FAILED, str(e))
+                failed = True
+                continue
+            archives[job["key"]] = dict(result, path=job["path"])
+            ratio = result["size_bytes"] / max(result["source_bytes"], 1)
+            print(f"(+) {job['path']}: {result['entries']} files, {result['size_bytes'] / 1024 / 1024:.1f} MB "
+                  f"({ratio:.0%} of {result['source_bytes'] / 1024 / 1024:.1f} MB) in {result['seconds']:.2f}s")
+            report.stage(f"archive:{job['key']}", RAN, job["path"])
+    report.set("archives", archives)
+    print(f"Packaging finished in {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    """Main packaging process."""
+    args = setup_parser().parse_args()
+    report = BuildReport("release")
+    try:
+        run_packaging(args, report)
+    finally:
+        report.print_summary()
+        report.write()
+        trace.write("release")
+
+
+if __name__ == "__main__":
+    main()
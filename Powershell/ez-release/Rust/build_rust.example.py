@@ -12,8 +12,8 @@ It demonstrates how to:
 Rename this to 'build_rust.py' in your project root and customize it.
 """
 
+import json
 import os
-import platform
 import shutil
 import subprocess
 import sys
@@ -67,8 +67,9 @@ def build_rust_library():
         # Change to the directory containing the Rust code
         os.chdir(rust_project_dir)
         
-        # Run cargo build in release mode
-        build_cmd = [cargo_path, "build", "--release"]
+        # Run cargo build in release mode. With JSON messages cargo reports the
+        # files it produced on stdout; diagnostics stay readable on stderr.
+        build_cmd = [cargo_path, "build", "--release", "--message-format=json-render-diagnostics"]
         print(f"Executing: {' '.join(build_cmd)}")
         result = subprocess.run(
             build_cmd,
@@ -81,17 +82,20 @@ def build_rust_library():
             print(f"(-) Cargo build failed:\n{result.stderr}")
             return False
         
-        # Determine the expected library name based on platform
-        if platform.system() == "Windows":
-            lib_name = "my_library.dll"
-        elif platform.system() == "Darwin":  # macOS
-            lib_name = "libmy_library.dylib"
-        else:  # Linux and others
-            lib_name = "libmy_library.so"
+        # Find the dynamic library in cargo's compiler-artifact messages instead
+        # of guessing its platform-specific name (.dll, lib*.so, lib*.dylib)
+        lib_path = None
+        for line in result.stdout.splitlines():
+            if not line.startswith("{"):
+                continue
+            message = json.loads(line)
+            if message.get("reason") == "compiler-artifact" and "cdylib" in message["target"]["crate_types"]:
+                libraries = [f for f in message["filenames"] if f.endswith((".dll", ".so", ".dylib"))]
+                lib_path = libraries[0] if libraries else lib_path
         
         # Verify the library was created
-        lib_path = os.path.join("target", "release", lib_name)
-        if os.path.exists(lib_path):
+        if lib_path and os.path.exists(lib_path):
+            lib_name = os.path.basename(lib_path)
             print(f"(+) Library built successfully at: {os.path.abspath(lib_path)}")
             
             # Optional: Check exports/symbols in the library
@@ -106,7 +110,7 @@ def build_rust_library():
             
             return True
         else:
-            print(f"(-) ERROR: Library not found at expected location: {os.path.abspath(lib_path)}")
+            print("(-) ERROR: cargo did not report a cdylib artifact (is crate-type = [\"cdylib\"] set?)")
             return False
             
     except Exception as e:
@@ -8,146 +8,317 @@ the necessary Python bindings. It performs the following steps:
 2. Builds the Rust library in release mode
 3. Sets up proper Python module structure for the compiled library
 
+Steps 2 and 3 are skipped when the crate's inputs (sources, manifest, lockfile,
+rustc version and profile flags) match the last successful build and the DLL
+is still intact. Pass --force to rebuild anyway.
+
 Note: This script is for development only and is not needed in production.
 """
 
+import argparse
+import functools
+import json
 import os
 import platform
 import shutil
-import subprocess
 import sys
 from pathlib import Path
 
+from ezbuild import trace
+from ezbuild.binexports import BinaryFormatError, find_missing_exports
+from ezbuild.cache import DEFAULT_MAX_BYTES, Fingerprint, hash_file, open_cache
+from ezbuild.cargo import MESSAGE_FORMAT, CargoMessages, crate_breakdown, read_timing_report
+from ezbuild.report import BuildReport, RAN, REUSED, SKIPPED, FAILED
+from ezbuild.toolchain import Toolchain
+from ezbuild.runner import run_streaming
+
+# Directory containing the Rust crate
+RUST_DIR = "rust_crypto"
+
+# Where the fingerprint of the crate inputs and the built library is recorded
+FINGERPRINT_FILE = os.path.join(RUST_DIR, "target", ".ezbuild-fingerprint.json")
+
+# Environment variables that change what cargo builds
+PROFILE_ENV_VARS = ("RUSTFLAGS", "CARGO_ENCODED_RUSTFLAGS", "CARGO_BUILD_TARGET")
+
+# Functions the Python bindings call in the library
+REQUIRED_FUNCTIONS = [
+    'c_secure_random_bytes',
+    'c_create_vault',
+    'c_unlock_vault',
+    'c_is_vault_unlocked',
+    'c_lock_vault',
+    'c_vault_exists',
+    'c_generate_salt',
+    'c_derive_master_key',
+    'c_encrypt_master_key',
+    'c_decrypt_master_key',
+    'c_create_secure_string',
+    'c_verify_signature'
+]
+
+@functools.lru_cache(maxsize=None)
+def get_toolchain():
+    """Return the toolchain registry (tool paths and versions cached between runs)."""
+    return Toolchain()
+
 def check_rust_installed():
     """Check if Rust toolchain is installed"""
-    rust_path = os.path.expanduser("~/.cargo/bin/rustc")
-    windows_rust_path = os.path.expanduser("~\\.cargo\\bin\\rustc.exe")
-    
-    if os.path.exists(rust_path) or os.path.exists(windows_rust_path):
-        print("Rust is installed")
+    rustc = get_toolchain().find("rustc")
+    if rustc and get_toolchain().find("cargo"):
+        print(f"Rust is installed ({rustc['version'].splitlines()[0]})")
         return True
-    else:
-        # Try to run rustc directly
-        try:
-            subprocess.run(
-                ["rustc", "--version"], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                check=True
-            )
-            print("Rust is installed")
-            return True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            print("Error: Rust is not installed. Please install Rust from https://rustup.rs/")
+    print("Error: Rust is not installed. Please install Rust from https://rustup.rs/")
+    return False
+
+def get_cargo_path():
+    """Return the cargo executable to run."""
+    return get_toolchain().path("cargo") or "cargo"
+
+def compute_fingerprint(build_cmd):
+    """
+    Fingerprint everything that determines the cargo output.
+
+    Args:
+        build_cmd: The cargo command line (its flags select the profile)
+
+    Returns:
+        str: Hex digest of the crate inputs
+    """
+    fingerprint = Fingerprint("cargo")
+    fingerprint.add_text("command", " ".join(build_cmd[1:]))
+    get_toolchain().add_to_fingerprint(fingerprint, "rustc", "cargo")
+    for var in sorted(os.environ):
+        if var in PROFILE_ENV_VARS or var.startswith("CARGO_PROFILE_"):
+            fingerprint.add_text(f"env:{var}", os.environ[var])
+    for name in ("Cargo.toml", "Cargo.lock", "build.rs", "rust-toolchain.toml", "rust-toolchain",
+                 os.path.join(".cargo", "config.toml")):
+        fingerprint.add_file(os.path.join(RUST_DIR, name))
+    fingerprint.add_tree(os.path.join(RUST_DIR, "src"), suffixes=(".rs",))
+    return fingerprint.hexdigest()
+
+def is_up_to_date(fingerprint):
+    """
+    Check whether the last successful build had the same inputs and its library is untouched.
+
+    Returns:
+        str: Path of the library if cargo, the export check and build_module.py
+             can be skipped, None otherwise
+    """
+    try:
+        with open(FINGERPRINT_FILE, 'r') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return None
+    library = recorded.get("library")
+    if recorded.get("fingerprint") != fingerprint or not library or not os.path.isfile(library):
+        return None
+    return library if hash_file(library) == recorded.get("library_sha256") else None
+
+def record_fingerprint(fingerprint, library):
+    """Remember the inputs, path and hash of a successfully built library."""
+    os.makedirs(os.path.dirname(FINGERPRINT_FILE), exist_ok=True)
+    tmp = f"{FINGERPRINT_FILE}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({"fingerprint": fingerprint, "library": library,
+                   "library_sha256": hash_file(library)}, f, indent=2)
+    os.replace(tmp, FINGERPRINT_FILE)
+
+def check_exports(dll_path):
+    """
+    Check that the DLL exports the functions the Python bindings call.
+
+    The export table is read from the file instead of loading the library.
+
+    Returns:
+        bool: True if all required functions are present
+    """
+    print("Checking exported functions...")
+    try:
+        missing = find_missing_exports(dll_path, REQUIRED_FUNCTIONS)
+        
+        if missing:
+            print(f"WARNING: The following functions are missing from the DLL: {', '.join(missing)}")
+            print("This may cause issues when loading the library at runtime.")
             return False
+        print("All required functions are present in the DLL.")
+        return True
+    except (BinaryFormatError, OSError) as e:
+        print(f"Error checking DLL: {e}")
+        return False
+
+def record_crate_times(messages, report):
+    """
+    Add the per-crate compile times of the last cargo run to the report.
+
+    Timings streamed as `timing-info` messages (nightly cargo) are used when
+    present, otherwise the HTML report `--timings` writes is read.
+    """
+    timings = messages.timings or read_timing_report(RUST_DIR)
+    breakdown = crate_breakdown(timings)
+    report.set("crate_times", breakdown)
+    report.set("compile_units", timings)
+    report.set("fresh_units", messages.fresh_count())
+    if breakdown:
+        print("\nSlowest crates:")
+        width = max(len(row["crate"]) for row in breakdown[:5])
+        for row in breakdown[:5]:
+            print(f"  {row['crate']:<{width}}  {row['seconds']:8.2f}s")
 
-def build_rust_module():
+def build_rust_module(build_cmd, report, cache=None, cache_key=None):
     """
     Build the Rust library module.
     
+    With a build cache and key (the crate fingerprint), a library built from
+    the same inputs is restored instead, possibly one another agent published
+    to a shared cache; a freshly built and verified library is stored.
+    
+    Args:
+        build_cmd: The cargo command line to run inside the crate directory
+        report: BuildReport receiving the cargo stage and compile times
+        cache: StageCache or SharedCache (optional)
+        cache_key: Cache key of the crate inputs
+    
     Returns:
-        bool: True if build successful, False otherwise
+        tuple: (build successful, library path or None, library has all required exports)
     """
+    restored = cache.restore(cache_key) if cache and cache_key else None
+    if restored:
+        library = restored[0]
+        print(f"(+) Restored {library} from build cache")
+        report.stage("cargo", REUSED, f"{library} (build cache)")
+        report.set("library", library)
+        with trace.span("verify exports"):
+            verified = check_exports(library)
+        report.stage("exports", RAN if verified else FAILED)
+        return True, library, verified
+
     print("Building Rust module...")
     
-    # Get the appropriate cargo path
-    cargo_path = "cargo"
-    windows_cargo_path = os.path.expanduser("~\\.cargo\\bin\\cargo.exe")
-    if os.path.exists(windows_cargo_path):
-        cargo_path = windows_cargo_path
-    
+    stored = False
     try:
-        # Change to the directory containing the Rust code
-        os.chdir("rust_crypto")
-        
-        # Run cargo build in release mode
-        build_cmd = [cargo_path, "build", "--release"]
-        result = subprocess.run(
-            build_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        # Run cargo inside the crate directory, streaming its output to
+        # build/logs/cargo.log.gz and picking the JSON messages out of it
+        messages = CargoMessages()
+        with trace.span("cargo build"):
+            result = run_streaming(build_cmd, "cargo", cwd=RUST_DIR, on_line=messages)
         
         if result.returncode != 0:
-            print(f"Cargo build failed:\n{result.stderr}")
-            return False
+            print(f"Cargo build failed (last {len(result.tail)} lines):\n{result.format_tail()}")
+            print(f"Full log: {result.log_path}")
+            report.stage("cargo", FAILED, result.log_path)
+            return False, None, False
+        record_crate_times(messages, report)
         
-        # Verify the DLL was created and contains the expected functions
-        dll_path = os.path.join("target", "release", "truefa_crypto.dll")
-        if os.path.exists(dll_path):
-            print(f"DLL built successfully at: {os.path.abspath(dll_path)}")
-            print("Checking exported functions...")
-            try:
-                # Try to load the DLL using ctypes
-                import ctypes
-                lib = ctypes.CDLL(dll_path)
-                
-                # Check for key functions
-                required_functions = [
-                    'c_secure_random_bytes',
-                    'c_create_vault',
-                    'c_unlock_vault',
-                    'c_is_vault_unlocked',
-                    'c_lock_vault',
-                    'c_vault_exists',
-                    'c_generate_salt',
-                    'c_derive_master_key',
-                    'c_encrypt_master_key',
-                    'c_decrypt_master_key',
-                    'c_create_secure_string',
-                    'c_verify_signature'
-                ]
-                
-                missing = []
-                for func in required_functions:
-                    if not hasattr(lib, func):
-                        missing.append(func)
-                
-                if missing:
-                    print(f"WARNING: The following functions are missing from the DLL: {', '.join(missing)}")
-                    print("This may cause issues when loading the library at runtime.")
-                else:
-                    print("All required functions are present in the DLL.")
-            except Exception as e:
-                print(f"Error checking DLL: {e}")
+        # cargo reports the library it produced, whatever the platform's naming
+        libraries = messages.libraries("cdylib")
+        library = os.path.relpath(libraries[0]) if libraries else None
+        report.stage("cargo", RAN, library)
+        
+        # Verify the library was created and contains the expected functions
+        verified = False
+        if library and os.path.exists(library):
+            report.set("library", library)
+            print(f"DLL built successfully at: {os.path.abspath(library)}")
+            with trace.span("verify exports"):
+                verified = check_exports(library)
+            report.stage("exports", RAN if verified else FAILED)
+            if verified and cache and cache_key:
+                stored = cache.store(cache_key, [library])
         else:
-            print(f"WARNING: DLL not found at expected location: {os.path.abspath(dll_path)}")
+            print("WARNING: cargo did not report a cdylib artifact")
             
         print("Rust module built successfully")
-        return True
+        return True, library, verified
     except Exception as e:
         print(f"Error building Rust module: {e}")
+        report.stage("cargo", FAILED, str(e))
+        return False, None, False
+    finally:
+        if cache and cache_key and not stored:
+            # Other agents waiting on a shared cache build it themselves
+            cache.release(cache_key)
+
+def build_python_module():
+    """
+    Run build_module.py to create a proper Python module around the library.
+
+    Returns:
+        bool: True if successful
+    """
+    print("Building Python module...")
+    try:
+        result = run_streaming([sys.executable, "build_module.py"], "build_module")
+        if result.returncode != 0:
+            print(f"Failed to build Python module:\n{result.format_tail()}")
+            print(f"Full log: {result.log_path}")
+            return False
+        print("Python module built successfully")
+        return True
+    except Exception as e:
+        print(f"Error building Python module: {e}")
         return False
+
+def setup_parser():
+    """Set up command line argument parser."""
+    parser = argparse.ArgumentParser(description="Build the TrueFA-Py Rust crypto module")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild even if the crate inputs have not changed")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not restore or store the library in the build cache")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Build cache directory (default: per-user cache, or EZBUILD_CACHE_DIR)")
+    parser.add_argument("--shared-cache", type=str, default=None, metavar="DIR",
+                        help="Build cache shared between agents, e.g. on an NFS or SSHFS mount, used behind "
+                             "the local one (default: EZBUILD_SHARED_CACHE)")
+    return parser
+
+def main():
+    """Build the Rust library and its Python module, recording phase timings."""
+    args = setup_parser().parse_args()
+    report = BuildReport("rust")
+    try:
+        with trace.span("check rust"):
+            rust_ok = check_rust_installed()
+        if not rust_ok:
+            return False
+
+        build_cmd = [get_cargo_path(), "build", "--release", MESSAGE_FORMAT, "--timings"]
+        with trace.span("fingerprint crate"):
+            fingerprint = compute_fingerprint(build_cmd)
+            library = None if args.force else is_up_to_date(fingerprint)
+        if library:
+            print(f"Rust module is up to date ({os.path.abspath(library)}), skipping build")
+            report.set("library", library)
+            report.stage("cargo", SKIPPED, "inputs unchanged")
+            return True
+
+        # --force means a real cargo build, so it bypasses the cache as well
+        cache = None if args.no_cache or args.force else open_cache(args.cache_dir, DEFAULT_MAX_BYTES,
+                                                                    args.shared_cache)
+        built, library, verified = build_rust_module(build_cmd, report, cache, fingerprint)
+        if not built:
+            return False
+        with trace.span("build python module"):
+            module_ok = build_python_module()
+        report.stage("python module", RAN if module_ok else FAILED)
+        if not module_ok:
+            return False
+        # Only a complete, verified build may be skipped next time
+        if verified:
+            record_fingerprint(fingerprint, library)
+        return True
     finally:
-        # Return to the original directory
-        os.chdir("..")
+        report.print_summary()
+        trace.print_summary()
+        report.set("phases", [{"name": name, "seconds": round(total, 3), "count": count}
+                              for name, total, count in trace.summarize()])
+        report.write()
+        print(f"Timing trace: {trace.write('rust')} (open in chrome://tracing or ui.perfetto.dev)")
 
 if __name__ == "__main__":
-    if not check_rust_installed():
-        print("Build failed")
-        sys.exit(1)
-    
-    if build_rust_module():
-        # Run the build_module.py script to create a proper Python module
-        print("Building Python module...")
-        try:
-            result = subprocess.run(
-                [sys.executable, "build_module.py"], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            if result.returncode != 0:
-                print(f"Failed to build Python module:\n{result.stderr}")
-                print("Build failed")
-                sys.exit(1)
-            print("Python module built successfully")
-            print("Build completed successfully")
-        except Exception as e:
-            print(f"Error building Python module: {e}")
-            print("Build failed")
-            sys.exit(1)
+    if main():
+        print("Build completed successfully")
     else:
         print("Build failed")
         sys.exit(1)
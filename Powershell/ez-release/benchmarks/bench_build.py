@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+"""
+Orchestration benchmarks for build_package.py and build_rust.py.
+
+The real PyInstaller, cargo, rustc and makensis are replaced by the fakes in
+`fake_tools.py`, so these benchmarks measure the overhead the build scripts
+add themselves (fingerprinting, cache restores, process pools, file
+generation, ...) and run on any host, including Linux CI boxes.
+
+Every scenario builds a throwaway project laid out like TrueFA-Py (the
+scripts and `ezbuild/` copied into its root), runs any setup steps, then
+times the final invocation end to end. Per-stage times come from the timing
+trace the scripts write to build/build_trace.json. Some scenarios also
+check the build report afterwards (see SCENARIO_CHECKS); a failed check fails
+the run like a regression does.
+
+Every run also checks the import time of `build_package.py`: it must stay
+under `--import-budget-ms` and must not pull in PyInstaller or PyQt6, so
+`--help` and fully cached builds start quickly.
+
+Usage:
+    python benchmarks/bench_build.py --repeat 3 --output baseline.json
+    python benchmarks/bench_build.py --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+EZ_RELEASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_tools  # noqa: E402
+
+BUILD_PACKAGE = os.path.join(EZ_RELEASE_DIR, "Python", "build_package.py")
+BUILD_RUST = os.path.join(EZ_RELEASE_DIR, "Rust", "build_rust.py")
+EZBUILD_DIR = os.path.join(EZ_RELEASE_DIR, "ezbuild")
+
+REQUIRED_FUNCTIONS = [
+    'c_secure_random_bytes', 'c_create_vault', 'c_unlock_vault', 'c_is_vault_unlocked',
+    'c_lock_vault', 'c_vault_exists', 'c_generate_salt', 'c_derive_master_key',
+    'c_encrypt_master_key', 'c_decrypt_master_key', 'c_create_secure_string',
+    'c_verify_signature',
+]
+
+# name -> (source files in src/, setup invocations, timed invocation)
+# Each invocation is (script, arguments).
+SCENARIOS = {
+    "cold": (10, [], ("package", ["--portable", "--fallback"])),
+    "warm-cache": (10, [("package", ["--portable", "--fallback"])],
+                   ("package", ["--portable", "--fallback"])),
+    # The Rust build provides the DLL, so all four variants are built
+    "matrix": (10, [("rust", [])], ("package", ["--matrix"])),
+    "large-src-cold": (2000, [], ("package", ["--portable", "--fallback"])),
+    "large-src-warm": (2000, [("package", ["--portable", "--fallback"])],
+                       ("package", ["--portable", "--fallback"])),
+    # makensis is found on PATH, so installers build on any host
+    "installer": (10, [], ("package", ["--installer", "--fallback"])),
+    "installer-warm": (10, [("package", ["--installer", "--fallback"])],
+                       ("package", ["--installer", "--fallback"])),
+    "help": (10, [], ("package", ["--help"])),
+    "rust-cold": (10, [], ("rust", [])),
+    "rust-warm": (10, [("rust", [])], ("rust", [])),
+}
+
+
+def create_project(root, src_files):
+    """Lay out a minimal TrueFA-Py-like project with the build scripts in its root."""
+    os.makedirs(os.path.join(root, "src"), exist_ok=True)
+    with open(os.path.join(root, "src", "__init__.py"), 'w') as f:
+        f.write("__version__ = '1.2.3'\n")
+    for i in range(src_files):
+        package = os.path.join(root, "src", f"pkg{i // 100}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module{i}.py"), 'w') as f:
+            f.write(f"VALUE = {i}\n" + "# padding\n" * 200)
+
+    for entry in ("main.py", "truefa_gui.py"):
+        with open(os.path.join(root, entry), 'w') as f:
+            f.write("import src\nprint(src.__version__)\n")
+    os.makedirs(os.path.join(root, "assets"), exist_ok=True)
+    with open(os.path.join(root, "assets", "truefa2.ico"), 'wb') as f:
+        f.write(b"\0\0\1\0" + b"\0" * 1024)
+    with open(os.path.join(root, "LICENSE"), 'w') as f:
+        f.write("MIT\n")
+    with open(os.path.join(root, "build_module.py"), 'w') as f:
+        f.write("print('module built')\n")
+
+    crate = os.path.join(root, "rust_crypto")
+    os.makedirs(os.path.join(crate, "src"), exist_ok=True)
+    with open(os.path.join(crate, "Cargo.toml"), 'w') as f:
+        f.write('[package]\nname = "truefa_crypto"\nversion = "0.1.0"\n\n'
+                '[lib]\ncrate-type = ["cdylib"]\n')
+    with open(os.path.join(crate, "Cargo.lock"), 'w') as f:
+        f.write("# fake lockfile\n")
+    with open(os.path.join(crate, "src", "lib.rs"), 'w') as f:
+        for name in REQUIRED_FUNCTIONS:
+            f.write(f'#[no_mangle]\npub extern "C" fn {name}() -> i32 {{ 0 }}\n')
+
+    shutil.copy2(BUILD_PACKAGE, root)
+    shutil.copy2(BUILD_RUST, root)
+    shutil.copytree(EZBUILD_DIR, os.path.join(root, "ezbuild"),
+                    ignore=shutil.ignore_patterns("__pycache__"))
+
+
+def tool_env(fake_root, cache_dir, args):
+    """Environment that puts the fake tools first and configures them."""
+    bin_dir, module_dir = fake_tools.install_fakes(fake_root)
+    env = dict(os.environ)
+    env["PATH"] = bin_dir + os.pathsep + env.get("PATH", "")
+    env["PYTHONPATH"] = module_dir + os.pathsep + env.get("PYTHONPATH", "")
+    env["EZBUILD_CACHE_DIR"] = cache_dir
+    env["EZBENCH_LATENCY"] = str(args.tool_latency)
+    env["EZBENCH_OUTPUT_LINES"] = str(args.output_lines)
+    env["EZBENCH_ARTIFACT_KB"] = str(args.artifact_kb)
+    return env
+
+
+def invoke(project, env, script, script_args):
+    """
+    Run one build script invocation.
+
+    Returns:
+        float: Wall time in seconds
+
+    Raises:
+        RuntimeError: If the script fails
+    """
+    script_file = "build_package.py" if script == "package" else "build_rust.py"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script_file] + script_args, cwd=project, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{script_file} {' '.join(script_args)} failed:\n{result.stdout[-4000:]}")
+    return wall
+
+
+def stage_times(project, section):
+    """Total the trace spans a script recorded, by name."""
+    path = os.path.join(project, "build", "build_trace.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        events = json.load(f).get("traceEvents", [])
+    totals = {}
+    for event in events:
+        if event.get("cat") == section:
+            totals[event["name"]] = totals.get(event["name"], 0.0) + event["dur"] / 1e6
+    return totals
+
+
+def check_checksums_cached(project):
+    """A build restored from the cache must reuse the previous build's artifact digests."""
+    with open(os.path.join(project, "build", "build_report.json"), 'r') as f:
+        checksums = json.load(f).get("package", {}).get("info", {}).get("checksums") or {}
+    if not checksums.get("cached") or checksums["cached"] < checksums.get("files", 0):
+        return (f"{checksums.get('cached', 0)} of {checksums.get('files')} checksums cached "
+                f"({checksums.get('hashed_bytes')} bytes hashed again)")
+    return None
+
+
+# name -> function(project) run after the timed invocation, returning an error message or None
+SCENARIO_CHECKS = {
+    "installer-warm": check_checksums_cached,
+}
+
+
+def run_scenario(name, args):
+    """
+    Run a scenario `args.repeat` times in fresh projects.
+
+    Returns:
+        dict: Wall time statistics, median per-stage times and failed checks
+    """
+    src_files, setup_steps, (script, script_args) = SCENARIOS[name]
+    walls = []
+    stages = {}
+    failures = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory(prefix=f"ezbench-{name}-") as tmp:
+            project = os.path.join(tmp, "project")
+            create_project(project, src_files)
+            env = tool_env(os.path.join(tmp, "fakes"), os.path.join(tmp, "cache"), args)
+            for setup_script, setup_args in setup_steps:
+                invoke(project, env, setup_script, setup_args)
+            # Only the timed invocation should show up in the stage table
+            trace_file = os.path.join(project, "build", "build_trace.json")
+            if os.path.exists(trace_file):
+                os.remove(trace_file)
+            walls.append(invoke(project, env, script, script_args))
+            for stage, seconds in stage_times(project, script if script == "rust" else "package").items():
+                stages.setdefault(stage, []).append(seconds)
+            check = SCENARIO_CHECKS.get(name)
+            error = check(project) if check else None
+            if error and error not in failures:
+                failures.append(error)
+
+    return {
+        "wall": {
+            "median": statistics.median(walls),
+            "min": min(walls),
+            "max": max(walls),
+            "runs": walls,
+        },
+        "stages": {stage: statistics.median(values) for stage, values in sorted(stages.items())},
+        "check_failures": failures,
+    }
+
+
+# Modules build_package.py must not import at module level
+HEAVY_MODULES = ("PyInstaller", "PyQt6")
+
+
+def measure_import(args, runs=5):
+    """
+    Measure how long `import build_package` takes in a fresh interpreter.
+
+    Returns:
+        dict: Best cumulative import time in ms and any heavy modules it imported
+    """
+    with tempfile.TemporaryDirectory(prefix="ezbench-import-") as tmp:
+        project = os.path.join(tmp, "project")
+        create_project(project, 0)
+        env = tool_env(os.path.join(tmp, "fakes"), os.path.join(tmp, "cache"), args)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        # Warm-up run writes the bytecode caches, as on a developer machine
+        subprocess.run([sys.executable, "-c", "import build_package"], cwd=project, env=env, check=True)
+
+        times = []
+        heavy = set()
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import build_package"],
+                                    cwd=project, env=env, capture_output=True, text=True, check=True)
+            for line in result.stderr.splitlines():
+                if not line.startswith("import time:") or line.count("|") != 2:
+                    continue
+                _, cumulative, name = line.split("|")
+                name = name.strip()
+                if name == "build_package":
+                    times.append(int(cumulative) / 1000.0)
+                elif name.split(".")[0] in HEAVY_MODULES:
+                    heavy.add(name)
+    return {"best_ms": min(times), "runs_ms": times, "heavy_modules": sorted(heavy)}
+
+
+def check_import_budget(result, budget_ms):
+    """
+    Print the import measurement and check it against the budget.
+
+    Returns:
+        bool: True if the import is within budget and imports no heavy modules
+    """
+    print(f"build_package import: {result['best_ms']:.1f}ms (budget {budget_ms:.0f}ms)")
+    ok = True
+    if result["best_ms"] > budget_ms:
+        print("  IMPORT BUDGET EXCEEDED")
+        ok = False
+    if result["heavy_modules"]:
+        print(f"  imported at module level: {', '.join(result['heavy_modules'])}")
+        ok = False
+    return ok
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=EZ_RELEASE_DIR,
+                                capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the change against a baseline and report regressions.
+
+    Returns:
+        bool: True if no scenario regressed by more than `threshold`
+    """
+    ok = True
+    print(f"\nComparison with baseline {baseline.get('meta', {}).get('commit') or '(unknown commit)'}:")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            print(f"  {name:<16} (new scenario)")
+            continue
+        before, after = previous["wall"]["median"], current["wall"]["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {name:<16} {before:7.3f}s -> {after:7.3f}s  {change:+7.1%}{flag}")
+    return ok
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the build script orchestration with fake tools")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--tool-latency", type=float, default=0.2,
+                        help="Seconds each fake tool invocation takes")
+    parser.add_argument("--output-lines", type=int, default=200,
+                        help="Lines of output each fake tool prints")
+    parser.add_argument("--artifact-kb", type=int, default=1024,
+                        help="Size of the artifacts the fake tools produce")
+    parser.add_argument("--output", default=os.path.join("build", "bench", "results.json"),
+                        help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing (0.2 = 20%%)")
+    parser.add_argument("--import-budget-ms", type=float, default=50.0,
+                        help="Maximum time `import build_package` may take")
+    return parser
+
+
+def main():
+    args = setup_parser().parse_args()
+    scenarios = args.scenario or list(SCENARIOS)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": f"{sys.platform}-{platform.machine()}",
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "tool_latency": args.tool_latency,
+            "output_lines": args.output_lines,
+            "artifact_kb": args.artifact_kb,
+            "timestamp": time.time(),
+        },
+        "scenarios": {},
+    }
+
+    checks_ok = True
+    for name in scenarios:
+        print(f"Running {name} ({args.repeat}x)...", flush=True)
+        results["scenarios"][name] = run_scenario(name, args)
+        wall = results["scenarios"][name]["wall"]
+        print(f"  median {wall['median']:.3f}s  min {wall['min']:.3f}s  max {wall['max']:.3f}s")
+        top = sorted(results["scenarios"][name]["stages"].items(), key=lambda kv: kv[1], reverse=True)[:5]
+        for stage, seconds in top:
+            print(f"    {stage:<36} {seconds:7.3f}s")
+        for error in results["scenarios"][name]["check_failures"]:
+            print(f"  CHECK FAILED: {error}")
+            checks_ok = False
+
+    print()
+    results["import"] = measure_import(args)
+    import_ok = check_import_budget(results["import"], args.import_budget_ms)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+
+    ok = import_ok and checks_ok
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        ok = compare(results, baseline, args.threshold) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Two-agent check of the shared build cache (`--shared-cache`).
+
+Two copies of a throwaway project, each with its own local cache, build at
+the same time against one shared directory, with the fake tools from
+`fake_tools.py` standing in for PyInstaller. Exactly one of them may run
+PyInstaller; the other must wait on its lock and restore what it
+published. Then lock files left behind by a crashed agent (one whose
+process has exited, and one not touched for LOCK_STALE seconds) are planted
+for the same keys, and a third agent must break them and build instead of
+waiting.
+
+Exits non-zero if any check fails, so it can run in CI next to
+`bench_build.py`. It leaves nothing behind unless `--output` names a file
+for the JSON results.
+
+Usage:
+    python benchmarks/bench_shared_cache.py --tool-latency 1.0
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_build import EZ_RELEASE_DIR, create_project, git_commit, tool_env  # noqa: E402
+
+sys.path.insert(0, EZ_RELEASE_DIR)
+
+from ezbuild.cache import LOCK_STALE  # noqa: E402
+from ezbuild.report import RAN, REUSED  # noqa: E402
+
+BUILD_ARGS = ["--portable", "--fallback"]
+
+
+def agent_env(tmp, name, shared_dir, args):
+    """Environment of one build agent: the fakes, its own local cache and the shared one."""
+    env = tool_env(os.path.join(tmp, "fakes"), os.path.join(tmp, f"local-{name}"), args)
+    env["EZBUILD_SHARED_CACHE"] = shared_dir
+    return env
+
+
+def start_agent(tmp, name, shared_dir, args):
+    project = os.path.join(tmp, name)
+    create_project(project, 10)
+    proc = subprocess.Popen([sys.executable, "build_package.py"] + BUILD_ARGS, cwd=project,
+                            env=agent_env(tmp, name, shared_dir, args),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return project, proc, time.perf_counter()
+
+
+def finish_agent(project, proc, start, timeout):
+    """
+    Wait for an agent started by start_agent().
+
+    Returns:
+        dict: "status" of its pyinstaller stage, "seconds" and the tail of its "output"
+
+    Raises:
+        RuntimeError: If the build failed or is still running after `timeout` seconds
+            (waiting on a lock that should have been broken, say)
+    """
+    try:
+        output, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        output, _ = proc.communicate()
+        raise RuntimeError(f"{project} did not finish within {timeout:.0f}s:\n{output[-2000:]}")
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{project} failed:\n{output[-4000:]}")
+    with open(os.path.join(project, "build", "build_report.json"), 'r') as f:
+        stages = json.load(f)["package"].get("stages", [])
+    status = next((s["status"] for s in stages if s["name"] == "pyinstaller"), None)
+    return {"status": status, "seconds": round(seconds, 3), "output": output[-2000:]}
+
+
+def check_one_builds(tmp, shared_dir, args):
+    """
+    Two agents missing on the same key at once: one builds, the other restores.
+
+    Returns:
+        list: Failure messages
+    """
+    agents = [start_agent(tmp, name, shared_dir, args) for name in ("agent-a", "agent-b")]
+    results = [finish_agent(*agent, args.agent_timeout) for agent in agents]
+    statuses = sorted(r["status"] for r in results)
+    print(f"  concurrent: pyinstaller {statuses[0]} / {statuses[1]} "
+          f"({results[0]['seconds']:.2f}s, {results[1]['seconds']:.2f}s)")
+    if statuses != sorted([RAN, REUSED]):
+        return [f"expected one agent to build and one to restore, got {statuses}"]
+    waiter = next(r for r in results if r["status"] == REUSED)
+    if "Waiting for" not in waiter["output"] and "Fetched" not in waiter["output"]:
+        return ["the restoring agent neither waited for the lock nor fetched from the shared cache"]
+    return []
+
+
+def dead_pid():
+    """Return the pid of a process that has exited."""
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def plant_locks(shared_dir, owner, mtime=None):
+    """
+    Drop the shared entries and leave a crashed agent's lock for each of their keys.
+
+    Returns:
+        list: The planted lock paths
+    """
+    entries_dir = os.path.join(shared_dir, "entries")
+    locks_dir = os.path.join(shared_dir, "locks")
+    os.makedirs(locks_dir, exist_ok=True)
+    locks = []
+    for name in os.listdir(entries_dir):
+        if not name.endswith(".json"):
+            continue
+        os.remove(os.path.join(entries_dir, name))
+        lock = os.path.join(locks_dir, name[:-len(".json")] + ".lock")
+        with open(lock, 'w') as f:
+            json.dump(owner, f)
+        if mtime is not None:
+            os.utime(lock, (mtime, mtime))
+        locks.append(lock)
+    return locks
+
+
+def check_stale_lock(tmp, shared_dir, args, kind, owner, mtime=None):
+    """
+    An agent finding a crashed agent's lock breaks it and builds instead of waiting.
+
+    Returns:
+        list: Failure messages
+    """
+    locks = plant_locks(shared_dir, owner, mtime)
+    if not locks:
+        return [f"{kind}: the first check published nothing to lock"]
+    result = finish_agent(*start_agent(tmp, f"agent-{kind}", shared_dir, args), args.agent_timeout)
+    print(f"  {kind} lock: pyinstaller {result['status']} ({result['seconds']:.2f}s)")
+    failures = []
+    if result["status"] != RAN:
+        failures.append(f"{kind}: expected the agent to build, got {result['status']}")
+    if "Waiting for" in result["output"]:
+        failures.append(f"{kind}: the agent waited on a lock that should have been broken")
+    left = [lock for lock in locks if os.path.exists(lock)]
+    if left:
+        failures.append(f"{kind}: lock(s) still present after the build: {', '.join(left)}")
+    return failures
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(description="Check the shared build cache with concurrent agents")
+    parser.add_argument("--tool-latency", type=float, default=1.0,
+                        help="Seconds each fake tool invocation takes (long enough for the agents to overlap)")
+    parser.add_argument("--output-lines", type=int, default=50,
+                        help="Lines of output each fake tool prints")
+    parser.add_argument("--artifact-kb", type=int, default=1024,
+                        help="Size of the artifacts the fake tools produce")
+    parser.add_argument("--agent-timeout", type=float, default=120.0,
+                        help="Seconds an agent may take before it counts as stuck")
+    parser.add_argument("--output", default=None,
+                        help="Also write the JSON results to this file (default: only print them); "
+                             "everything else lives in a temporary directory")
+    return parser
+
+
+def main():
+    args = setup_parser().parse_args()
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="ezbench-shared-") as tmp:
+        shared_dir = os.path.join(tmp, "shared")
+        checks = [
+            ("Two agents building the same project...", lambda: check_one_builds(tmp, shared_dir, args)),
+            ("An agent finding the lock of an exited process...", lambda: check_stale_lock(
+                tmp, shared_dir, args, "dead-pid",
+                {"host": socket.gethostname(), "pid": dead_pid(), "created": time.time()})),
+            ("An agent finding a lock nobody touched for LOCK_STALE seconds...", lambda: check_stale_lock(
+                tmp, shared_dir, args, "untouched",
+                {"host": "crashed-agent", "pid": 1, "created": time.time() - 2 * LOCK_STALE},
+                mtime=time.time() - 2 * LOCK_STALE)),
+        ]
+        for title, check in checks:
+            print(title, flush=True)
+            try:
+                failures += check()
+            except RuntimeError as e:
+                failures.append(str(e))
+
+    for failure in failures:
+        print(f"  CHECK FAILED: {failure}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({"commit": git_commit(), "failures": failures}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if failures:
+        sys.exit(1)
+    print("Shared cache checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+Startup latency benchmark for the executables build_package.py produces.
+
+Launches each artifact `--runs` times with a no-op command line (`--version`
+by default) and reports p50/p95 wall time for cold and warm starts:
+
+- warm: the artifact's files are in the OS page cache (after `--warmup`
+  untimed launches). For a one-file build this still includes unpacking
+  the bundle to a temporary directory, which happens on every launch.
+- cold: before each launch the artifact's files are dropped from the page
+  cache with posix_fadvise(DONTNEED). Where that is not available
+  (Windows), each launch runs a fresh copy of the artifact instead, which
+  also includes the on-access virus scan a newly downloaded file gets.
+
+Without `--artifact`, the one-file executables in dist/ and the one-dir
+bundles in dist/<name>/ are benchmarked, so building with and without
+`--onedir` and running this script shows which mode starts faster.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 20
+    python benchmarks/bench_startup.py --artifact onefile=dist/TrueFA-Py-CLI.exe \\
+        --artifact onedir=dist/TrueFA-Py-CLI/TrueFA-Py-CLI.exe --output startup.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_build import git_commit  # noqa: E402
+
+FADVISE = hasattr(os, "posix_fadvise")
+
+
+def find_artifacts(dist_dir):
+    """
+    Find one-file executables and one-dir bundles in `dist_dir`.
+
+    Returns:
+        dict: label -> executable path, e.g. {"TrueFA-Py-CLI (onedir)": "dist/TrueFA-Py-CLI/TrueFA-Py-CLI.exe"}
+    """
+    artifacts = {}
+    for path in sorted(glob.glob(os.path.join(dist_dir, "*.exe"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if "_Setup_" not in name:
+            artifacts[f"{name} (onefile)"] = path
+    for path in sorted(glob.glob(os.path.join(dist_dir, "*", "*.exe"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if os.path.basename(os.path.dirname(path)) == name:
+            artifacts[f"{name} (onedir)"] = path
+    return artifacts
+
+
+def bundle_mode(exe_path):
+    """Return "onedir" if the executable sits in a directory named after it, else "onefile"."""
+    name = os.path.splitext(os.path.basename(exe_path))[0]
+    return "onedir" if os.path.basename(os.path.dirname(os.path.abspath(exe_path))) == name else "onefile"
+
+
+def bundle_files(exe_path):
+    """Return every file the artifact loads from: the executable, or the whole one-dir bundle."""
+    if bundle_mode(exe_path) == "onefile":
+        return [exe_path]
+    files = []
+    for dirpath, _, filenames in os.walk(os.path.dirname(os.path.abspath(exe_path))):
+        files.extend(os.path.join(dirpath, name) for name in filenames)
+    return files
+
+
+def evict(paths):
+    """Drop the files from the page cache (clean pages only, so they are flushed first)."""
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def launch(exe_path, exe_args):
+    """
+    Run the artifact once.
+
+    Returns:
+        tuple: (wall time in seconds, exit code)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([exe_path] + exe_args, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, result.returncode
+
+
+def launch_fresh_copy(exe_path, exe_args):
+    """Run a fresh copy of the artifact (the cold start fallback without posix_fadvise)."""
+    with tempfile.TemporaryDirectory(prefix="ezbench-startup-") as tmp:
+        if bundle_mode(exe_path) == "onedir":
+            bundle = os.path.join(tmp, os.path.basename(os.path.dirname(os.path.abspath(exe_path))))
+            shutil.copytree(os.path.dirname(os.path.abspath(exe_path)), bundle)
+            copy = os.path.join(bundle, os.path.basename(exe_path))
+        else:
+            copy = os.path.join(tmp, os.path.basename(exe_path))
+            shutil.copy2(exe_path, copy)
+        return launch(copy, exe_args)
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil(n * pct / 100)
+    return ordered[rank - 1]
+
+
+def summarize(times):
+    return {
+        "p50_ms": round(percentile(times, 50) * 1000, 1),
+        "p95_ms": round(percentile(times, 95) * 1000, 1),
+        "min_ms": round(min(times) * 1000, 1),
+        "max_ms": round(max(times) * 1000, 1),
+        "runs_ms": [round(t * 1000, 1) for t in times],
+    }
+
+
+def bench_artifact(exe_path, args):
+    """
+    Measure cold and warm startup of one artifact.
+
+    Returns:
+        dict: Mode, bundle size, cold/warm statistics and failed launches
+    """
+    files = bundle_files(exe_path)
+    failures = 0
+
+    cold = []
+    for _ in range(args.runs):
+        if FADVISE:
+            evict(files)
+            seconds, code = launch(exe_path, args.exe_args)
+        else:
+            seconds, code = launch_fresh_copy(exe_path, args.exe_args)
+        cold.append(seconds)
+        failures += code != 0
+
+    for _ in range(args.warmup):
+        launch(exe_path, args.exe_args)
+    warm = []
+    for _ in range(args.runs):
+        seconds, code = launch(exe_path, args.exe_args)
+        warm.append(seconds)
+        failures += code != 0
+
+    return {
+        "path": exe_path,
+        "mode": bundle_mode(exe_path),
+        "files": len(files),
+        "size_bytes": sum(os.path.getsize(f) for f in files),
+        "cold": summarize(cold),
+        "warm": summarize(warm),
+        "failed_launches": failures,
+    }
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm startup latency of built executables")
+    parser.add_argument("--artifact", action="append", metavar="LABEL=PATH",
+                        help="Executable to launch (repeatable, default: everything in --dist)")
+    parser.add_argument("--dist", default="dist", help="Where to look for artifacts without --artifact")
+    parser.add_argument("--runs", type=int, default=20, help="Timed launches per artifact, cold and warm each")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed launches before the warm runs")
+    parser.add_argument("--arg", dest="exe_args", action="append",
+                        help="Argument passed to the executable (repeatable, default: --version)")
+    parser.add_argument("--output", default=os.path.join("build", "bench", "startup.json"),
+                        help="Where to write the JSON results")
+    return parser
+
+
+def main():
+    args = setup_parser().parse_args()
+    args.exe_args = args.exe_args or ["--version"]
+
+    if args.artifact:
+        artifacts = {}
+        for item in args.artifact:
+            label, sep, path = item.partition("=")
+            artifacts[label if sep else item] = path if sep else item
+    else:
+        artifacts = find_artifacts(args.dist)
+    if not artifacts:
+        print(f"No artifacts found in {args.dist}; build with and without --onedir first, or pass --artifact")
+        sys.exit(1)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "platform": f"{sys.platform}-{platform.machine()}",
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "args": args.exe_args,
+            "cold_method": "posix_fadvise" if FADVISE else "fresh copy",
+            "timestamp": time.time(),
+        },
+        "artifacts": {},
+    }
+
+    print(f"{'artifact':<32} {'cold p50':>9} {'cold p95':>9} {'warm p50':>9} {'warm p95':>9}")
+    ok = True
+    for label, path in artifacts.items():
+        if not os.path.isfile(path):
+            print(f"{label:<32} not found: {path}")
+            ok = False
+            continue
+        result = bench_artifact(path, args)
+        results["artifacts"][label] = result
+        cold, warm = result["cold"], result["warm"]
+        print(f"{label:<32} {cold['p50_ms']:7.1f}ms {cold['p95_ms']:7.1f}ms "
+              f"{warm['p50_ms']:7.1f}ms {warm['p95_ms']:7.1f}ms")
+        if result["failed_launches"]:
+            print(f"  {result['failed_launches']} launches exited with a non-zero code")
+            ok = False
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
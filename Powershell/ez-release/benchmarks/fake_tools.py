@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+Fake PyInstaller, cargo, rustc and makensis for the orchestration benchmarks.
+
+Each fake behaves just enough like the real tool for `build_package.py` and
+`build_rust.py` to run end to end: it sleeps to simulate latency, prints a
+configurable amount of output and writes the artifact the real tool would
+produce. Like the real tools, the artifacts differ from run to run unless
+SOURCE_DATE_EPOCH is set; then they are derived from the tool's input file.
+Behaviour is controlled with environment variables:
+
+    EZBENCH_LATENCY       seconds each tool invocation takes (default 0.2)
+    EZBENCH_OUTPUT_LINES  lines of output per invocation (default 200)
+    EZBENCH_ARTIFACT_KB   size of produced executables/libraries (default 1024)
+
+Usage: fake_tools.py <pyinstaller|cargo|rustc|makensis> [tool args...]
+`install_fakes()` creates the PATH wrappers and a fake `PyInstaller` package
+so `python -m PyInstaller` works too.
+"""
+
+import hashlib
+import json
+import os
+import re
+import stat
+import struct
+import sys
+import time
+
+FAKE_VERSIONS = {
+    "pyinstaller": "6.0.0",
+    "cargo": "cargo 1.80.0 (fake)",
+    "rustc": "rustc 1.80.0 (fake)",
+    "makensis": "v3.10",
+}
+
+
+def _config():
+    return (
+        float(os.environ.get("EZBENCH_LATENCY", "0.2")),
+        int(os.environ.get("EZBENCH_OUTPUT_LINES", "200")),
+        int(os.environ.get("EZBENCH_ARTIFACT_KB", "1024")),
+    )
+
+
+def _emit(prefix, markers=()):
+    """Print output lines spread over the configured latency."""
+    latency, lines, _ = _config()
+    markers = list(markers)
+    per_marker = max(1, lines // max(1, len(markers) or 1))
+    for i in range(lines):
+        if markers and i % per_marker == 0:
+            print(f"{i} INFO: checking {markers.pop(0)}", flush=True)
+        else:
+            print(f"{i} INFO: {prefix} line {i}", flush=True)
+        if lines:
+            time.sleep(latency / lines)
+    if not lines:
+        time.sleep(latency)
+
+
+# Functions the fake Rust library exports (what build_package.py checks for)
+RUST_EXPORTS = [
+    'c_secure_random_bytes', 'c_create_vault', 'c_unlock_vault', 'c_is_vault_unlocked',
+    'c_lock_vault', 'c_vault_exists', 'c_generate_salt', 'c_derive_master_key',
+    'c_encrypt_master_key', 'c_decrypt_master_key', 'c_create_secure_string',
+    'c_verify_signature',
+]
+
+
+def minimal_pe(exports, dll_name="truefa_crypto.dll"):
+    """Build a tiny PE32+ image with an export directory listing `exports`."""
+    exports = sorted(exports)
+    count = len(exports)
+    section_rva, section_offset = 0x1000, 0x200
+
+    # Export directory, then the function/name/ordinal arrays, then strings
+    functions_rva = section_rva + 40
+    names_rva = functions_rva + 4 * count
+    ordinals_rva = names_rva + 4 * count
+    strings_rva = ordinals_rva + 2 * count
+    strings = dll_name.encode("ascii") + b"\0"
+    name_rvas = []
+    for name in exports:
+        name_rvas.append(strings_rva + len(strings))
+        strings += name.encode("ascii") + b"\0"
+
+    section = struct.pack("<IIHHIIIIIII", 0, 0, 0, 0, strings_rva, 1, count, count,
+                          functions_rva, names_rva, ordinals_rva)
+    section += struct.pack(f"<{count}I", *[0x2000 + i for i in range(count)])
+    section += struct.pack(f"<{count}I", *name_rvas)
+    section += struct.pack(f"<{count}H", *range(count))
+    section += strings
+
+    optional = bytearray(240)
+    struct.pack_into("<H", optional, 0, 0x20b)
+    struct.pack_into("<I", optional, 108, 16)
+    struct.pack_into("<II", optional, 112, section_rva, len(section))
+
+    header = bytearray(section_offset)
+    header[0:2] = b"MZ"
+    struct.pack_into("<I", header, 0x3C, 0x40)
+    header[0x40:0x44] = b"PE\0\0"
+    struct.pack_into("<HHIIIHH", header, 0x44, 0x8664, 1, 0, 0, 0, len(optional), 0x2022)
+    header[0x58:0x58 + len(optional)] = optional
+    section_header = b".edata\0\0" + struct.pack("<IIIIIIHHI", len(section), section_rva, len(section),
+                                                  section_offset, 0, 0, 0, 0, 0x40000040)
+    header[0x58 + len(optional):0x58 + len(optional) + 40] = section_header
+    return bytes(header) + section
+
+
+def _write_artifact(path, head=b"MZ", seed=None):
+    _, _, size_kb = _config()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if seed is not None and epoch:
+        block = hashlib.sha512(f"{epoch}\0{seed}".encode("utf-8")).digest() * 16
+    else:
+        block = os.urandom(1024)
+    with open(path, 'wb') as f:
+        f.write(head)
+        for _ in range(size_kb):
+            f.write(block)
+
+
+# Modules the fake PyInstaller lists in its xref file (the bench entry scripts import only `src`)
+FAKE_GRAPH = ["json", "json.decoder", "email", "email.mime", "email.mime.text", "unittest", "src"]
+
+
+def _write_graph_files(workpath, name, script):
+    """Write the xref-<name>.html and warn-<name>.txt files PyInstaller leaves in its workpath."""
+    import importlib.util
+    import urllib.request
+
+    out_dir = os.path.join(workpath, name)
+    os.makedirs(out_dir, exist_ok=True)
+    nodes = [f'<div class="node">\n  <a name="{script}"></a>\n'
+             f'<a target="code" href="" type="text/plain"><tt>{script}</tt></a>\n'
+             f'<span class="moduletype">Script</span>\n</div>']
+    for module in FAKE_GRAPH:
+        spec = importlib.util.find_spec(module)
+        origin = spec.origin if spec and spec.origin else ""
+        kind = "Package" if spec and spec.submodule_search_locations else "SourceModule"
+        nodes.append(f'<div class="node">\n  <a name="{module}"></a>\n'
+                     f'<a target="code" href="{urllib.request.pathname2url(origin)}" type="text/plain">'
+                     f'<tt>{module}</tt></a>\n<span class="moduletype">{kind}</span>\n'
+                     f'  <div class="import">\nimported by:\n    <a href="#{script}">{script}</a>\n\n  </div>\n\n</div>')
+    with open(os.path.join(out_dir, f"xref-{name}.html"), 'w', encoding="utf-8") as f:
+        f.write("<!DOCTYPE html>\n<html>\n  <body>\n" + "\n".join(nodes) + "\n  </body>\n</html>\n")
+    with open(os.path.join(out_dir, f"warn-{name}.txt"), 'w', encoding="utf-8") as f:
+        f.write("\nThis file lists modules PyInstaller was not able to find.\n\n"
+                "missing module named _winapi - imported by subprocess (conditional)\n")
+
+
+def fake_pyinstaller(args):
+    if "--version" in args:
+        print(FAKE_VERSIONS["pyinstaller"])
+        return 0
+    spec = next((a for a in args if a.endswith(".spec")), None)
+    if spec is None:
+        print("fake pyinstaller: no spec file given", file=sys.stderr)
+        return 2
+    distpath = args[args.index("--distpath") + 1] if "--distpath" in args else "dist"
+    with open(spec, 'r') as f:
+        spec_text = f.read()
+    name = re.search(r"name='([^']+)'", spec_text).group(1)
+    _emit("pyinstaller", ["Analysis", "PYZ", "PKG", "EXE"])
+    if "--workpath" in args:
+        script = re.search(r"Analysis\(\s*\['([^']+)'\]", spec_text).group(1)
+        _write_graph_files(args[args.index("--workpath") + 1], name, os.path.basename(script))
+    if "COLLECT(" in spec_text:
+        _write_artifact(os.path.join(distpath, name, f"{name}.exe"), seed=spec_text)
+    else:
+        _write_artifact(os.path.join(distpath, f"{name}.exe"), seed=spec_text)
+    return 0
+
+
+# Crates the fake cargo pretends to compile, with their share of the latency
+FAKE_CRATES = [("libc 0.2.150", 0.1), ("rand 0.8.5", 0.2), ("ring 0.17.8", 0.5), ("truefa_crypto 0.1.0", 0.2)]
+
+
+def _write_timing_report(latency):
+    """Write a cargo-timing.html with the UNIT_DATA table stable cargo produces."""
+    units, start = [], 0.0
+    for i, (crate, share) in enumerate(FAKE_CRATES):
+        name, version = crate.split()
+        units.append({"i": i, "name": name, "version": version, "mode": "todo", "target": "",
+                      "start": start, "duration": latency * share, "rmeta_time": None})
+        start += latency * share
+    os.makedirs(os.path.join("target", "cargo-timings"), exist_ok=True)
+    with open(os.path.join("target", "cargo-timings", "cargo-timing.html"), 'w') as f:
+        f.write(f"<html><script>\nconst UNIT_DATA = {json.dumps(units, indent=2)};\n"
+                "const CONCURRENCY_DATA = [];\n</script></html>\n")
+
+
+def fake_cargo(args):
+    if "--version" in args or "-V" in args:
+        print(FAKE_VERSIONS["cargo"])
+        return 0
+    if args[:1] != ["build"]:
+        return 0
+    _emit("cargo")
+    profile = "release" if "--release" in args else "debug"
+    library = os.path.abspath(os.path.join("target", profile, "truefa_crypto.dll"))
+    _write_artifact(library, head=minimal_pe(RUST_EXPORTS))
+    if any(a.startswith("--message-format=json") for a in args):
+        print(json.dumps({"reason": "compiler-artifact",
+                          "package_id": "path+file:///fake/rust_crypto#truefa_crypto@0.1.0",
+                          "target": {"kind": ["cdylib"], "crate_types": ["cdylib"], "name": "truefa_crypto"},
+                          "filenames": [library], "fresh": False}))
+        print(json.dumps({"reason": "build-finished", "success": True}))
+    if "--timings" in args:
+        _write_timing_report(_config()[0])
+    return 0
+
+
+def fake_rustc(args):
+    print(FAKE_VERSIONS["rustc"])
+    return 0
+
+
+def fake_makensis(args):
+    if any(a.upper() in ("-VERSION", "/VERSION") for a in args):
+        print(FAKE_VERSIONS["makensis"])
+        return 0
+    script = next((a for a in args if a.endswith(".nsi")), None)
+    if script is None:
+        return 2
+    with open(script, 'r') as f:
+        script_text = f.read()
+    match = re.search(r'OutFile "([^"]+)"', script_text)
+    _emit("makensis")
+    outfile = match.group(1).replace("\\\\", "/").replace("\\", "/")
+    _write_artifact(outfile, seed=script_text)
+    return 0
+
+
+TOOLS = {
+    "pyinstaller": fake_pyinstaller,
+    "cargo": fake_cargo,
+    "rustc": fake_rustc,
+    "makensis": fake_makensis,
+}
+
+
+def install_fakes(root):
+    """
+    Create fake tool wrappers below `root`.
+
+    Returns:
+        tuple: (bin directory to prepend to PATH, directory to prepend to PYTHONPATH)
+    """
+    this_file = os.path.abspath(__file__)
+    bin_dir = os.path.join(root, "bin")
+    module_dir = os.path.join(root, "pymodules")
+    os.makedirs(bin_dir, exist_ok=True)
+
+    for tool in TOOLS:
+        if os.name == 'nt':
+            path = os.path.join(bin_dir, f"{tool}.cmd")
+            with open(path, 'w') as f:
+                f.write(f'@"{sys.executable}" "{this_file}" {tool} %*\n')
+        else:
+            path = os.path.join(bin_dir, tool)
+            with open(path, 'w') as f:
+                f.write(f'#!/bin/sh\nexec "{sys.executable}" "{this_file}" {tool} "$@"\n')
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    # `python -m PyInstaller` and importlib.metadata.version("pyinstaller")
+    package_dir = os.path.join(module_dir, "PyInstaller")
+    os.makedirs(package_dir, exist_ok=True)
+    with open(os.path.join(package_dir, "__init__.py"), 'w') as f:
+        f.write(f"__version__ = {FAKE_VERSIONS['pyinstaller']!r}\n")
+    with open(os.path.join(package_dir, "__main__.py"), 'w') as f:
+        f.write("import runpy, sys\n"
+                f"sys.argv = [{this_file!r}, 'pyinstaller'] + sys.argv[1:]\n"
+                f"runpy.run_path({this_file!r}, run_name='__main__')\n")
+    dist_info = os.path.join(module_dir, f"pyinstaller-{FAKE_VERSIONS['pyinstaller']}.dist-info")
+    os.makedirs(dist_info, exist_ok=True)
+    with open(os.path.join(dist_info, "METADATA"), 'w') as f:
+        f.write(f"Metadata-Version: 2.1\nName: pyinstaller\nVersion: {FAKE_VERSIONS['pyinstaller']}\n")
+    return bin_dir, module_dir
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+        print(f"usage: {os.path.basename(sys.argv[0])} <{'|'.join(TOOLS)}> [args...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(TOOLS[sys.argv[1]](sys.argv[2:]))
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the ez-release build scripts.
+
+Copy this directory into your project root next to `build_package.py` and
+`build_rust.py`. The build scripts import the modules they need on demand.
+"""
@@ -0,0 +1,195 @@
+"""
+Deterministic zip archives for release packages.
+
+`write_zip()` streams each source file straight into the archive (no staging
+copy) and writes every header field from its inputs only: entries are sorted
+by name, every entry gets the same timestamp (`SOURCE_DATE_EPOCH`, or
+1980-01-01 when it is not set), permissions come from the file name, and no
+extra fields or comments are written. Packaging the same files twice, on any
+machine, gives byte-identical archives.
+
+Entries are stored, deflated (level 0-9) or LZMA-compressed (preset 0-9).
+Windows Explorer only opens stored and deflated zips; LZMA archives need
+7-Zip or a recent `unzip`/libarchive. Archives over 4 GiB (zip64) are not
+supported.
+"""
+
+import os
+import struct
+import time
+import zlib
+
+# method: zip compression method id, version: "version needed to extract"
+COMPRESSION = {
+    "store": {"method": 0, "version": 10, "levels": (0, 0), "default": 0},
+    "deflate": {"method": 8, "version": 20, "levels": (0, 9), "default": 9},
+    "lzma": {"method": 14, "version": 63, "levels": (0, 9), "default": 6},
+}
+
+# File names that are extracted with the executable bit set
+EXECUTABLE_SUFFIXES = (".exe", ".sh", ".so", ".dylib")
+
+# liblzma's dictionary size for each preset (lzma_lzma_preset)
+_LZMA_DICT_SIZES = (256 << 10, 1 << 20, 2 << 20, 4 << 20, 4 << 20, 8 << 20, 8 << 20, 16 << 20, 32 << 20, 64 << 20)
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_MADE_BY = (3 << 8) | 63  # Unix, so the external attributes carry permissions
+_FLAG_UTF8 = 0x800
+_FLAG_LZMA_EOS = 0x2
+_ZIP32_LIMIT = 0xFFFFFFFF
+_CHUNK = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """An archive could not be written."""
+
+
+def fixed_date_time():
+    """
+    Return the timestamp written for every entry.
+
+    Returns:
+        tuple: (year, month, day, hour, minute, second), from SOURCE_DATE_EPOCH if set
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return (1980, 1, 1, 0, 0, 0)
+    # The zip format cannot express dates before 1980 or after 2107
+    date_time = time.gmtime(min(max(int(epoch), 315532800), 4354819199))[:6]
+    return tuple(date_time)
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _compressor(compression, level):
+    if compression == "deflate":
+        return zlib.compressobj(level, zlib.DEFLATED, -15), b""
+    if compression == "lzma":
+        import lzma
+        dict_size = _LZMA_DICT_SIZES[level]
+        encoder = lzma.LZMACompressor(format=lzma.FORMAT_RAW, filters=[
+            {"id": lzma.FILTER_LZMA1, "preset": level, "dict_size": dict_size, "lc": 3, "lp": 0, "pb": 2}])
+        # LZMA SDK version, properties size, then lc/lp/pb and the dictionary size
+        properties = struct.pack("<BI", (2 * 5 + 0) * 9 + 3, dict_size)
+        return encoder, struct.pack("<BBH", 9, 4, len(properties)) + properties
+    return None, b""
+
+
+def _write_entry(out, name, source, compression, level, dos_time, dos_date):
+    """Stream one file into the archive and return its central directory record."""
+    spec = COMPRESSION[compression]
+    encoded = name.encode("utf-8")
+    flags = 0 if encoded.isascii() else _FLAG_UTF8
+    if compression == "lzma":
+        flags |= _FLAG_LZMA_EOS
+    offset = out.tell()
+    out.write(_LOCAL_HEADER.pack(0x04034b50, spec["version"], flags, spec["method"], dos_time, dos_date,
+                                 0, 0, 0, len(encoded), 0))
+    out.write(encoded)
+
+    compressor, prefix = _compressor(compression, level)
+    out.write(prefix)
+    crc, size, compressed = 0, 0, len(prefix)
+    with open(source, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data = compressor.compress(chunk) if compressor else chunk
+            out.write(data)
+            compressed += len(data)
+    if compressor:
+        data = compressor.flush()
+        out.write(data)
+        compressed += len(data)
+    if size > _ZIP32_LIMIT or compressed > _ZIP32_LIMIT or offset > _ZIP32_LIMIT:
+        raise ArchiveError(f"{name} is too large for a zip archive without zip64")
+
+    # Sizes and CRC are only known now; patch them into the local header
+    end = out.tell()
+    out.seek(offset + 14)
+    out.write(struct.pack("<III", crc, compressed, size))
+    out.seek(end)
+
+    mode = 0o100755 if name.lower().endswith(EXECUTABLE_SUFFIXES) else 0o100644
+    return _CENTRAL_HEADER.pack(0x02014b50, _MADE_BY, spec["version"], flags, spec["method"], dos_time, dos_date,
+                                crc, compressed, size, len(encoded), 0, 0, 0, 0, mode << 16, offset) + encoded, size
+
+
+def compression_level(compression, level=None):
+    """
+    Validate a compression level, defaulting to the compression's default.
+
+    Returns:
+        int: The level
+
+    Raises:
+        ArchiveError: On an unknown compression or a level out of range
+    """
+    if compression not in COMPRESSION:
+        raise ArchiveError(f"Unknown compression '{compression}' (choose from {', '.join(COMPRESSION)})")
+    spec = COMPRESSION[compression]
+    level = spec["default"] if level is None else int(level)
+    if not spec["levels"][0] <= level <= spec["levels"][1]:
+        raise ArchiveError(f"{compression} level must be between {spec['levels'][0]} and {spec['levels'][1]}")
+    return level
+
+
+def write_zip(path, entries, compression="deflate", level=None, date_time=None):
+    """
+    Write a reproducible zip archive.
+
+    The archive is written next to `path` and moved into place when complete.
+
+    Args:
+        path (str): Archive to create
+        entries (dict): Archive name (forward slashes) -> source file
+        compression (str): "store", "deflate" or "lzma"
+        level (int): Compression level (default: the compression's default)
+        date_time (tuple): Timestamp for every entry (default: fixed_date_time())
+
+    Returns:
+        dict: Number of entries, archive size, total source size and seconds taken
+
+    Raises:
+        ArchiveError: On an unknown compression or level, or an archive too large for zip32
+    """
+    level = compression_level(compression, level)
+    dos_time, dos_date = _dos_date_time(date_time or fixed_date_time())
+
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    records, source_bytes = [], 0
+    try:
+        with open(tmp, 'wb') as out:
+            for name in sorted(entries):
+                record, size = _write_entry(out, name, entries[name], compression, level, dos_time, dos_date)
+                records.append(record)
+                source_bytes += size
+            directory_offset = out.tell()
+            for record in records:
+                out.write(record)
+            directory_size = out.tell() - directory_offset
+            if len(records) > 0xFFFF or directory_offset > _ZIP32_LIMIT:
+                raise ArchiveError(f"{path} is too large for a zip archive without zip64")
+            out.write(_END_RECORD.pack(0x06054b50, 0, 0, len(records), len(records),
+                                       directory_size, directory_offset, 0))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {
+        "entries": len(records),
+        "size_bytes": os.path.getsize(path),
+        "source_bytes": source_bytes,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,178 @@
+"""
+Read exported symbol names from PE and ELF libraries without loading them.
+
+`ctypes.CDLL()` maps and initializes a library inside the build process,
+which fails outright for a Windows DLL on a Linux host. This module parses
+the PE export directory or the ELF dynamic symbol table straight from a
+memory-mapped file instead, and caches the verdict for a given file hash so
+identical copies of the same DLL are only parsed once.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from ezbuild.cache import default_cache_dir, hash_file
+
+VERDICT_CACHE = "export_checks.json"
+VERDICT_LIMIT = 256
+
+_PE_DIRECTORY_OFFSET = {0x10b: 96, 0x20b: 112}  # PE32, PE32+
+_SHT_DYNSYM = 11
+_STB_GLOBAL = 1
+_STB_WEAK = 2
+_SHN_UNDEF = 0
+
+
+class BinaryFormatError(ValueError):
+    """The file is not a PE or ELF library this module can read."""
+
+
+def _read(data, fmt, offset):
+    size = struct.calcsize(fmt)
+    if offset < 0 or offset + size > len(data):
+        raise BinaryFormatError("truncated file")
+    return struct.unpack_from(fmt, data, offset)
+
+
+def _read_cstring(data, offset, limit=4096):
+    if offset < 0 or offset >= len(data):
+        raise BinaryFormatError("string offset out of range")
+    end = data.find(b"\0", offset, min(len(data), offset + limit))
+    if end < 0:
+        raise BinaryFormatError("unterminated string")
+    return data[offset:end].decode("ascii", "replace")
+
+
+def _pe_exports(data):
+    (pe_offset,) = _read(data, "<I", 0x3C)
+    if data[pe_offset:pe_offset + 4] != b"PE\0\0":
+        raise BinaryFormatError("missing PE signature")
+    coff = pe_offset + 4
+    _, section_count, _, _, _, optional_size, _ = _read(data, "<HHIIIHH", coff)
+    optional = coff + 20
+    (magic,) = _read(data, "<H", optional)
+    if magic not in _PE_DIRECTORY_OFFSET:
+        raise BinaryFormatError(f"unknown optional header magic 0x{magic:x}")
+    export_rva, export_size = _read(data, "<II", optional + _PE_DIRECTORY_OFFSET[magic])
+    if export_rva == 0 or export_size == 0:
+        return set()
+
+    sections = []
+    table = optional + optional_size
+    for i in range(section_count):
+        virtual_size, virtual_address, raw_size, raw_pointer = _read(data, "<IIII", table + i * 40 + 8)
+        sections.append((virtual_address, max(virtual_size, raw_size), raw_pointer))
+
+    def rva_to_offset(rva):
+        for virtual_address, size, raw_pointer in sections:
+            if virtual_address <= rva < virtual_address + size:
+                return rva - virtual_address + raw_pointer
+        raise BinaryFormatError(f"RVA 0x{rva:x} is not inside any section")
+
+    directory = rva_to_offset(export_rva)
+    name_count, _, names_rva = _read(data, "<III", directory + 24)
+    names_offset = rva_to_offset(names_rva) if name_count else 0
+    exports = set()
+    for i in range(name_count):
+        (name_rva,) = _read(data, "<I", names_offset + i * 4)
+        exports.add(_read_cstring(data, rva_to_offset(name_rva)))
+    return exports
+
+
+def _elf_exports(data):
+    elf_class, encoding = data[4], data[5]
+    if elf_class not in (1, 2) or encoding not in (1, 2):
+        raise BinaryFormatError("unsupported ELF class or encoding")
+    end = "<" if encoding == 1 else ">"
+    is_64 = elf_class == 2
+
+    if is_64:
+        (section_offset,) = _read(data, end + "Q", 0x28)
+        entry_size, section_count = _read(data, end + "HH", 0x3A)
+        section_fmt, symbol_fmt = end + "IIQQQQIIQQ", end + "IBBHQQ"
+    else:
+        (section_offset,) = _read(data, end + "I", 0x20)
+        entry_size, section_count = _read(data, end + "HH", 0x2E)
+        section_fmt, symbol_fmt = end + "IIIIIIIIII", end + "IIIBBH"
+
+    sections = [_read(data, section_fmt, section_offset + i * entry_size) for i in range(section_count)]
+    exports = set()
+    for section in sections:
+        if section[1] != _SHT_DYNSYM:
+            continue
+        offset, size, link, symbol_size = section[4], section[5], section[6], section[9]
+        if link >= len(sections) or not symbol_size:
+            raise BinaryFormatError("bad dynamic symbol table")
+        strings = sections[link][4]
+        for i in range(size // symbol_size):
+            if is_64:
+                name, info, _, shndx, _, _ = _read(data, symbol_fmt, offset + i * symbol_size)
+            else:
+                name, _, _, info, _, shndx = _read(data, symbol_fmt, offset + i * symbol_size)
+            if name and shndx != _SHN_UNDEF and (info >> 4) in (_STB_GLOBAL, _STB_WEAK):
+                exports.add(_read_cstring(data, strings + name))
+    return exports
+
+
+def read_exports(path):
+    """
+    Return the names a PE (DLL) or ELF (.so) library exports.
+
+    Raises:
+        BinaryFormatError: If the file is not a readable PE or ELF image
+        OSError: If the file cannot be read
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 64:
+            raise BinaryFormatError("file too small")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:2] == b"MZ":
+                return _pe_exports(data)
+            if data[:4] == b"\x7fELF":
+                return _elf_exports(data)
+    raise BinaryFormatError("not a PE or ELF file")
+
+
+def _load_verdicts(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def find_missing_exports(path, required, cache_dir=None):
+    """
+    Return the names in `required` that the library at `path` does not export.
+
+    The verdict is cached on disk, keyed on the file's SHA-256 and the
+    required names, so copies of the same DLL are only parsed once.
+
+    Raises:
+        BinaryFormatError: If the file is not a readable PE or ELF image
+    """
+    required = sorted(required)
+    key = hashlib.sha256((hash_file(path) + "\0" + "\0".join(required)).encode("utf-8")).hexdigest()
+    verdict_path = os.path.join(cache_dir or default_cache_dir(), VERDICT_CACHE)
+    verdicts = _load_verdicts(verdict_path)
+    if key in verdicts:
+        return verdicts[key]
+
+    exports = read_exports(path)
+    missing = [name for name in required if name not in exports]
+
+    verdicts[key] = missing
+    # Keep only the most recent verdicts
+    verdicts = dict(list(verdicts.items())[-VERDICT_LIMIT:])
+    try:
+        os.makedirs(os.path.dirname(verdict_path), exist_ok=True)
+        tmp = f"{verdict_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(verdicts, f)
+        os.replace(tmp, verdict_path)
+    except OSError:
+        pass  # The cache is an optimization; a read-only cache dir is fine
+    return missing
@@ -0,0 +1,591 @@
+"""
+Content-addressed cache for build stage outputs.
+
+A stage (PyInstaller, makensis, ...) is identified by a fingerprint of all of
+its inputs. Its output files are stored once per content hash under
+`objects/`, and each fingerprint gets a small JSON entry under `entries/`
+listing the files it produced. Restoring a hit is a plain file copy, which is
+seconds instead of minutes for a full PyInstaller run.
+
+The cache is bounded in size: when it grows past `max_bytes`, the least
+recently used entries are dropped and their unreferenced objects deleted.
+
+`SharedCache` puts a `StageCache` on a directory several build agents share
+(an NFS or SSHFS mount, say) behind each agent's local one. Everything is
+published with a temp file and an atomic rename, objects before the entry
+that lists them, so readers never see partial files. A lock file per key
+makes agents that need the same output wait for the one building it instead
+of building it again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GiB
+DEFAULT_SHARED_MAX_BYTES = 20 * 1024 * 1024 * 1024  # 20 GiB
+
+# Lock files are touched every LOCK_HEARTBEAT seconds while held; one not
+# touched for LOCK_STALE seconds belongs to a crashed or disconnected agent
+LOCK_HEARTBEAT = 30.0
+LOCK_STALE = 120.0
+
+# How long an agent waits for another one building the same output
+DEFAULT_WAIT_SECONDS = 30 * 60
+
+# Objects younger than this are never evicted: another process (a --matrix
+# worker, or another agent on a shared cache) may be about to write the entry
+# that references them
+LOCAL_OBJECT_GRACE = 10 * 60
+SHARED_OBJECT_GRACE = 60 * 60
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """Return the per-user cache directory (overridable with EZBUILD_CACHE_DIR)."""
+    env_dir = os.environ.get("EZBUILD_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "ezbuild", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "ezbuild")
+
+
+def hash_file(path, algorithm="sha256"):
+    """Return the hex digest of a file's contents."""
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Fingerprint:
+    """
+    Incrementally hash the inputs of a build stage.
+
+    Every input is added with a label so that moving content between inputs
+    changes the fingerprint. Missing files are recorded as missing rather
+    than silently ignored.
+    """
+
+    def __init__(self, stage):
+        self._hash = hashlib.sha256()
+        self.add_text("stage", stage)
+
+    def _update(self, label, data):
+        self._hash.update(label.encode("utf-8") + b"\0")
+        self._hash.update(str(len(data)).encode("ascii") + b"\0")
+        self._hash.update(data)
+
+    def add_text(self, label, text):
+        """Add a string input (tool version, generated file content, ...)."""
+        self._update(label, str(text).encode("utf-8"))
+
+    def add_file(self, path):
+        """Add a single file by content."""
+        if path and os.path.isfile(path):
+            self._update(f"file:{path}", hash_file(path).encode("ascii"))
+        else:
+            self._update(f"missing:{path}", b"")
+
+    def add_tree(self, root, skip_dirs=("__pycache__",), suffixes=None):
+        """Add every file below `root` (optionally only those ending in `suffixes`), in a stable order."""
+        if not os.path.isdir(root):
+            self._update(f"missing:{root}", b"")
+            return
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in skip_dirs)
+            for name in sorted(filenames):
+                if name.endswith((".pyc", ".pyo")):
+                    continue
+                if suffixes and not name.endswith(tuple(suffixes)):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                self._update(f"file:{root}/{rel}", hash_file(path).encode("ascii"))
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def _expand_dirs(paths, src_root):
+    for rel in paths:
+        src = os.path.join(src_root, rel)
+        if not os.path.isdir(src):
+            yield rel
+            continue
+        for dirpath, dirnames, filenames in os.walk(src):
+            dirnames.sort()
+            for name in sorted(filenames):
+                yield os.path.relpath(os.path.join(dirpath, name), src_root)
+
+
+class StageCache:
+    """A size-bounded, content-addressed store of stage outputs."""
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES, min_object_age=LOCAL_OBJECT_GRACE):
+        """
+        Args:
+            root (str): Cache directory (default: default_cache_dir())
+            max_bytes (int): Size above which least recently used entries are evicted
+            min_object_age (float): Seconds an object is kept even when no entry references it
+        """
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.min_object_age = min_object_age
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.entries_dir = os.path.join(self.root, "entries")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _touch_object(self, digest):
+        """Mark an existing object as new, so evict() keeps it until its entry is written; False if absent."""
+        try:
+            os.utime(self._object_path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, f"{key}.json")
+
+    def _load_entry(self, key):
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _matches(dest, f):
+        """Return True if `dest` already holds the content recorded in entry file `f`."""
+        try:
+            st = os.stat(dest)
+        except OSError:
+            return False
+        if st.st_size != f.get("size"):
+            return False
+        try:
+            return hash_file(dest) == f["sha256"]
+        except OSError:
+            return False
+
+    def restore(self, key, dest_root="."):
+        """
+        Restore the outputs recorded for `key` below `dest_root`.
+
+        Destinations that already hold the recorded content are not rewritten.
+
+        Returns:
+            list: Restored relative paths, or None on a cache miss
+        """
+        entry = self._load_entry(key)
+        if entry is None:
+            return None
+        files = entry.get("files", [])
+        if not all(os.path.exists(self._object_path(f["sha256"])) for f in files):
+            return None
+
+        for f in files:
+            dest = os.path.join(dest_root, f["path"])
+            if self._matches(dest, f):
+                # Leave it alone: a new mtime would make the DLL deployment,
+                # --watch, PyInstaller and the checksum cache see a change
+                mode = f.get("mode", 0o644)
+                if os.stat(dest).st_mode & 0o777 != mode:
+                    os.chmod(dest, mode)
+                continue
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            tmp = f"{dest}.ezbuild-tmp"
+            try:
+                shutil.copyfile(self._object_path(f["sha256"]), tmp)
+            except FileNotFoundError:
+                # Evicted by a concurrent store(); treat as a miss
+                return None
+            os.chmod(tmp, f.get("mode", 0o644))
+            os.replace(tmp, dest)
+
+        # Mark the entry as recently used for LRU eviction
+        now = time.time()
+        try:
+            os.utime(self._entry_path(key), (now, now))
+        except OSError:
+            pass  # Evicted meanwhile; the restored files are complete
+        return [f["path"] for f in files]
+
+    def has(self, key):
+        """Return True if `key` has an entry whose objects are all present."""
+        entry = self._load_entry(key)
+        return entry is not None and all(os.path.exists(self._object_path(f["sha256"]))
+                                         for f in entry.get("files", []))
+
+    def release(self, key):
+        """Give up the claim on `key` taken by a missed restore(); a local cache takes none."""
+
+    def copy_entry(self, source, key):
+        """
+        Copy the entry for `key` and its objects from another StageCache.
+
+        Objects already present are not copied again. The entry is written
+        last, so a reader sees either no entry or a complete one.
+
+        Returns:
+            bool: True if the entry was copied
+        """
+        entry = source._load_entry(key)
+        if entry is None:
+            return False
+        for f in entry.get("files", []):
+            if self._touch_object(f["sha256"]):
+                continue
+            obj = self._object_path(f["sha256"])
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(obj), suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.copyfile(source._object_path(f["sha256"]), tmp)
+                os.replace(tmp, obj)
+            except FileNotFoundError:
+                os.remove(tmp)
+                return False
+        self._write_entry(key, entry)
+        return True
+
+    def _write_entry(self, key, entry):
+        os.makedirs(self.entries_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.entries_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp, self._entry_path(key))
+
+    def store(self, key, paths, src_root="."):
+        """
+        Record the files at `paths` (relative to `src_root`) as the outputs for `key`.
+
+        A directory in `paths` (e.g. a one-dir PyInstaller bundle) is stored
+        with every file below it.
+
+        Returns:
+            bool: True if the entry was stored
+        """
+        files = []
+        for rel in _expand_dirs(paths, src_root):
+            src = os.path.join(src_root, rel)
+            if not os.path.isfile(src):
+                return False
+            digest = hash_file(src)
+            obj = self._object_path(digest)
+            if not self._touch_object(digest):
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(obj), suffix=".tmp")
+                os.close(fd)
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, obj)
+            files.append({
+                "path": rel.replace(os.sep, "/"),
+                "sha256": digest,
+                "size": os.path.getsize(src),
+                "mode": os.stat(src).st_mode & 0o777,
+            })
+
+        self._write_entry(key, {"key": key, "created": time.time(), "files": files})
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in `max_bytes`.
+
+        Returns:
+            int: Number of entries removed
+        """
+        if not os.path.isdir(self.entries_dir):
+            return 0
+
+        entries = []
+        for name in os.listdir(self.entries_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            entry = self._load_entry(key)
+            try:
+                mtime = os.path.getmtime(self._entry_path(key))
+            except OSError:
+                continue  # Removed by another agent's eviction
+            if entry is None:
+                continue
+            entries.append((mtime, key, entry))
+        entries.sort(key=lambda e: e[0])
+
+        def referenced(items):
+            objects = {}
+            for _, _, entry in items:
+                for f in entry.get("files", []):
+                    objects[f["sha256"]] = f.get("size", 0)
+            return objects
+
+        removed = 0
+        objects = referenced(entries)
+        while entries and sum(objects.values()) > self.max_bytes:
+            _, key, _ = entries.pop(0)
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+            removed += 1
+            objects = referenced(entries)
+
+        # Delete objects no remaining entry points at
+        if os.path.isdir(self.objects_dir):
+            cutoff = time.time() - self.min_object_age
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    # Skip in-flight writes from a concurrent store()
+                    if digest.endswith(".tmp") or digest in objects:
+                        continue
+                    path = os.path.join(prefix_dir, digest)
+                    try:
+                        if not self.min_object_age or os.path.getmtime(path) < cutoff:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+
+class CacheLock:
+    """
+    A lock file on a (possibly network) filesystem.
+
+    The file is created with O_CREAT | O_EXCL, which NFSv3+ and SFTP (SSHFS)
+    perform atomically on the server, unlike fcntl/flock locks. While held,
+    a background thread touches it every LOCK_HEARTBEAT seconds; a lock not
+    touched for LOCK_STALE seconds (its holder crashed or lost the mount), or
+    held by a process that no longer exists on this host, is broken.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._stop = None
+
+    def owner(self, path=None):
+        """Return the holder's {"host", "pid", "created"}, or None if the lock is free or stale."""
+        path = path or self.path
+        try:
+            if time.time() - os.path.getmtime(path) > LOCK_STALE:
+                return None
+        except OSError:
+            return None
+        try:
+            with open(path, 'r') as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            return {}  # Being written by its creator right now
+        if owner.get("host") == socket.gethostname() and os.name != 'nt':
+            try:
+                os.kill(owner.get("pid", 0), 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+        return owner
+
+    def acquire(self):
+        """
+        Take the lock if it is free (or stale) without waiting.
+
+        Returns:
+            bool: True if the lock is now held
+        """
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if self.owner() is not None:
+                    return False
+                # Stale: move it aside first, so only one agent breaks it
+                broken = f"{self.path}.{socket.gethostname()}.{os.getpid()}.stale"
+                try:
+                    os.replace(self.path, broken)
+                    if self.owner(broken) is not None:
+                        # Another agent broke it and took it again just before us; give it back
+                        os.replace(broken, self.path)
+                        return False
+                    os.remove(broken)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"host": socket.gethostname(), "pid": os.getpid(), "created": time.time()}, f)
+            self._stop = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(self._stop,), daemon=True).start()
+            return True
+        return False
+
+    def _heartbeat(self, stop):
+        while not stop.wait(LOCK_HEARTBEAT):
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass  # A network hiccup; the next beat retries
+
+    def release(self):
+        if self._stop is None:
+            return
+        self._stop.set()
+        self._stop = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SharedCache:
+    """
+    A StageCache on a shared directory, behind a local StageCache.
+
+    Same interface as StageCache. restore() looks in the local cache, then in
+    the shared one (copying the hit into the local cache). On a miss it waits
+    while another agent holds the key's lock, since that agent is building
+    the same output, and otherwise takes the lock itself until store() has
+    published the output or release() is called. If the shared directory is
+    unreachable, the local cache keeps working alone.
+    """
+
+    def __init__(self, shared_root, local_root=None, max_bytes=DEFAULT_MAX_BYTES,
+                 shared_max_bytes=DEFAULT_SHARED_MAX_BYTES, wait_seconds=DEFAULT_WAIT_SECONDS):
+        """
+        Args:
+            shared_root (str): The shared cache directory
+            local_root (str): The local cache directory (default: default_cache_dir())
+            max_bytes (int): Size bound of the local cache
+            shared_max_bytes (int): Size bound of the shared cache
+            wait_seconds (float): Longest wait for another agent building the same key
+        """
+        self.local = StageCache(local_root, max_bytes=max_bytes)
+        self.shared = StageCache(shared_root, max_bytes=shared_max_bytes, min_object_age=SHARED_OBJECT_GRACE)
+        self.root = self.local.root
+        self.locks_dir = os.path.join(shared_root, "locks")
+        self.wait_seconds = wait_seconds
+        self.available = True
+        self._locks = {}
+
+    def _shared_failed(self, error):
+        print(f"Warning: shared build cache {self.shared.root} is unavailable ({error}); using the local cache only")
+        self.available = False
+
+    def _fetch(self, key):
+        """Copy a shared entry into the local cache. Returns True on success."""
+        try:
+            if self.shared.has(key) and self.local.copy_entry(self.shared, key):
+                now = time.time()
+                os.utime(self.shared._entry_path(key), (now, now))
+                print(f"(+) Fetched {key[:12]} from shared build cache {self.shared.root}")
+                return True
+        except OSError as e:
+            self._shared_failed(e)
+        return False
+
+    def restore(self, key, dest_root="."):
+        """
+        Restore the outputs for `key`, from the local or the shared cache.
+
+        Returns:
+            list: Restored relative paths, or None on a miss (the caller builds
+                and then calls store() or release())
+        """
+        restored = self.local.restore(key, dest_root)
+        if restored or not self.available or key in self._locks:
+            return restored
+        if self._fetch(key):
+            return self.local.restore(key, dest_root)
+
+        try:
+            os.makedirs(self.locks_dir, exist_ok=True)
+            lock = CacheLock(os.path.join(self.locks_dir, f"{key}.lock"))
+            deadline = time.monotonic() + self.wait_seconds
+            waiting = False
+            while not lock.acquire():
+                if not waiting:
+                    owner = lock.owner() or {}
+                    print(f"Waiting for {owner.get('host', 'another agent')} to publish {key[:12]} "
+                          f"to the shared build cache...")
+                    waiting = True
+                if self._fetch(key):
+                    return self.local.restore(key, dest_root)
+                if time.monotonic() > deadline:
+                    print("Gave up waiting; building locally")
+                    return None
+                time.sleep(2.0)
+        except OSError as e:
+            self._shared_failed(e)
+            return None
+        # The holder may have published just before releasing the lock
+        if self._fetch(key):
+            lock.release()
+            return self.local.restore(key, dest_root)
+        self._locks[key] = lock
+        return None
+
+    def store(self, key, paths, src_root="."):
+        """
+        Store the outputs in the local cache and publish them to the shared one.
+
+        Returns:
+            bool: True if the entry was stored locally
+        """
+        try:
+            if not self.local.store(key, paths, src_root):
+                return False
+            if not self.available:
+                return True
+            try:
+                # Another agent may have published the same key meanwhile
+                if not self.shared.has(key):
+                    self.shared.copy_entry(self.local, key)
+                self._evict_shared()
+            except OSError as e:
+                self._shared_failed(e)
+            return True
+        finally:
+            self.release(key)
+
+    def release(self, key):
+        """Release the lock a missed restore() took, e.g. after a failed build."""
+        lock = self._locks.pop(key, None)
+        if lock:
+            lock.release()
+
+    def _evict_shared(self):
+        # One agent evicts at a time; the others skip it
+        lock = CacheLock(os.path.join(self.locks_dir, "evict.lock"))
+        if lock.acquire():
+            try:
+                self.shared.evict()
+            finally:
+                lock.release()
+
+    def evict(self):
+        return self.local.evict()
+
+
+def open_cache(cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, shared_dir=None):
+    """
+    Open the build cache: a SharedCache when a shared directory is given (or
+    set in EZBUILD_SHARED_CACHE), a local StageCache otherwise.
+    """
+    shared_dir = shared_dir or os.environ.get("EZBUILD_SHARED_CACHE")
+    if shared_dir:
+        return SharedCache(shared_dir, local_root=cache_dir, max_bytes=max_bytes)
+    return StageCache(cache_dir, max_bytes=max_bytes)
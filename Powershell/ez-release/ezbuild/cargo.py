@@ -0,0 +1,129 @@
+"""
+Parse cargo's machine-readable build output.
+
+`cargo build --message-format=json-render-diagnostics` prints one JSON
+message per line on stdout (diagnostics stay human-readable on stderr).
+`CargoMessages` is an `on_line` callback for `run_streaming()` that picks
+the produced libraries out of the `compiler-artifact` messages, so the
+build script does not have to guess file names per platform.
+
+Per-crate compile times come from `cargo build --timings`. Nightly cargo can
+stream them as `timing-info` messages (`-Zunstable-options --timings=json`);
+stable cargo writes them into `target/cargo-timings/cargo-timing.html`,
+which `read_timing_report()` parses.
+"""
+
+import json
+import os
+
+MESSAGE_FORMAT = "--message-format=json-render-diagnostics"
+
+# File extensions of dynamic libraries, per platform
+LIBRARY_SUFFIXES = (".dll", ".so", ".dylib")
+
+_UNIT_DATA = "const UNIT_DATA = "
+
+
+class CargoMessages:
+    """Collect artifacts and compile timings from cargo's JSON messages."""
+
+    def __init__(self):
+        self.artifacts = []
+        self.timings = []
+        self.success = None
+
+    def __call__(self, line):
+        if not line.startswith("{"):
+            return
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        reason = message.get("reason")
+        if reason == "compiler-artifact":
+            self.artifacts.append(message)
+        elif reason == "timing-info":
+            self.timings.append(_unit_timing(
+                message.get("package_id", ""), message.get("target", {}).get("name", ""),
+                message.get("mode", ""), message.get("duration"), message.get("rmeta_time")))
+        elif reason == "build-finished":
+            self.success = message.get("success")
+
+    def libraries(self, crate_type="cdylib"):
+        """
+        Return the dynamic libraries cargo produced for targets of `crate_type`.
+
+        Returns:
+            list: Absolute paths, in the order cargo reported them
+        """
+        paths = []
+        for artifact in self.artifacts:
+            if crate_type not in artifact.get("target", {}).get("crate_types", []):
+                continue
+            paths.extend(f for f in artifact.get("filenames", []) if f.endswith(LIBRARY_SUFFIXES))
+        return paths
+
+    def fresh_count(self):
+        """Return how many units cargo reported as already up to date."""
+        return sum(1 for artifact in self.artifacts if artifact.get("fresh"))
+
+
+def _unit_timing(crate, target, mode, duration, rmeta_time):
+    # package_id is "path+file:///...#name@1.0.0" or "name 1.0.0 (source)"
+    if "#" in crate:
+        crate = crate.rsplit("#", 1)[1].replace("@", " ")
+    elif " (" in crate:
+        crate = crate.split(" (", 1)[0]
+    return {
+        "crate": crate,
+        "target": target,
+        "mode": mode,
+        "seconds": round(duration or 0.0, 3),
+        "rmeta_seconds": round(rmeta_time, 3) if rmeta_time is not None else None,
+    }
+
+
+def read_timing_report(crate_dir):
+    """
+    Read per-unit compile times from the HTML report `cargo build --timings` writes.
+
+    Args:
+        crate_dir (str): Directory containing the crate's `target/`
+
+    Returns:
+        list: Timing dicts (crate, target, mode, seconds, rmeta_seconds), or []
+    """
+    path = os.path.join(crate_dir, "target", "cargo-timings", "cargo-timing.html")
+    try:
+        with open(path, 'r', encoding="utf-8") as f:
+            html = f.read()
+    except OSError:
+        return []
+    start = html.find(_UNIT_DATA)
+    if start < 0:
+        return []
+    start += len(_UNIT_DATA)
+    end = html.find("];", start)
+    try:
+        units = json.loads(html[start:end + 1])
+    except ValueError:
+        return []
+    return [_unit_timing(f"{u.get('name', '')} {u.get('version', '')}".strip(), u.get("target", "").strip(),
+                         u.get("mode", ""), u.get("duration"), u.get("rmeta_time"))
+            for u in units]
+
+
+def crate_breakdown(timings):
+    """
+    Total compile time per crate (build scripts and the library itself summed).
+
+    Returns:
+        list: {"crate", "seconds", "units"} dicts, slowest first
+    """
+    totals = {}
+    for timing in timings:
+        seconds, units = totals.get(timing["crate"], (0.0, 0))
+        totals[timing["crate"]] = (seconds + timing["seconds"], units + 1)
+    rows = [{"crate": crate, "seconds": round(seconds, 3), "units": units}
+            for crate, (seconds, units) in totals.items()]
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
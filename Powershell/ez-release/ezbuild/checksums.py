@@ -0,0 +1,167 @@
+"""
+Checksums for release artifacts.
+
+`checksum_files()` computes SHA-256, SHA-512 and BLAKE2b for every artifact
+in one read pass: each file is memory-mapped and every 1 MiB window is fed
+to all three hashes while it is still in the CPU cache. Files are hashed in
+parallel on a thread pool (hashlib releases the GIL for large updates).
+
+Digests are cached per path, keyed on the file's size, mtime and inode, so
+an installer restored unchanged from the build cache is not hashed again
+(`StageCache.restore()` leaves outputs that already match untouched).
+`write_manifest()` writes coreutils-compatible `SHA256SUMS`, `SHA512SUMS`
+and `B2SUMS` files (checkable with `sha256sum -c` / `b2sum -c`) plus a JSON
+manifest.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ezbuild.cache import default_cache_dir
+
+ALGORITHMS = ("sha256", "sha512", "blake2b")
+
+# Checksum file written for each algorithm
+SUMS_FILES = {"sha256": "SHA256SUMS", "sha512": "SHA512SUMS", "blake2b": "B2SUMS"}
+MANIFEST_FILE = "checksums.json"
+
+DIGEST_CACHE = "checksums.json"
+DIGEST_LIMIT = 1000
+
+_WINDOW = 1024 * 1024
+
+
+def digest_file(path, algorithms=ALGORITHMS):
+    """
+    Hash a file with several algorithms in a single pass over a memory map.
+
+    Returns:
+        dict: algorithm -> hex digest
+    """
+    hashers = [hashlib.new(name) for name in algorithms]
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:  # Empty files cannot be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+                for offset in range(0, size, _WINDOW):
+                    with view[offset:offset + _WINDOW] as window:
+                        for h in hashers:
+                            h.update(window)
+    return {name: h.hexdigest() for name, h in zip(algorithms, hashers)}
+
+
+def _identity(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class DigestCache:
+    """Digests of files that have not changed since they were last hashed."""
+
+    def __init__(self, cache_dir=None):
+        self.path = os.path.join(cache_dir or default_cache_dir(), DIGEST_CACHE)
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    def get(self, path, algorithms):
+        """Return the cached digests for `path`, or None if it changed or was never hashed."""
+        entry = self.entries.get(os.path.abspath(path))
+        if not entry or entry["identity"] != _identity(os.stat(path)):
+            return None
+        if not all(name in entry["digests"] for name in algorithms):
+            return None
+        return {name: entry["digests"][name] for name in algorithms}
+
+    def put(self, path, st, digests):
+        self.entries.pop(os.path.abspath(path), None)
+        self.entries[os.path.abspath(path)] = {"identity": _identity(st), "digests": digests}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        # Keep only the most recently hashed files
+        entries = dict(list(self.entries.items())[-DIGEST_LIMIT:])
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # The cache is an optimization; a read-only cache dir is fine
+
+
+def checksum_files(paths, algorithms=ALGORITHMS, workers=None, cache_dir=None):
+    """
+    Checksum files in parallel, reusing cached digests of unchanged files.
+
+    Args:
+        paths (list): Files to hash
+        algorithms (list): hashlib algorithm names
+        workers (int): Thread pool size (default: CPU count)
+        cache_dir (str): ezbuild cache directory
+
+    Returns:
+        dict: path -> {"size", "digests", "cached"}
+    """
+    cache = DigestCache(cache_dir)
+    results = {}
+    pending = []
+    for path in paths:
+        digests = cache.get(path, algorithms)
+        if digests is None:
+            pending.append(path)
+        else:
+            results[path] = {"size": os.path.getsize(path), "digests": digests, "cached": True}
+
+    def work(path):
+        # Stat before reading: a file replaced while it is hashed is hashed again next time
+        st = os.stat(path)
+        return path, st, digest_file(path, algorithms)
+
+    if pending:
+        workers = max(1, min(len(pending), workers or os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, st, digests in pool.map(work, pending):
+                cache.put(path, st, digests)
+                results[path] = {"size": st.st_size, "digests": digests, "cached": False}
+    cache.save()
+    return {path: results[path] for path in paths}
+
+
+def write_manifest(results, out_dir, algorithms=ALGORITHMS):
+    """
+    Write one coreutils-style checksum file per algorithm and a JSON manifest to `out_dir`.
+
+    File names in the manifests are relative to `out_dir`, with forward slashes.
+
+    Returns:
+        list: Paths of the files written
+    """
+    names = {path: os.path.relpath(path, out_dir).replace(os.sep, "/") for path in results}
+    ordered = sorted(results, key=lambda path: names[path])
+    written = []
+    for algorithm in algorithms:
+        sums_path = os.path.join(out_dir, SUMS_FILES.get(algorithm, f"{algorithm.upper()}SUMS"))
+        with open(sums_path, 'w', newline="\n") as f:
+            for path in ordered:
+                f.write(f"{results[path]['digests'][algorithm]}  {names[path]}\n")
+        written.append(sums_path)
+
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(manifest_path, 'w', newline="\n") as f:
+        json.dump({"algorithms": list(algorithms),
+                   "files": {names[path]: dict(results[path]["digests"], size=results[path]["size"])
+                             for path in ordered}},
+                  f, indent=2, sort_keys=True)
+        f.write("\n")
+    written.append(manifest_path)
+    return written
+
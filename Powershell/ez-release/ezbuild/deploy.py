@@ -0,0 +1,92 @@
+"""
+Hash-aware file deployment.
+
+Copying a file that is already in place gives it a new mtime, which makes
+downstream tools (PyInstaller, the build cache) treat it as changed.
+`deploy_file()` skips the copy when the destination already has the same
+content, and otherwise prefers a reflink over a byte copy. A hardlink is
+only used when the caller opts in: the destination would then share its
+inode with the source, so writing either one in place changes both (and on
+Windows a loaded DLL would block the tool that rebuilds the source).
+"""
+
+import os
+import shutil
+
+from ezbuild.cache import hash_file
+
+# Deployment results
+UNCHANGED = "unchanged"
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+COPY = "copy"
+
+# Linux FICLONE ioctl (btrfs, XFS, ...): share the source's extents copy-on-write
+_FICLONE = 0x40049409
+
+
+def same_content(a, b):
+    """Return True if the two files have identical contents."""
+    try:
+        stat_a, stat_b = os.stat(a), os.stat(b)
+    except OSError:
+        return False
+    if (stat_a.st_dev, stat_a.st_ino) == (stat_b.st_dev, stat_b.st_ino):
+        return True
+    if stat_a.st_size != stat_b.st_size:
+        return False
+    return hash_file(a) == hash_file(b)
+
+
+def _reflink(src, dest):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+            fcntl.ioctl(fdest.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, dest)
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+
+def deploy_file(src, dest, allow_hardlink=False):
+    """
+    Make `dest` an identical copy of `src`, doing as little work as possible.
+
+    The destination is replaced atomically, and its mtime matches the
+    source's whichever method is used. Without `allow_hardlink`, a
+    destination that is a hardlink of the source is replaced by a copy.
+
+    Returns:
+        str: UNCHANGED, REFLINK, HARDLINK or COPY
+    """
+    if os.path.exists(dest) and same_content(src, dest):
+        if allow_hardlink or not os.path.samefile(src, dest):
+            return UNCHANGED
+        # Linked to the source by an older deployment: give it its own copy
+
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    method = None
+    if _reflink(src, tmp):
+        method = REFLINK
+    elif allow_hardlink:
+        try:
+            os.link(src, tmp)
+            method = HARDLINK
+        except OSError:
+            method = None
+    if method is None:
+        shutil.copy2(src, tmp)
+        method = COPY
+
+    os.replace(tmp, dest)
+    return method
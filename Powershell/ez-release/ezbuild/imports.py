@@ -0,0 +1,314 @@
+"""
+Derive PyInstaller `excludes` from the imports an application really makes.
+
+PyInstaller bundles every module its import graph reaches. That includes
+modules that are only referenced from code paths the application never runs,
+plus everything pulled in by broad hidden imports. `analyze()` compares two
+views of the application:
+
+- the runtime trace: the entry script is run in a child interpreter with an
+  audit hook that records every module imported while it starts up (and,
+  for GUI entry points, while the event loop runs for a few seconds);
+- the build graph: the `xref-<name>.html` and `warn-<name>.txt` files
+  PyInstaller writes to its workpath.
+
+Modules in the build graph that were never imported at runtime become the
+exclusion candidates. They are collapsed to the highest package with no
+imported module below it, so the list stays short (`tkinter` rather than
+each of its submodules). Modules imported at runtime but missing from the
+build graph are reported as well, since they would fail in the frozen
+application.
+
+A trace only sees the code paths that ran, so modules the application
+imports lazily (on a menu action, an update check, ...) must be listed in
+`keep`.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import zlib
+
+# Graph node types that correspond to files PyInstaller bundles
+BUNDLED_TYPES = ("SourceModule", "CompiledModule", "Package", "ExtensionModule", "ExtensionPackage",
+                 "NamespacePackage")
+
+# Never excluded: PyInstaller's bootstrap and modules it imports before the app runs
+ALWAYS_KEEP = ("encodings", "codecs", "io", "abc", "site", "sitecustomize", "PyInstaller",
+               "pyimod01_archive", "pyimod02_importers", "pyimod03_ctypes", "pyimod04_pywin32",
+               "pyi_splash", "_pyi_rth_utils")
+
+_NODE_NAME = re.compile(r'\s*<a name="([^"]+)"></a>')
+_LINKED = re.compile(r'<a target="code" href="([^"]*)"[^>]*>.*?<span class="moduletype">([^<]*)</span>', re.S)
+_MODULETYPE = re.compile(r'<span class="moduletype">(.*?)</span>', re.S)
+_IMPORTED_BY = re.compile(r'imported by:(.*?)</div>', re.S)
+_LINK = re.compile(r'<a href="#([^"]+)">')
+_WARNING = re.compile(r'^(\w+) module named (\S+) - imported by (.*)$')
+
+
+class TraceError(Exception):
+    """The entry script could not be traced."""
+
+
+# Child interpreter: records imports with an audit hook, runs the entry
+# script as __main__ and writes the module names when it exits or when the
+# time limit is reached (GUI event loops never return on their own)
+_TRACER = r"""
+import json, os, runpy, sys, threading
+out, seconds, script = sys.argv[1], float(sys.argv[2]), sys.argv[3]
+seen = set()
+def hook(event, args):
+    if event == "import":
+        seen.add(args[0])
+sys.addaudithook(hook)
+preloaded = []
+def dump(error=None):
+    with open(out, "w") as f:
+        json.dump({"modules": sorted(seen | set(sys.modules)), "preloaded": preloaded, "error": error}, f)
+def stop():
+    dump()
+    os._exit(0)
+timer = threading.Timer(seconds, stop)
+timer.daemon = True
+timer.start()
+sys.argv = [script] + sys.argv[4:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+preloaded.extend(sorted(sys.modules))
+try:
+    runpy.run_path(script, run_name="__main__")
+except SystemExit:
+    dump()
+except BaseException as e:
+    dump(f"{type(e).__name__}: {e}")
+else:
+    dump()
+"""
+
+
+def trace_imports(entry_script, seconds=5.0, args=(), env=None):
+    """
+    Run the entry script and record the modules it imports.
+
+    Args:
+        entry_script (str): Application entry point
+        seconds (float): Stop the application after this long
+        args (list): Command line arguments for the application
+        env (dict): Environment (default: the current one, with Qt's offscreen platform)
+
+    Returns:
+        tuple: (every module loaded in the child, the modules the interpreter
+            and tracer had loaded before the script started)
+
+    Raises:
+        TraceError: If the script failed, so the trace would miss modules it needs
+    """
+    env = dict(os.environ if env is None else env)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory(prefix="ezbuild-imports-") as tmp:
+        out = os.path.join(tmp, "modules.json")
+        cmd = [sys.executable, "-c", _TRACER, out, str(seconds), entry_script] + list(args)
+        try:
+            subprocess.run(cmd, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=seconds + 30)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            with open(out, 'r') as f:
+                trace = json.load(f)
+        except (OSError, ValueError):
+            raise TraceError(f"No import trace recorded for {entry_script}")
+    if trace["error"]:
+        raise TraceError(f"{entry_script} failed while tracing imports: {trace['error']}")
+    return set(trace["modules"]), set(trace["preloaded"])
+
+
+def read_xref(path):
+    """
+    Parse PyInstaller's xref-<name>.html.
+
+    Returns:
+        dict: module name -> {"type", "file", "imported_by"}
+    """
+    with open(path, 'r', encoding="utf-8") as f:
+        html = f.read()
+    graph = {}
+    for content in html.split('<div class="node">')[1:]:
+        node_name = _NODE_NAME.match(content)
+        if not node_name:
+            continue
+        name = node_name.group(1)
+        linked = _LINKED.search(content)
+        moduletype = _MODULETYPE.search(content)
+        if linked:
+            url, node_type = linked.groups()
+            filename = urllib.request.url2pathname(url) if url else None
+        elif moduletype and "<tt>" in moduletype.group(1):
+            # Extension modules show their file name instead of a type
+            node_type, filename = "ExtensionModule", re.sub(r"</?tt>", "", moduletype.group(1)).strip()
+        else:
+            node_type, filename = "BuiltinModule", None
+        imported_by = _IMPORTED_BY.search(content)
+        graph[name] = {
+            "type": node_type.strip(),
+            "file": filename or None,
+            "imported_by": _LINK.findall(imported_by.group(1)) if imported_by else [],
+        }
+    return graph
+
+
+def read_warnings(path):
+    """
+    Parse PyInstaller's warn-<name>.txt.
+
+    Returns:
+        dict: module name -> {"status", "imported_by"} for modules PyInstaller could not find
+    """
+    warnings = {}
+    try:
+        with open(path, 'r', encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return warnings
+    for line in lines:
+        match = _WARNING.match(line.strip())
+        if match:
+            status, name, importers = match.groups()
+            warnings[name] = {"status": status, "imported_by": [i.strip() for i in importers.split(",")]}
+    return warnings
+
+
+def _covered(name, prefixes):
+    return any(name == p or name.startswith(p + ".") for p in prefixes)
+
+
+def _protected(name, keep):
+    # Excluding `name` would also remove a kept module (or one of its parents)
+    return _covered(name, keep) or any(_covered(k, [name]) for k in keep)
+
+
+def minimal_excludes(graph, traced, keep=()):
+    """
+    Return the shortest exclude list covering the bundled modules that were never imported.
+
+    Args:
+        graph (dict): read_xref() result
+        traced (set): Modules imported at runtime
+        keep (list): Modules (and their submodules) never to exclude
+
+    Returns:
+        dict: exclude name -> graph modules it removes
+    """
+    keep = tuple(ALWAYS_KEEP) + tuple(keep)
+    used = set()
+    for name in traced:
+        parts = name.split(".")
+        used.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    excludes = {}
+    for name, node in sorted(graph.items()):
+        if node["type"] not in BUNDLED_TYPES or name in used or _covered(name, keep):
+            continue
+        # Exclude the highest ancestor package nothing at runtime imported from
+        parts = name.split(".")
+        for i in range(1, len(parts) + 1):
+            prefix = ".".join(parts[:i])
+            if prefix not in used and not _protected(prefix, keep):
+                excludes.setdefault(prefix, []).append(name)
+                break
+    # Drop entries already covered by a shorter one
+    return {name: modules for name, modules in excludes.items()
+            if not any(_covered(name, [other]) for other in excludes if other != name)}
+
+
+def extraction_throughput(sample_bytes=8 * 1024 * 1024):
+    """
+    Measure how fast this machine decompresses and writes a file, like a one-file bootloader does.
+
+    Returns:
+        float: Bytes per second
+    """
+    data = os.urandom(sample_bytes // 2) + bytes(sample_bytes // 2)
+    compressed = zlib.compress(data, 6)
+    with tempfile.TemporaryDirectory(prefix="ezbuild-extract-") as tmp:
+        start = time.perf_counter()
+        with open(os.path.join(tmp, "sample"), 'wb') as f:
+            f.write(zlib.decompress(compressed))
+        seconds = time.perf_counter() - start
+    return sample_bytes / max(seconds, 1e-6)
+
+
+def _module_size(node):
+    path = node.get("file")
+    if not path or not os.path.isfile(path):
+        return 0
+    return os.path.getsize(path)
+
+
+def analyze(entry_script, xref_path, warn_path, keep=(), previous=None, seconds=5.0, args=()):
+    """
+    Trace the application, compare with PyInstaller's graph and build the exclude list.
+
+    Excludes from an earlier analysis (`previous`) stay in the list unless the
+    trace shows they are imported now.
+
+    Args:
+        entry_script (str): Application entry point
+        xref_path (str): PyInstaller's xref-<name>.html
+        warn_path (str): PyInstaller's warn-<name>.txt
+        keep (list): Modules never to exclude
+        previous (dict): Excludes of the last analysis, name -> savings
+        seconds (float): How long to let the application run
+        args (list): Command line arguments for the application
+
+    Returns:
+        dict: excludes (name -> size_bytes, extract_ms, modules), dropped
+            (previous excludes that are imported now), missing (imported at
+            runtime, absent from the build), traced_modules and graph_modules
+
+    Raises:
+        TraceError: If the entry script could not be traced
+    """
+    traced, preloaded = trace_imports(entry_script, seconds, args)
+    graph = read_xref(xref_path)
+    warnings = read_warnings(warn_path)
+    throughput = extraction_throughput()
+
+    excludes = {}
+    for name, modules in minimal_excludes(graph, traced, keep).items():
+        size = sum(_module_size(graph[m]) for m in modules)
+        excludes[name] = {
+            "size_bytes": size,
+            "extract_ms": round(size / throughput * 1000, 2),
+            "modules": len(modules),
+        }
+
+    dropped = []
+    for name, savings in (previous or {}).items():
+        if any(_covered(t, [name]) for t in traced) or _protected(name, keep):
+            dropped.append(name)
+        elif not any(_covered(name, [other]) for other in excludes):
+            excludes[name] = savings
+
+    # Imported at runtime but not bundled: flagged in warn-<name>.txt, or
+    # loaded dynamically from a package PyInstaller did bundle. Modules the
+    # tracer itself loaded are only protected from exclusion, not reported.
+    missing = {}
+    for name in sorted(traced - preloaded):
+        if name in graph or _covered(name, excludes):
+            continue
+        if name in warnings or name.split(".")[0] in graph:
+            missing[name] = warnings.get(name, {}).get("imported_by", [])
+
+    return {
+        "excludes": dict(sorted(excludes.items())),
+        "dropped": sorted(dropped),
+        "missing": missing,
+        "traced_modules": len(traced),
+        "graph_modules": len(graph),
+        "extract_mb_per_s": round(throughput / 1024 / 1024, 1),
+    }
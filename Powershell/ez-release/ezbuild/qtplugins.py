@@ -0,0 +1,132 @@
+"""
+Select the Qt plugins a GUI bundle ships.
+
+PyInstaller's PyQt6 hooks collect every platform and style plugin Qt
+installs, whichever platform the bundle is built for. Each of them takes up
+space in the bundle, and a one-file executable unpacks all of them on every
+launch. Only one platform plugin is ever loaded (`qwindows` on Windows,
+`qcocoa` on macOS, `qxcb` on Linux, plus `qoffscreen` for headless runs), and
+at most one or two styles.
+
+`prune_plugins()` runs from the generated spec file after Analysis and drops
+the platform and style plugins that are not selected for the build
+platform. Other plugin categories (image formats, icon engines, ...) are
+left alone. Extra plugins can be kept with allowlist patterns such as
+`platforms/qminimal` or `styles/*`.
+"""
+
+import fnmatch
+import json
+import os
+import re
+import sys
+
+# Categories whose plugins are pruned down to the selection
+PRUNED_CATEGORIES = ("platforms", "styles")
+
+# Plugins each build platform needs, as "category/name" patterns
+PLATFORM_PLUGINS = {
+    "win32": ["platforms/qwindows", "styles/qwindowsvistastyle", "styles/qmodernwindowsstyle"],
+    "darwin": ["platforms/qcocoa", "styles/qmacstyle"],
+    "linux": ["platforms/qxcb", "platforms/qoffscreen"],
+}
+
+_PLUGIN_DEST = re.compile(r"(?:^|/)Qt6?/plugins/([^/]+)/([^/]+)$")
+_PLUGIN_SUFFIXES = (".dll", ".so", ".dylib")
+
+
+def plugin_id(category, filename):
+    """Return "category/name" for a plugin file, e.g. ("platforms", "libqxcb.so") -> "platforms/qxcb"."""
+    name = filename
+    for suffix in _PLUGIN_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    if name.startswith("lib") and not filename.endswith(".dll"):
+        name = name[3:]
+    return f"{category}/{name}"
+
+
+def selected_plugins(platform=None, allow=()):
+    """
+    Return the plugin patterns to keep for a build platform.
+
+    Args:
+        platform (str): sys.platform value of the target (default: this host)
+        allow (list): Extra "category/name" patterns to keep
+
+    Returns:
+        list: "category/name" patterns
+    """
+    platform = platform or sys.platform
+    key = "linux" if platform.startswith("linux") else platform
+    return PLATFORM_PLUGINS.get(key, []) + list(allow)
+
+
+def is_selected(plugin, patterns):
+    """Return True if a "category/name" plugin matches one of the patterns."""
+    return any(fnmatch.fnmatchcase(plugin, pattern) for pattern in patterns)
+
+
+def find_plugins(plugins_dir, patterns):
+    """
+    List the plugin files in a Qt plugins directory that the patterns select.
+
+    Returns:
+        list: (source path, destination directory relative to the plugins directory) tuples
+    """
+    found = []
+    for category in sorted(os.listdir(plugins_dir)) if os.path.isdir(plugins_dir) else []:
+        category_dir = os.path.join(plugins_dir, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for filename in sorted(os.listdir(category_dir)):
+            if filename.endswith(_PLUGIN_SUFFIXES) and is_selected(plugin_id(category, filename), patterns):
+                found.append((os.path.join(category_dir, filename), category))
+    return found
+
+
+def prune_plugins(binaries, datas, patterns, report_path=None):
+    """
+    Drop unselected platform and style plugins from a PyInstaller Analysis.
+
+    Called from the generated spec file between Analysis and PYZ.
+
+    Args:
+        binaries (list): Analysis.binaries, (dest_name, src_path, typecode) tuples
+        datas (list): Analysis.datas
+        patterns (list): "category/name" patterns of the plugins to keep
+        report_path (str): Where to write a JSON summary
+
+    Returns:
+        tuple: (binaries, datas) without the pruned plugins
+    """
+    # A plugin can be listed twice (collected by a hook and added to datas)
+    kept, pruned = {}, {}
+
+    def keep(entry):
+        dest_name, src_path = entry[0], entry[1]
+        match = _PLUGIN_DEST.search(dest_name.replace("\\", "/"))
+        if not match or match.group(1) not in PRUNED_CATEGORIES:
+            return True
+        plugin = plugin_id(match.group(1), match.group(2))
+        size = os.path.getsize(src_path) if os.path.isfile(src_path) else 0
+        if is_selected(plugin, patterns):
+            kept[plugin] = size
+            return True
+        pruned[plugin] = size
+        return False
+
+    binaries = type(binaries)([entry for entry in binaries if keep(entry)])
+    datas = type(datas)([entry for entry in datas if keep(entry)])
+
+    saved = sum(pruned.values())
+    print(f"ezbuild Qt plugins: kept {', '.join(sorted(kept)) or 'none'}; "
+          f"pruned {len(pruned)} ({saved / 1024 / 1024:.1f} MB)")
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump({"patterns": list(patterns), "saved_bytes": saved,
+                       "kept": dict(sorted(kept.items())), "pruned": dict(sorted(pruned.items()))},
+                      f, indent=2)
+    return binaries, datas
@@ -0,0 +1,78 @@
+"""
+Build report shared by the ez-release build scripts.
+
+Each script records the stages it ran (or reused) and writes them into a single
+JSON file in the build directory, so a release can be audited after the fact.
+"""
+
+import json
+import os
+import time
+
+REPORT_PATH = os.path.join("build", "build_report.json")
+
+# Stage status values
+RAN = "ran"
+REUSED = "reused"
+SKIPPED = "skipped"
+FAILED = "failed"
+CANCELLED = "cancelled"  # Stopped or never started because another stage failed
+
+
+class BuildReport:
+    """Collects stage results and extra information for one build script."""
+
+    def __init__(self, section):
+        """
+        Args:
+            section (str): Name of the section in the report file (e.g. "package", "rust")
+        """
+        self.section = section
+        self.stages = []
+        self.info = {}
+        self.started = time.time()
+
+    def stage(self, name, status, detail=None):
+        """Record the outcome of a build stage."""
+        self.stages.append({"name": name, "status": status, "detail": detail})
+
+    def set(self, key, value):
+        """Attach extra information (profile, sizes, timings, ...) to the report."""
+        self.info[key] = value
+
+    def print_summary(self):
+        """Print a short table of the recorded stages."""
+        if not self.stages:
+            return
+        print("\nBuild stages:")
+        width = max(len(s["name"]) for s in self.stages)
+        for s in self.stages:
+            line = f"  {s['name']:<{width}}  {s['status']}"
+            if s["detail"]:
+                line = f"{line:<{width + 12}}  {s['detail']}"
+            print(line)
+
+    def write(self, path=REPORT_PATH):
+        """
+        Write this section into the report file, keeping other sections intact.
+
+        Returns:
+            str: Path of the report file
+        """
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        data[self.section] = {
+            "started": self.started,
+            "finished": time.time(),
+            "stages": self.stages,
+            "info": self.info,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        return path
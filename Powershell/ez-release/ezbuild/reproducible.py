@@ -0,0 +1,163 @@
+"""
+Check that a build is reproducible.
+
+`verify()` copies the project into two directories, runs the same
+`build_package.py --reproducible` command in each and compares the two
+`dist/` trees byte by byte. Building at two different absolute paths also
+catches paths that leak into the artifacts. For every file that differs,
+the first differing byte range is reported; for PE executables the range
+is labelled when it falls in the headers (timestamp, checksum).
+"""
+
+import json
+import mmap
+import os
+import shutil
+import subprocess
+import sys
+
+# Left out of the copies: outputs, caches, and the files the build generates
+IGNORE = ("build", "dist", "release", ".git", ".venv", "venv", "target", "__pycache__", "*.pyc", "*.spec",
+          "_build_env.py", "file_version_info.txt", "installer.nsi")
+
+REPORT_PATH = os.path.join("build", "reproducible.json")
+
+_WINDOW = 1024 * 1024
+
+
+def copy_project(src, dest):
+    """Copy the project sources to `dest`, without build outputs."""
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    shutil.copytree(src, dest, ignore=shutil.ignore_patterns(*IGNORE), symlinks=True)
+
+
+def _map(f, size):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+
+def first_difference(path_a, path_b):
+    """
+    Find the first range of bytes that differs between two files.
+
+    Returns:
+        tuple: (start, end) offsets of the first run of differing bytes
+            (end exclusive; past the shorter file when one is a prefix of the
+            other), or None if the files are identical
+    """
+    size_a, size_b = os.path.getsize(path_a), os.path.getsize(path_b)
+    with open(path_a, 'rb') as fa, open(path_b, 'rb') as fb:
+        a, b = _map(fa, size_a), _map(fb, size_b)
+        try:
+            common = min(size_a, size_b)
+            start = None
+            # Compare whole windows first; only a differing window is scanned byte by byte
+            for offset in range(0, common, _WINDOW):
+                end = min(offset + _WINDOW, common)
+                if a[offset:end] != b[offset:end]:
+                    start = next(i for i in range(offset, end) if a[i] != b[i])
+                    break
+            if start is None:
+                return None if size_a == size_b else (common, max(size_a, size_b))
+            end = start
+            while end < common and a[end] != b[end]:
+                end += 1
+            return start, end
+        finally:
+            if size_a:
+                a.close()
+            if size_b:
+                b.close()
+
+
+def describe_range(path, start, end):
+    """Return a hint about what lives at a byte range, e.g. "PE file header (TimeDateStamp)"."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(4096)
+    except OSError:
+        return None
+    if header[:2] != b"MZ" or len(header) < 0x40:
+        return None
+    pe = int.from_bytes(header[0x3C:0x40], "little")
+    fields = [
+        (pe + 8, pe + 12, "PE file header (TimeDateStamp)"),
+        (pe + 24 + 64, pe + 24 + 68, "PE optional header (CheckSum)"),
+    ]
+    for field_start, field_end, label in fields:
+        if start < field_end and end > field_start:
+            return label
+    if start < pe + 24 + 240:
+        return "PE headers"
+    return None
+
+
+def compare_trees(dir_a, dir_b):
+    """
+    Compare every file below two directories.
+
+    Returns:
+        dict: Relative path (forward slashes) -> {"status", "size", and for
+            differing files "start", "end", "hint"}
+    """
+    def files(root):
+        found = set()
+        for dirpath, _, filenames in os.walk(root):
+            found.update(os.path.relpath(os.path.join(dirpath, name), root) for name in filenames)
+        return found
+
+    names_a, names_b = files(dir_a), files(dir_b)
+    results = {}
+    for name in sorted(names_a | names_b):
+        key = name.replace(os.sep, "/")
+        if name not in names_b:
+            results[key] = {"status": "only in first build"}
+            continue
+        if name not in names_a:
+            results[key] = {"status": "only in second build"}
+            continue
+        path_a, path_b = os.path.join(dir_a, name), os.path.join(dir_b, name)
+        diff = first_difference(path_a, path_b)
+        if diff is None:
+            results[key] = {"status": "identical", "size": os.path.getsize(path_a)}
+        else:
+            results[key] = {"status": "differs", "size": [os.path.getsize(path_a), os.path.getsize(path_b)],
+                            "start": diff[0], "end": diff[1], "hint": describe_range(path_a, *diff)}
+    return results
+
+
+def verify(script, build_args, project_root=".", work_dir=None, env=None):
+    """
+    Build the project twice in isolated copies and compare the outputs.
+
+    Args:
+        script (str): Build script to run in each copy (e.g. "build_package.py")
+        build_args (list): Arguments for the build script (--reproducible is added)
+        project_root (str): Project to copy
+        work_dir (str): Where the two copies go (default: build/reproducible)
+        env (dict): Environment for both builds; must pin SOURCE_DATE_EPOCH
+
+    Returns:
+        dict: {"identical": bool, "files": compare_trees() result, "builds": [copy dirs]}
+            or {"identical": False, "error": ...} if a build failed
+    """
+    work_dir = os.path.abspath(work_dir or os.path.join(project_root, "build", "reproducible"))
+    builds = [os.path.join(work_dir, "a"), os.path.join(work_dir, "b")]
+    cmd = [sys.executable, script] + list(build_args) + ["--reproducible"]
+    for build_dir in builds:
+        print(f"\n----- Reproducibility build in {build_dir} -----")
+        copy_project(project_root, build_dir)
+        result = subprocess.run(cmd, cwd=build_dir, env=env)
+        if result.returncode != 0:
+            return {"identical": False, "builds": builds,
+                    "error": f"Build in {build_dir} failed with exit code {result.returncode}"}
+    files = compare_trees(os.path.join(builds[0], "dist"), os.path.join(builds[1], "dist"))
+    return {"identical": bool(files) and all(f["status"] == "identical" for f in files.values()),
+            "files": files, "builds": builds}
+
+
+def write_report(result, path=REPORT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return path
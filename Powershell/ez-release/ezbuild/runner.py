@@ -0,0 +1,177 @@
+"""
+Streaming subprocess runner for long-running build tools.
+
+PyInstaller, cargo and makensis can run for minutes and print thousands of
+lines. Instead of buffering all of it in memory, `run_streaming()` reads the
+output line by line, keeps only the last few lines for error reports, writes
+the full output to a gzip-compressed log file and shows live progress.
+"""
+
+import collections
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+LOG_DIR = os.path.join("build", "logs")
+DEFAULT_TAIL_LINES = 200
+
+# Seconds between progress updates
+_LINE_INTERVAL = 0.1
+_HEARTBEAT_INTERVAL = 15.0
+
+# Commands currently running, so terminate_running() can stop them from another thread
+_running = set()
+_running_lock = threading.Lock()
+
+
+class RunResult:
+    """Outcome of a streamed command."""
+
+    def __init__(self, returncode, tail, log_path, line_count, duration):
+        self.returncode = returncode
+        self.tail = tail
+        self.log_path = log_path
+        self.line_count = line_count
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def format_tail(self, limit=None):
+        """Return the last captured lines as a single string."""
+        lines = self.tail if limit is None else self.tail[-limit:]
+        return "\n".join(lines)
+
+
+class _Progress:
+    """Live progress for a running stage.
+
+    On a terminal a single status line is redrawn in place; elsewhere (CI
+    logs, matrix workers) a heartbeat line is printed periodically.
+    """
+
+    def __init__(self, name, mode):
+        if mode == "auto":
+            mode = "line" if sys.stdout.isatty() else "heartbeat"
+        self.name = name
+        self.mode = mode
+        self.start = time.monotonic()
+        self.last_update = 0.0
+        self.lines = 0
+
+    def update(self, line):
+        self.lines += 1
+        if self.mode == "echo":
+            print(f"[{self.name}] {line}")
+            return
+        now = time.monotonic()
+        elapsed = now - self.start
+        if self.mode == "line" and now - self.last_update >= _LINE_INTERVAL:
+            width = shutil.get_terminal_size((80, 20)).columns
+            status = f"[{self.name}] {elapsed:6.1f}s {self.lines:6d} lines  {line}"
+            sys.stdout.write("\r" + status[:width - 1].ljust(width - 1))
+            sys.stdout.flush()
+            self.last_update = now
+        elif self.mode == "heartbeat" and now - self.last_update >= _HEARTBEAT_INTERVAL:
+            if self.last_update:
+                print(f"[{self.name}] still running ({elapsed:.0f}s, {self.lines} lines)")
+            self.last_update = now
+
+    def finish(self, returncode):
+        if self.mode == "off":
+            return
+        if self.mode == "line":
+            width = shutil.get_terminal_size((80, 20)).columns
+            sys.stdout.write("\r" + " " * (width - 1) + "\r")
+        elapsed = time.monotonic() - self.start
+        state = "finished" if returncode == 0 else f"failed (exit code {returncode})"
+        print(f"[{self.name}] {state} in {elapsed:.1f}s ({self.lines} lines)")
+
+
+def terminate_running(kill=False):
+    """
+    Stop every command started by run_streaming() that is still running.
+
+    Used by the stage scheduler to cancel stages running in other threads;
+    their run_streaming() call then returns the command's non-zero exit code.
+    """
+    with _running_lock:
+        procs = list(_running)
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill() if kill else proc.terminate()
+
+
+def log_path_for(name, log_dir=LOG_DIR):
+    """Return the compressed log file path for a stage name."""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "-", name)
+    return os.path.abspath(os.path.join(log_dir, f"{safe_name}.log.gz"))
+
+
+def run_streaming(cmd, name, cwd=None, env=None, tail_lines=DEFAULT_TAIL_LINES,
+                  log_dir=LOG_DIR, progress="auto", on_line=None):
+    """
+    Run `cmd` and stream its combined stdout/stderr.
+
+    Args:
+        cmd (list): Command and arguments
+        name (str): Stage name used for progress output and the log file name
+        cwd (str): Working directory for the command
+        env (dict): Environment for the command
+        tail_lines (int): Number of trailing lines kept in memory for error reports
+        log_dir (str): Directory of the compressed log files (relative to the caller's CWD)
+        progress (str): "auto", "line", "heartbeat", "echo" or "off"
+        on_line (callable): Called with every output line (without the newline)
+
+    Returns:
+        RunResult: Exit code, tail of the output and the log file path
+
+    Raises:
+        OSError: If the command cannot be started
+    """
+    log_path = log_path_for(name, log_dir)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    tail = collections.deque(maxlen=tail_lines)
+    tracker = _Progress(name, progress)
+    start = time.monotonic()
+
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+    )
+    with _running_lock:
+        _running.add(proc)
+    try:
+        with gzip.open(log_path, 'wt', encoding="utf-8") as log:
+            for line in proc.stdout:
+                log.write(line)
+                line = line.rstrip("\r\n")
+                tail.append(line)
+                if on_line:
+                    on_line(line)
+                tracker.update(line)
+        returncode = proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+        with _running_lock:
+            _running.discard(proc)
+
+    tracker.finish(returncode)
+    return RunResult(returncode, list(tail), log_path, tracker.lines, time.monotonic() - start)
@@ -0,0 +1,286 @@
+"""
+Dependency-graph scheduler for build stages.
+
+A build is a set of `Stage`s that declare the artifacts they read
+(`inputs`) and write (`outputs`): file paths, or names such as "icon" for
+values passed between stages. A stage depends on every stage that outputs
+one of its inputs, plus the stages named in `after`. `Scheduler.run()`
+starts each stage as soon as its dependencies have finished, so stages that
+do not depend on each other (the cargo build and the spec, version file and
+NSIS script generation, say) run concurrently.
+
+A stage either runs a command (`cmd`) as an asyncio subprocess, whose output
+goes to build/logs/<name>.log.gz like `run_streaming()`, or calls a Python
+function (`run`) in a worker thread. When a stage fails, the stages still
+running are cancelled: their commands are terminated (so are commands that
+function stages started through `run_streaming()`), and stages that have not
+started are not started.
+"""
+
+import asyncio
+import collections
+import gzip
+import os
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ezbuild import runner, trace
+from ezbuild.report import RAN, SKIPPED, FAILED, CANCELLED
+
+# Seconds a terminated command gets to exit before it is killed
+TERMINATE_GRACE = 5.0
+
+
+class SchedulerError(Exception):
+    """The stages do not form a valid graph (unknown dependency, cycle, two writers)."""
+
+
+class StageFailed(Exception):
+    """Raised by a stage function to fail its stage with a message."""
+
+
+class Stage:
+    """One node of the build graph."""
+
+    def __init__(self, name, run=None, cmd=None, inputs=(), outputs=(), after=(), cwd=None, env=None):
+        """
+        Args:
+            name (str): Unique stage name (also the log file name of a command stage)
+            run (callable): Function called in a worker thread, with no arguments.
+                Its return value is the stage's value; return SKIPPED to record
+                the stage as skipped, raise StageFailed (or any exception) to fail it.
+            cmd (list or callable): Command to run instead of a function; a
+                callable is evaluated when the stage starts
+            inputs (iterable): Artifacts the stage reads
+            outputs (iterable): Artifacts the stage writes
+            after (iterable): Names of stages that must finish first
+            cwd (str): Working directory of the command
+            env (dict): Environment of the command
+        """
+        if (run is None) == (cmd is None):
+            raise SchedulerError(f"Stage {name} needs exactly one of run and cmd")
+        self.name = name
+        self.run = run
+        self.cmd = cmd
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        self.cwd = cwd
+        self.env = env
+
+
+class StageResult:
+    """Outcome of one stage."""
+
+    def __init__(self, status, value=None, error=None, seconds=0.0):
+        self.status = status
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.status in (RAN, SKIPPED)
+
+
+def _artifact_key(artifact):
+    return os.path.normcase(os.path.normpath(artifact))
+
+
+def _signal_group(proc, kill=False):
+    """Terminate (or kill) a command stage's process group."""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            # CTRL_BREAK reaches the whole group; TerminateProcess only the command itself
+            proc.kill() if kill else proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Scheduler:
+    """Runs a graph of stages with as much concurrency as the dependencies allow."""
+
+    def __init__(self, stages, jobs=None):
+        """
+        Args:
+            stages (list): Stage objects
+            jobs (int): Maximum stages running at once (default: CPU count + 4,
+                as most stages wait on a subprocess or the disk)
+
+        Raises:
+            SchedulerError: On duplicate names or writers, unknown stages in `after`, or a cycle
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise SchedulerError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.jobs = jobs or (os.cpu_count() or 1) + 4
+        self.deps = self._resolve()
+        self.order = self._topological_order()
+
+    def _resolve(self):
+        writers = {}
+        for stage in self.stages.values():
+            for artifact in stage.outputs:
+                key = _artifact_key(artifact)
+                if key in writers:
+                    raise SchedulerError(f"{artifact} is written by both {writers[key]} and {stage.name}")
+                writers[key] = stage.name
+        deps = {}
+        for stage in self.stages.values():
+            unknown = [name for name in stage.after if name not in self.stages]
+            if unknown:
+                raise SchedulerError(f"Stage {stage.name} runs after unknown stage(s): {', '.join(unknown)}")
+            # Inputs nobody writes are source files; they impose no ordering
+            found = {writers[_artifact_key(a)] for a in stage.inputs if _artifact_key(a) in writers}
+            deps[stage.name] = (found | set(stage.after)) - {stage.name}
+        return deps
+
+    def _topological_order(self):
+        remaining = {name: set(deps) for name, deps in self.deps.items()}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise SchedulerError(f"Dependency cycle between stages: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+                order.append(name)
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def describe(self):
+        """Return one line per stage with its dependencies, in a valid run order."""
+        return [f"{name} <- {', '.join(sorted(self.deps[name])) or '(none)'}" for name in self.order]
+
+    def run(self):
+        """
+        Run every stage.
+
+        Returns:
+            dict: Stage name -> StageResult, in run order. After a failure the
+                stages that were running are CANCELLED, and so are the ones that
+                never started.
+        """
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        self.results = {}
+        self.failed = False
+        self.procs = set()
+        done = {name: asyncio.Event() for name in self.stages}
+        limit = asyncio.Semaphore(self.jobs)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            self.pool = pool
+            tasks = [asyncio.create_task(self._run_stage(self.stages[name], done, limit)) for name in self.order]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Ctrl+C: stop every command before the threads are joined
+                self._cancel()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        return {name: self.results.get(name, StageResult(CANCELLED)) for name in self.order}
+
+    async def _run_stage(self, stage, done, limit):
+        try:
+            for dep in self.deps[stage.name]:
+                await done[dep].wait()
+            if self.failed or any(not self.results[dep].ok for dep in self.deps[stage.name] if dep in self.results):
+                self.results[stage.name] = StageResult(CANCELLED)
+                return
+            async with limit:
+                if self.failed:
+                    self.results[stage.name] = StageResult(CANCELLED)
+                    return
+                result = await self._execute(stage)
+            self.results[stage.name] = result
+            if result.status == FAILED and not self.failed:
+                self.failed = True
+                self._cancel()
+        finally:
+            done[stage.name].set()
+
+    def _cancel(self):
+        """Stop the commands of every running stage: terminate now, kill after TERMINATE_GRACE."""
+        self.failed = True
+        for proc in list(self.procs):
+            _signal_group(proc)
+        runner.terminate_running()
+        asyncio.get_running_loop().call_later(TERMINATE_GRACE, self._kill)
+
+    def _kill(self):
+        for proc in list(self.procs):
+            _signal_group(proc, kill=True)
+        runner.terminate_running(kill=True)
+
+    async def _execute(self, stage):
+        ts = time.time()
+        start = time.perf_counter()
+        try:
+            if stage.cmd is not None:
+                value = await self._run_command(stage)
+            else:
+                loop = asyncio.get_running_loop()
+                value = await loop.run_in_executor(self.pool, stage.run)
+            # A function whose commands were terminated may still return normally
+            status = CANCELLED if self.failed else SKIPPED if value == SKIPPED else RAN
+            error = None
+        except Exception as e:
+            # A stage that fails because it was terminated was cancelled, not broken
+            status = CANCELLED if self.failed else FAILED
+            value, error = None, str(e) or type(e).__name__
+        seconds = time.perf_counter() - start
+        trace.record(f"stage {stage.name}", ts, seconds, status=status)
+        return StageResult(status, value, error, round(seconds, 3))
+
+    async def _run_command(self, stage):
+        cmd = stage.cmd() if callable(stage.cmd) else stage.cmd
+        log_path = runner.log_path_for(stage.name)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        tail = collections.deque(maxlen=runner.DEFAULT_TAIL_LINES)
+        # Each command gets its own process group, so cancelling it also stops
+        # the tools it started (build_rust.py's cargo, say)
+        if os.name == "nt":
+            group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group = {"start_new_session": True}
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=stage.cwd, env=stage.env,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, **group)
+        self.procs.add(proc)
+        start = time.monotonic()
+        try:
+            with gzip.open(log_path, 'wt', encoding="utf-8") as log:
+                async for raw in proc.stdout:
+                    line = raw.decode("utf-8", errors="replace")
+                    log.write(line)
+                    tail.append(line.rstrip("\r\n"))
+            returncode = await proc.wait()
+        except BaseException:
+            if proc.returncode is None:
+                _signal_group(proc, kill=True)
+                await proc.wait()
+            raise
+        finally:
+            self.procs.discard(proc)
+
+        elapsed = time.monotonic() - start
+        if returncode != 0:
+            if self.failed:
+                raise StageFailed("terminated")
+            print(f"[{stage.name}] failed (exit code {returncode}) in {elapsed:.1f}s; "
+                  f"last {len(tail)} lines:\n" + "\n".join(tail))
+            raise StageFailed(f"exit code {returncode}, full log: {log_path}")
+        print(f"[{stage.name}] finished in {elapsed:.1f}s")
+        return RAN
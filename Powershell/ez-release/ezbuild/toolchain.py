@@ -0,0 +1,199 @@
+"""
+Toolchain discovery shared by the build scripts.
+
+Locating a tool and asking for its version costs a few path probes and a
+subprocess per tool and run (`rustc -vV`, `makensis -VERSION`, ...).
+`Toolchain` resolves each tool once and remembers its path, version and file
+identity (size, mtime, inode) in `toolchain.json` in the ezbuild cache
+directory. Later runs only `stat` the recorded file. A tool is looked up
+again when it was moved or upgraded, or when its search context (PATH, the
+Python interpreter, ...) changed.
+
+rustup installs `rustc` and `cargo` as proxies that never change when a new
+toolchain is installed, so for those the rustup settings file and toolchain
+directory are checked as well.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from ezbuild.cache import default_cache_dir
+
+TOOLCHAIN_FILE = "toolchain.json"
+
+# Where the NSIS installer puts makensis.exe (checked after PATH, which is
+# where Linux and macOS packages install makensis)
+NSIS_PATHS = [
+    r"C:\Program Files (x86)\NSIS\makensis.exe",
+    r"C:\Program Files\NSIS\makensis.exe"
+]
+
+TOOLS = ("pyinstaller", "rustc", "cargo", "makensis", "upx")
+
+
+def _identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _run_version(cmd):
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return result.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def _rustup_home():
+    return os.environ.get("RUSTUP_HOME") or os.path.join(os.path.expanduser("~"), ".rustup")
+
+
+def _find_rust_tool(tool):
+    # PATH first, then the default rustup location
+    path = shutil.which(tool)
+    if path is None:
+        cargo_home = os.environ.get("CARGO_HOME") or os.path.join(os.path.expanduser("~"), ".cargo")
+        candidate = os.path.join(cargo_home, "bin", tool + (".exe" if os.name == 'nt' else ""))
+        path = candidate if os.path.isfile(candidate) else None
+    if path is None:
+        return None
+    return path, _run_version([path, "-vV" if tool == "rustc" else "-V"])
+
+
+def _find_pyinstaller():
+    spec = importlib.util.find_spec("PyInstaller")
+    if spec is None or not spec.origin:
+        return None
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return spec.origin, version("pyinstaller")
+    except PackageNotFoundError:
+        return spec.origin, "unknown"
+
+
+def _find_makensis():
+    path = shutil.which("makensis") or next((p for p in NSIS_PATHS if os.path.isfile(p)), None)
+    if path is None:
+        return None
+    return path, _run_version([path, "-VERSION"])
+
+
+def _find_upx():
+    path = shutil.which("upx")
+    if path is None:
+        return None
+    return path, (_run_version([path, "--version"]).splitlines() or ["unknown"])[0]
+
+
+def _context(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _rust_context():
+    return _context(os.environ.get("PATH", ""), os.environ.get("CARGO_HOME", ""),
+                    os.environ.get("RUSTUP_TOOLCHAIN", ""))
+
+
+def _rust_watch():
+    return [os.path.join(_rustup_home(), "settings.toml"), os.path.join(_rustup_home(), "toolchains")]
+
+
+# name -> (finder, search context, extra paths whose identity is checked)
+_FINDERS = {
+    "pyinstaller": (_find_pyinstaller,
+                    lambda: _context(sys.executable, os.environ.get("PYTHONPATH", "")),
+                    lambda: []),
+    "rustc": (lambda: _find_rust_tool("rustc"), _rust_context, _rust_watch),
+    "cargo": (lambda: _find_rust_tool("cargo"), _rust_context, _rust_watch),
+    "makensis": (_find_makensis, lambda: _context(os.environ.get("PATH", "")), lambda: []),
+    "upx": (_find_upx, lambda: _context(os.environ.get("PATH", "")), lambda: []),
+}
+
+
+class Toolchain:
+    """Resolve build tools once and revalidate them cheaply on later runs."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_file = os.path.join(cache_dir or default_cache_dir(), TOOLCHAIN_FILE)
+        self._entries = self._load()
+        self._resolved = {}
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, name, entry):
+        # Re-read first so tools resolved by a concurrent build are kept
+        entries = self._load()
+        entries[name] = entry
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.cache_file), suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            pass  # The registry is an optimization; a read-only cache dir is fine
+
+    def find(self, name):
+        """
+        Locate a tool.
+
+        Args:
+            name (str): One of TOOLS
+
+        Returns:
+            dict: {"path": ..., "version": ...}, or None if the tool is not installed
+        """
+        if name in self._resolved:
+            return self._resolved[name]
+        finder, context, watch = _FINDERS[name]
+
+        entry = self._entries.get(name)
+        if not (entry and entry.get("context") == context()
+                and all(_identity(path) == identity for path, identity in entry.get("watch", []))):
+            found = finder()
+            if found is None:
+                self._resolved[name] = None
+                return None
+            path, version = found
+            watched = [path] + [p for p in watch() if os.path.exists(p)]
+            entry = {
+                "path": path,
+                "version": version,
+                "context": context(),
+                "watch": [[p, _identity(p)] for p in watched],
+            }
+            self._entries[name] = entry
+            self._save(name, entry)
+
+        self._resolved[name] = {"path": entry["path"], "version": entry["version"]}
+        return self._resolved[name]
+
+    def path(self, name):
+        """Return the tool's path, or None if it is not installed."""
+        tool = self.find(name)
+        return tool["path"] if tool else None
+
+    def version(self, name):
+        """Return the tool's version string, or "unknown" if it is not installed."""
+        tool = self.find(name)
+        return tool["version"] if tool else "unknown"
+
+    def add_to_fingerprint(self, fingerprint, *names):
+        """Add the versions of the named tools to a build Fingerprint."""
+        for name in names:
+            fingerprint.add_text(f"tool:{name}", self.version(name))
@@ -0,0 +1,122 @@
+"""
+Per-phase timing for the build scripts.
+
+Phases are wrapped in `span()` blocks. The recorded spans are written in the
+Chrome trace-event format (load `build/build_trace.json` in chrome://tracing
+or https://ui.perfetto.dev) and summarized as a table at the end of a run.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+TRACE_PATH = os.path.join("build", "build_trace.json")
+
+_events = []
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Record the duration of the enclosed block as a trace span."""
+    ts = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, ts, time.perf_counter() - start, **args)
+
+
+def record(name, start, duration, **args):
+    """Record a span measured elsewhere (`start` in epoch seconds, `duration` in seconds)."""
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": start * 1e6,
+        "dur": duration * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident() % 100000,
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+def events():
+    """Return the spans recorded so far in this process."""
+    with _lock:
+        return list(_events)
+
+
+def reset():
+    """Forget recorded spans (used by worker processes before they start)."""
+    with _lock:
+        del _events[:]
+
+
+def extend(more_events):
+    """Add spans recorded by another process (e.g. a matrix worker)."""
+    with _lock:
+        _events.extend(more_events)
+
+
+def summarize():
+    """
+    Total the recorded spans by name.
+
+    Returns:
+        list: (name, total seconds, count) tuples, longest first
+    """
+    totals = {}
+    for event in events():
+        total, count = totals.get(event["name"], (0.0, 0))
+        totals[event["name"]] = (total + event["dur"] / 1e6, count + 1)
+    return sorted(((name, total, count) for name, (total, count) in totals.items()),
+                  key=lambda row: row[1], reverse=True)
+
+
+def print_summary(limit=10):
+    """Print the phases that took the most time."""
+    rows = summarize()[:limit]
+    if not rows:
+        return
+    recorded = events()
+    wall = (max(e["ts"] + e["dur"] for e in recorded) - min(e["ts"] for e in recorded)) / 1e6
+    width = max(len(name) for name, _, _ in rows)
+    print(f"\nTop phases (wall time {wall:.1f}s):")
+    for name, total, count in rows:
+        share = 100.0 * total / wall if wall else 0.0
+        calls = f" x{count}" if count > 1 else ""
+        print(f"  {name:<{width}}  {total:8.2f}s  {share:5.1f}%{calls}")
+
+
+def write(section, path=TRACE_PATH):
+    """
+    Write the spans to a trace-event JSON file.
+
+    Spans are tagged with `section` as their category; spans another script
+    wrote to the same file under a different section are kept, so the Rust
+    and Python builds show up in one timeline.
+
+    Returns:
+        str: Path of the trace file
+    """
+    existing = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                existing = json.load(f).get("traceEvents", [])
+        except (OSError, ValueError, AttributeError):
+            existing = []
+    trace_events = [e for e in existing if e.get("cat") != section]
+    for event in events():
+        trace_events.append(dict(event, cat=section))
+    trace_events.sort(key=lambda e: e["ts"])
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return path
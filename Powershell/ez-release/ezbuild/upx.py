@@ -0,0 +1,276 @@
+"""
+Cached UPX compression with automatic exclusions.
+
+With `upx=True`, PyInstaller runs UPX over every bundled binary whenever its
+own cache is cold (--clean, a fresh workpath, another machine). That includes
+large Qt DLLs that take long to compress, gain little, and have to be
+decompressed again on every launch. The generated spec file therefore turns
+PyInstaller's UPX pass off and runs `Analysis.binaries` through
+`compress_binaries()` instead.
+
+Each binary is measured once per (content hash, UPX version, UPX flags,
+strip): compressed size, compression time, and the time `upx -t` takes to
+unpack it. A binary that saves too little or costs too much to decompress
+gets a "skip" verdict. The others are compressed once, and later builds use
+the compressed copy from the cache. Verdicts and copies live under `upx/` in
+the ezbuild cache directory.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from ezbuild.cache import default_cache_dir, hash_file
+
+# A binary must shrink to at most this fraction of its size to be compressed
+MAX_RATIO = 0.85
+# ...and must not take longer than this to decompress, per MB of original size
+MAX_DECOMPRESS_MS_PER_MB = 15.0
+# Smaller binaries are never worth the extra work at startup
+MIN_SIZE = 64 * 1024
+
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+# Binaries UPX is known to break (the MSVC runtime and API set forwarders)
+DEFAULT_EXCLUDE = ("vcruntime*.dll", "msvcp*.dll", "ucrtbase.dll", "api-ms-win-*.dll", "python3.dll")
+
+_BINARY_SUFFIXES = (".dll", ".pyd", ".so", ".dylib")
+_VERDICTS = "verdicts.json"
+_GUARD_CF = 0x4000  # IMAGE_DLLCHARACTERISTICS_GUARD_CF
+
+
+def is_cfg_enabled(path):
+    """
+    Return True if `path` is a PE image built with Control Flow Guard.
+
+    UPX-compressed CFG images fail to load on Windows, so they are never compressed.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(4096)
+    except OSError:
+        return False
+    if header[:2] != b"MZ" or len(header) < 0x40:
+        return False
+    (pe_offset,) = struct.unpack_from("<I", header, 0x3C)
+    characteristics_offset = pe_offset + 24 + 70  # Same offset in PE32 and PE32+
+    if header[pe_offset:pe_offset + 4] != b"PE\0\0" or characteristics_offset + 2 > len(header):
+        return False
+    (characteristics,) = struct.unpack_from("<H", header, characteristics_offset)
+    return bool(characteristics & _GUARD_CF)
+
+
+def _is_candidate(dest_name, src_path, typecode):
+    name = os.path.basename(dest_name).lower()
+    return (typecode in ("BINARY", "EXTENSION")
+            and (name.endswith(_BINARY_SUFFIXES) or ".so." in name)
+            and os.path.isfile(src_path))
+
+
+def _run(cmd):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return result, time.perf_counter() - start
+
+
+class UpxCache:
+    """Per-binary UPX verdicts and compressed copies."""
+
+    def __init__(self, upx, upx_version, upx_args=(), strip=False, cache_dir=None,
+                 max_ratio=MAX_RATIO, max_decompress_ms_per_mb=MAX_DECOMPRESS_MS_PER_MB,
+                 max_bytes=CACHE_MAX_BYTES):
+        self.upx = upx
+        self.upx_version = upx_version
+        self.upx_args = list(upx_args)
+        self.strip = strip and sys.platform != 'win32' and shutil.which("strip") is not None
+        self.root = os.path.join(cache_dir or default_cache_dir(), "upx")
+        self.max_ratio = max_ratio
+        self.max_decompress_ms_per_mb = max_decompress_ms_per_mb
+        self.max_bytes = max_bytes
+        self.verdicts = self._load_verdicts()
+        self._new_verdicts = {}
+        self._spawn_overhead = None
+
+    def _load_verdicts(self):
+        try:
+            with open(os.path.join(self.root, _VERDICTS), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, path):
+        """Return the cache key for a binary under the current UPX settings."""
+        parts = [hash_file(path), self.upx_version, " ".join(self.upx_args), f"strip={self.strip}"]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _copy_path(self, key, name):
+        return os.path.join(self.root, "objects", key[:2], key, name)
+
+    def _overhead(self):
+        # Process start-up time of `upx`, subtracted from the `upx -t` timings
+        if self._spawn_overhead is None:
+            self._spawn_overhead = min(_run([self.upx, "--version"])[1] for _ in range(3))
+        return self._spawn_overhead
+
+    def _strip(self, path):
+        cmd = ["strip"] + (["-S"] if sys.platform == 'darwin' else []) + [path]
+        return subprocess.run(cmd, capture_output=True).returncode == 0
+
+    def calibrate(self, src, name, key):
+        """
+        Strip (if requested) and trial-compress one binary, recording a verdict.
+
+        Returns:
+            dict: Verdict with "action" ("compress", "strip" or "skip") and measurements
+        """
+        with tempfile.TemporaryDirectory(prefix="ezbuild-upx-") as tmp:
+            work = os.path.join(tmp, name)
+            shutil.copy2(src, work)
+            stripped = self.strip and self._strip(work)
+            size = os.path.getsize(work)
+            verdict = {"size": size, "stripped": bool(stripped)}
+
+            packed = os.path.join(tmp, f"packed-{name}")
+            result, compress_s = _run([self.upx] + self.upx_args + ["-q", "-o", packed, work])
+            if result.returncode != 0 or not os.path.isfile(packed):
+                reason = (result.stdout.strip().splitlines() or ["upx failed"])[-1]
+                verdict.update(action="strip" if stripped else "skip", reason=reason)
+            else:
+                _, test_s = _run([self.upx, "-q", "-t", packed])
+                ratio = os.path.getsize(packed) / size
+                decompress_ms = max(0.0, test_s - self._overhead()) * 1000
+                per_mb = decompress_ms / (size / (1024 * 1024))
+                verdict.update(ratio=round(ratio, 3), compress_s=round(compress_s, 3),
+                               decompress_ms=round(decompress_ms, 1))
+                if ratio > self.max_ratio:
+                    verdict.update(action="strip" if stripped else "skip", reason=f"ratio {ratio:.2f}")
+                elif per_mb > self.max_decompress_ms_per_mb:
+                    verdict.update(action="strip" if stripped else "skip",
+                                   reason=f"decompression {per_mb:.1f}ms/MB")
+                else:
+                    verdict["action"] = "compress"
+                    work = packed
+
+            if verdict["action"] != "skip":
+                self._store(key, name, work)
+        self._new_verdicts[key] = verdict
+        return verdict
+
+    def _store(self, key, name, path):
+        dest = self._copy_path(key, name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        os.close(fd)
+        shutil.copy2(path, tmp)
+        os.replace(tmp, dest)
+
+    def process(self, src, name):
+        """
+        Return the file to bundle for a binary, and its verdict.
+
+        Returns:
+            tuple: (path to bundle, verdict dict, True if the verdict came from the cache)
+        """
+        key = self.key(src)
+        verdict = self.verdicts.get(key) or self._new_verdicts.get(key)
+        cached = verdict is not None
+        if cached and verdict["action"] != "skip" and not os.path.isfile(self._copy_path(key, name)):
+            cached = False  # The compressed copy was evicted; measure again
+        if not cached:
+            verdict = self.calibrate(src, name, key)
+        if verdict["action"] == "skip":
+            return src, verdict, cached
+        copy = self._copy_path(key, name)
+        now = time.time()
+        os.utime(copy, (now, now))
+        return copy, verdict, cached
+
+    def save(self):
+        """Persist new verdicts and evict the least recently used copies."""
+        if not self._new_verdicts:
+            return
+        verdicts = self._load_verdicts()
+        verdicts.update(self._new_verdicts)
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(verdicts, f, indent=2, sort_keys=True)
+        os.replace(tmp, os.path.join(self.root, _VERDICTS))
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used compressed copies beyond `max_bytes`."""
+        objects_dir = os.path.join(self.root, "objects")
+        copies = []
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                copies.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in copies)
+        for _, size, path in sorted(copies):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            total -= size
+
+
+def compress_binaries(binaries, upx, upx_version, upx_args=(), strip=False, exclude=(),
+                      cache_dir=None, report_path=None):
+    """
+    Replace the binaries of a PyInstaller Analysis with stripped/compressed cached copies.
+
+    Called from the generated spec file between Analysis and EXE.
+
+    Args:
+        binaries (list): Analysis.binaries, (dest_name, src_path, typecode) tuples
+        upx (str): Path of the UPX executable
+        upx_version (str): UPX version, part of the cache key
+        upx_args (list): UPX options (e.g. ["--best", "--lzma"])
+        strip (bool): Strip symbol tables before compressing (ignored on Windows)
+        exclude (list): Extra file name patterns never to compress
+        cache_dir (str): ezbuild cache directory
+        report_path (str): Where to write a JSON summary of the verdicts
+
+    Returns:
+        list: The binaries, with source paths pointing at the processed copies
+    """
+    cache = UpxCache(upx, upx_version, upx_args, strip=strip, cache_dir=cache_dir)
+    patterns = [p.lower() for p in tuple(DEFAULT_EXCLUDE) + tuple(exclude)]
+    result = []
+    entries = []
+    for dest_name, src_path, typecode in binaries:
+        name = os.path.basename(dest_name)
+        if not _is_candidate(dest_name, src_path, typecode):
+            result.append((dest_name, src_path, typecode))
+            continue
+        size = os.path.getsize(src_path)
+        if any(fnmatch.fnmatch(name.lower(), p) for p in patterns) or size < MIN_SIZE or is_cfg_enabled(src_path):
+            result.append((dest_name, src_path, typecode))
+            entries.append({"name": dest_name, "action": "excluded", "size": size})
+            continue
+        path, verdict, cached = cache.process(src_path, name)
+        result.append((dest_name, path, typecode))
+        entries.append(dict(verdict, name=dest_name, cached=cached,
+                            bundled_size=os.path.getsize(path)))
+    cache.save()
+
+    compressed = [e for e in entries if e["action"] == "compress"]
+    saved = sum(e["size"] - e["bundled_size"] for e in compressed)
+    print(f"ezbuild UPX: {len(compressed)} of {len(entries)} binaries compressed "
+          f"({sum(1 for e in entries if e.get('cached'))} from cache), {saved / 1024 / 1024:.1f} MB saved")
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump({"upx_version": upx_version, "upx_args": list(upx_args), "saved_bytes": saved,
+                       "binaries": entries}, f, indent=2)
+    return type(binaries)(result)
@@ -0,0 +1,232 @@
+"""
+File watching for `build_package.py --watch`.
+
+`Watcher` reports the files that changed below a set of directories (and
+individual files). On Linux it uses inotify through ctypes, so an idle
+watch costs nothing; elsewhere, or when inotify is unavailable (watch limit
+reached, unusual filesystems, also for a directory created while watching),
+it falls back to comparing size and mtime snapshots every `poll_interval`
+seconds.
+
+`wait_for_changes()` debounces: it returns once no further change arrived
+for `debounce` seconds, so an editor saving several files, or a formatter
+rewriting a tree, gives one rebuild instead of many.
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+
+# Editor swap/backup files and interpreter caches never trigger a rebuild
+IGNORED = ("*.swp", "*.swx", "*~", ".#*", "4913", "*.tmp", "*.pyc", "__pycache__", ".DS_Store")
+
+POLL_INTERVAL = 0.5
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF)
+_EVENT = struct.Struct("iIII")
+
+
+def is_ignored(path):
+    """Return True for files that are not sources (swap files, bytecode, ...)."""
+    parts = path.replace("\\", "/").split("/")
+    return any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in IGNORED)
+
+
+class _Inotify:
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+
+    def add(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.dirs[wd] = directory
+
+    def read(self, timeout):
+        """Return (path, is_dir, created) for the events available within `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                events.append((None, False, False))  # Events were lost; the caller rescans
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            events.append((path, bool(mask & _IN_ISDIR), bool(mask & (_IN_CREATE | _IN_MOVED_TO))))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """Reports changed files below directories and individual files."""
+
+    def __init__(self, paths, poll_interval=POLL_INTERVAL, polling=False):
+        """
+        Args:
+            paths (list): Directories (watched recursively) and files
+            poll_interval (float): Seconds between snapshots when polling
+            polling (bool): Do not try inotify
+        """
+        self.dirs = sorted({os.path.abspath(p) for p in paths if os.path.isdir(p)})
+        self.files = sorted({os.path.abspath(p) for p in paths if not os.path.isdir(p)})
+        self.poll_interval = poll_interval
+        self.inotify = None
+        if not polling:
+            try:
+                self.inotify = _Inotify()
+                for directory in self._all_dirs():
+                    self.inotify.add(directory)
+                # Files are watched through their directory (editors replace them on save)
+                for directory in {os.path.dirname(f) for f in self.files}:
+                    if os.path.isdir(directory):
+                        self.inotify.add(directory)
+            except (OSError, AttributeError):
+                if self.inotify:
+                    self.inotify.close()
+                self.inotify = None
+        self.backend = "inotify" if self.inotify else "polling"
+        self.snapshot = None if self.inotify else self._snapshot()
+
+    def _all_dirs(self, roots=None):
+        for root in roots or self.dirs:
+            for dirpath, dirnames, _ in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not is_ignored(d)]
+                yield dirpath
+
+    def _watched(self, path):
+        return path in self.files or any(path == d or path.startswith(d + os.sep) for d in self.dirs)
+
+    def _snapshot(self):
+        state = {}
+        candidates = list(self.files)
+        for directory in self._all_dirs():
+            try:
+                candidates.extend(entry.path for entry in os.scandir(directory) if entry.is_file())
+            except OSError:
+                continue
+        for path in candidates:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def _add_new_dir(self, path, changed):
+        for directory in self._all_dirs([path]):
+            try:
+                self.inotify.add(directory)
+                changed.update(entry.path for entry in os.scandir(directory)
+                               if entry.is_file() and not is_ignored(entry.path))
+            except FileNotFoundError:
+                continue  # Removed again already; its delete event follows
+
+    def _fall_back_to_polling(self):
+        self.inotify.close()
+        self.inotify = None
+        self.backend = "polling"
+        self.snapshot = self._snapshot()
+
+    def changes(self, timeout):
+        """
+        Return the watched files that changed within `timeout` seconds (possibly none).
+
+        Returns:
+            set: Absolute paths of changed, created or deleted files
+        """
+        if self.inotify:
+            changed = set()
+            for path, is_dir, created in self.inotify.read(timeout):
+                if path is None:
+                    # Queue overflow: report everything, a rebuild is cheap compared with a missed edit
+                    changed.update(self.files)
+                    changed.update(self.dirs)
+                    continue
+                if not self._watched(path) or is_ignored(path):
+                    continue
+                if is_dir:
+                    if created:
+                        # A new directory: watch it, and report the files already moved into it
+                        try:
+                            self._add_new_dir(path, changed)
+                        except OSError as e:
+                            # Watch limit reached or similar: poll from now on, and
+                            # report everything as on a queue overflow
+                            print(f"[watch] Cannot watch {path} ({e}); polling instead")
+                            self._fall_back_to_polling()
+                            changed.update(self.files)
+                            changed.update(self.dirs)
+                            return changed
+                    else:
+                        changed.add(path)  # Deleted or moved away: its files are gone too
+                else:
+                    changed.add(path)
+            return changed
+
+        time.sleep(timeout if timeout is not None else self.poll_interval)
+        snapshot = self._snapshot()
+        changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(path) != self.snapshot.get(path) and not is_ignored(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        if self.inotify:
+            self.inotify.close()
+
+
+def wait_for_changes(watcher, debounce=0.3, max_delay=5.0):
+    """
+    Block until files change, then until no further change arrives for `debounce` seconds.
+
+    Returns early once `max_delay` seconds passed since the first change, so
+    a process that writes continuously still gets rebuilt.
+
+    Returns:
+        set: Absolute paths of the changed files
+    """
+    changed = set()
+    while not changed:
+        changed = watcher.changes(None if watcher.inotify else watcher.poll_interval)
+    first = time.monotonic()
+    while time.monotonic() - first < max_delay:
+        more = watcher.changes(debounce if watcher.inotify else max(debounce, watcher.poll_interval))
+        if not more:
+            break
+        changed |= more
+    return changed
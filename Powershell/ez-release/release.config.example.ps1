@@ -60,6 +60,20 @@
         }
     }
 
+    # --- Release Archives (Optional) ---
+    # PackageScriptPath: Path relative to project root of Python/package_release.py. When set, the archives are
+    # written by that script instead of Compress-Archive: concurrently, streamed from BuildOutputDir without
+    # staging copies in 'release/<TargetDir>', and reproducible (byte-identical for the same inputs).
+    # Run New-Release.ps1 -LegacyPackaging to use Compress-Archive anyway.
+    # PackageScriptPath = "package_release.py"
+    # Packaging: Archive compression for package_release.py.
+    Packaging = @{
+        # Compression: 'store', 'deflate' or 'lzma' (LZMA zips need 7-Zip; Windows Explorer cannot open them)
+        Compression = "deflate"
+        # Level: 0-9 (deflate level or LZMA preset)
+        Level       = 9
+    }
+
     # --- Documentation Files ---
     # List of documentation or other files (relative to project root) to include in EACH artifact package.
     DocFiles = @(
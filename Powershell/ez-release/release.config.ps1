@@ -32,6 +32,13 @@
         }
     }
     
+    # --- Release Archives ---
+    PackageScriptPath = "package_release.py" # Relative to the project root
+    Packaging = @{
+        Compression = "deflate" # store, deflate or lzma
+        Level       = 9
+    }
+
     # --- Documentation Files ---
     DocFiles = @(
         "README.md", 